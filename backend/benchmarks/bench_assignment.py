@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Simulation: a full day of intake arrivals through the assignment engine.
+
+Builds services/assignment.py's engine over synthetic doctors (some on
+leave) in General, Emergency and Mental Health departments, then replays a
+day of walk-in arrivals: each arrival is assigned a doctor for its ward,
+and each doctor sees their queue first come first served, reporting every
+finished consultation back to the engine. Prints assignment cost, queue
+balance and patient waits, next to a linear scan over the same arrivals.
+
+Usage: python benchmarks/bench_assignment.py [doctors] [arrivals]
+"""
+
+import heapq
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.assignment import AssignmentEngine
+
+DOCTORS = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+ARRIVALS = int(sys.argv[2]) if len(sys.argv) > 2 else 6000
+DAY_MINUTES = 12 * 60
+WARDS = [("general", "General Medicine", 0.6), ("emergency", "Emergency", 0.25), ("mental_health", "Mental Health", 0.15)]
+
+
+def make_hospital(rng: random.Random):
+    departments = [{"id": str(uuid.uuid4()), "name": name} for _, name, _ in WARDS]
+    doctors = []
+    for i in range(DOCTORS):
+        # Staff departments roughly in proportion to their share of arrivals
+        share = rng.random()
+        index = 0 if share < WARDS[0][2] else 1 if share < WARDS[0][2] + WARDS[1][2] else 2
+        doctors.append({
+            "id": str(uuid.uuid4()), "name": f"Dr. {i}", "department_id": departments[index]["id"],
+            "is_on_leave": rng.random() < 0.05, "leave_start_date": None, "leave_end_date": None,
+        })
+    return departments, doctors
+
+
+def make_arrivals(rng: random.Random):
+    arrivals = []
+    for _ in range(ARRIVALS):
+        ward = rng.choices([w for w, _, _ in WARDS], weights=[s for _, _, s in WARDS])[0]
+        arrivals.append((rng.uniform(0, DAY_MINUTES), ward, rng.uniform(8, 25)))
+    arrivals.sort()
+    return arrivals
+
+
+def simulate(engine: AssignmentEngine, arrivals):
+    """Replay arrivals; returns (assign seconds, seen seconds, waits, peak queue)"""
+    events = [(minute, 1, ward, duration) for minute, ward, duration in arrivals]
+    heapq.heapify(events)
+    busy_until = {}
+    waits, assign_time, seen_time, seen_calls, peak = [], 0.0, 0.0, 0, 0
+
+    while events:
+        minute, kind, payload, duration = heapq.heappop(events)
+        if kind == 0:
+            started = time.perf_counter()
+            engine.record_seen(payload)
+            seen_time += time.perf_counter() - started
+            seen_calls += 1
+            continue
+
+        started = time.perf_counter()
+        assignment = engine.assign(payload)
+        assign_time += time.perf_counter() - started
+        peak = max(peak, assignment["queue_position"])
+
+        doctor_id = assignment["doctor_id"]
+        begin = max(minute, busy_until.get(doctor_id, 0.0))
+        busy_until[doctor_id] = begin + duration
+        waits.append(begin - minute)
+        heapq.heappush(events, (begin + duration, 0, doctor_id, 0.0))
+
+    return assign_time / len(arrivals), seen_time / max(seen_calls, 1), waits, peak
+
+
+def linear_scan(doctors, departments, arrivals):
+    """Reference: pick the least-loaded doctor by scanning the department on every arrival"""
+    by_ward = {}
+    for (ward, _, _), department in zip(WARDS, departments):
+        by_ward[ward] = [d["id"] for d in doctors if d["department_id"] == department["id"] and not d["is_on_leave"]]
+    queue = {d["id"]: 0 for d in doctors}
+    started = time.perf_counter()
+    for _, ward, _ in arrivals:
+        doctor_id = min(by_ward[ward], key=queue.__getitem__)
+        queue[doctor_id] += 1
+    return (time.perf_counter() - started) / len(arrivals)
+
+
+def main():
+    rng = random.Random(7)
+    departments, doctors = make_hospital(rng)
+    arrivals = make_arrivals(rng)
+    print(f"{DOCTORS} doctors, {ARRIVALS} arrivals over {DAY_MINUTES // 60} hours")
+
+    engine = AssignmentEngine()
+    started = time.perf_counter()
+    engine.build(doctors, departments, [])
+    print(f"  build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    per_assign, per_seen, waits, peak = simulate(engine, arrivals)
+    waits.sort()
+    print(f"  assign: {per_assign * 1e6:6.1f} us/arrival, seen: {per_seen * 1e6:6.1f} us/event")
+    print(f"  linear scan reference: {linear_scan(doctors, departments, arrivals) * 1e6:6.1f} us/arrival")
+    print(f"  wait p50 {statistics.median(waits):.1f} min, p95 {waits[int(len(waits) * 0.95)]:.1f} min, max {waits[-1]:.1f} min")
+    print(f"  peak queue length {peak}, engine stats {engine.stats()}")
+
+
+if __name__ == "__main__":
+    main()
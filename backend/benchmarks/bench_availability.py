@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: earliest-free-slot lookups at 500 doctors x 90 days.
+
+Builds services/availability.py's index over synthetic doctors (10
+departments, some on leave), 15-minute slots from 09:00 to 17:00 and a
+~60% booked appointment book, then times "earliest N free slots in
+department X after T" queries and incremental booking updates.
+
+Usage: python benchmarks/bench_availability.py [doctors] [days]
+"""
+
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.availability import AvailabilityIndex
+
+DOCTORS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+DEPARTMENTS = 10
+BOOKED_SHARE = 0.6
+QUERIES = 20_000
+
+
+def make_data(start: date):
+    rng = random.Random(11)
+    departments = [str(uuid.uuid4()) for _ in range(DEPARTMENTS)]
+    doctors = [
+        {"id": str(uuid.uuid4()), "department_id": departments[i % DEPARTMENTS],
+         "is_on_leave": i % 25 == 0, "leave_start_date": None, "leave_end_date": None}
+        for i in range(DOCTORS)
+    ]
+    slots, appointments = [], []
+    for doctor in doctors:
+        for offset in range(DAYS):
+            day = start + timedelta(days=offset)
+            for k in range(32):
+                begin = datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=15 * k)
+                slots.append({
+                    "id": str(uuid.uuid4()), "doctor_id": doctor["id"], "slot_date": day.isoformat(),
+                    "start_time": begin.time().isoformat(), "end_time": (begin + timedelta(minutes=15)).time().isoformat(),
+                    "capacity": 1, "booked": 0, "is_available": True,
+                })
+                if rng.random() < BOOKED_SHARE:
+                    appointments.append({"doctor_id": doctor["id"], "appointment_date": begin.isoformat()})
+    return departments, doctors, slots, appointments
+
+
+def main():
+    start = date.today()
+    print(f"Generating {DOCTORS} doctors x {DAYS} days ...")
+    departments, doctors, slots, appointments = make_data(start)
+    print(f"  {len(slots):,} slots, {len(appointments):,} appointments")
+
+    index = AvailabilityIndex()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index.build(doctors, slots, appointments, start, DAYS)
+    build_time = time.perf_counter() - started
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    del slots
+    print(f"  build: {build_time:.2f} s (peak RSS +{grown / 1024:.0f} MiB)")
+
+    rng = random.Random(5)
+    base = datetime.combine(start, datetime.min.time())
+    queries = [
+        (rng.choice(departments), base + timedelta(days=rng.randrange(DAYS), minutes=rng.randrange(24 * 60)))
+        for _ in range(QUERIES)
+    ]
+    for n in (1, 5, 20):
+        started = time.perf_counter()
+        for department_id, after in queries:
+            index.earliest(department_id, after, n)
+        per_query = (time.perf_counter() - started) / QUERIES
+        print(f"  earliest(n={n:2d}): {per_query * 1e6:7.1f} us/query")
+
+    # Incremental updates: book and release the slots the queries return
+    picks = [index.earliest(d, t, 1) for d, t in queries[:5000]]
+    picks = [p[0] for p in picks if p]
+    started = time.perf_counter()
+    for slot in picks:
+        index.record_booking(slot["doctor_id"], f"{slot['slot_date']}T{slot['start_time']}")
+    for slot in picks:
+        index.record_release(slot["doctor_id"], f"{slot['slot_date']}T{slot['start_time']}")
+    per_update = (time.perf_counter() - started) / (2 * len(picks))
+    print(f"  booking update: {per_update * 1e6:7.1f} us/event")
+
+    # Worst case: every doctor in a department on leave, so the whole horizon is walked
+    on_leave = [dict(d, is_on_leave=True) for d in doctors if d["department_id"] == departments[0]]
+    for doctor in on_leave:
+        index.update_doctor(doctor)
+    started = time.perf_counter()
+    found = index.earliest(departments[0], base, 5)
+    print(f"  department on leave: {(time.perf_counter() - started) * 1e6:7.1f} us ({len(found)} slots)")
+
+if __name__ == "__main__":
+    main()
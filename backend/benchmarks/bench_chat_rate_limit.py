@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Load test: /api/chat latency for well-behaved kiosks while others flood it.
+
+Runs a population of well-behaved kiosks (each walking through an intake
+conversation at a human pace, one message every few seconds) alongside
+flooders that send messages back to back from many concurrent connections.
+Every client has its own address via X-Forwarded-For, so start the server
+with RATE_LIMIT_PROXY_HOPS=1 for the per-IP buckets to apply per client.
+
+Prints status codes and latency percentiles separately for kiosks and
+flooders. With admission control the kiosks' p99 should stay close to an
+unloaded request while flooders mostly get 429s; for the unprotected
+baseline, run the server with very large CHAT_*_RATE, CHAT_*_BURST and
+CHAT_MAX_IN_FLIGHT values and compare.
+
+Usage: python benchmarks/bench_chat_rate_limit.py [kiosks] [flooders] [seconds] [base_url]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+KIOSKS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+FLOODERS = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+DURATION = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+BASE_URL = sys.argv[4] if len(sys.argv) > 4 else os.getenv("API_URL", "http://localhost:8000")
+KIOSK_THINK_SECONDS = 3.0
+# Concurrent connections per flooder
+FLOOD_CONNECTIONS = 16
+CONVERSATION = ["hello", "Load Test", "34", "mild headache and a sore throat since yesterday"]
+
+
+async def send(client: httpx.AsyncClient, session_id: str, ip: str, message: str, results: list):
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/chat",
+            json={"session_id": session_id, "message": message},
+            headers={"X-Forwarded-For": ip},
+        )
+        code = response.status_code
+    except httpx.HTTPError:
+        code = "error"
+    results.append((code, time.perf_counter() - started))
+
+
+async def kiosk(client: httpx.AsyncClient, index: int, deadline: float, results: list):
+    ip = f"10.1.{index // 250}.{index % 250 + 1}"
+    while time.perf_counter() < deadline:
+        session_id = f"kiosk-{uuid.uuid4().hex[:12]}"
+        for message in CONVERSATION:
+            if time.perf_counter() >= deadline:
+                return
+            await send(client, session_id, ip, message, results)
+            await asyncio.sleep(KIOSK_THINK_SECONDS)
+
+
+async def flooder(client: httpx.AsyncClient, index: int, deadline: float, results: list):
+    ip = f"10.9.0.{index + 1}"
+    session_id = f"flood-{uuid.uuid4().hex[:12]}"
+
+    async def connection():
+        while time.perf_counter() < deadline:
+            await send(client, session_id, ip, "hello", results)
+
+    await asyncio.gather(*(connection() for _ in range(FLOOD_CONNECTIONS)))
+
+
+def report(label: str, results: list):
+    codes = Counter(code for code, _ in results)
+    served = sorted(latency for code, latency in results if code == 200)
+    print(f"  {label}: {len(results)} requests, status codes {dict(codes)}")
+    if served:
+        p99 = served[min(len(served) - 1, int(len(served) * 0.99))]
+        print(f"    200 latency p50 {statistics.median(served) * 1000:.0f} ms, "
+              f"p99 {p99 * 1000:.0f} ms, max {served[-1] * 1000:.0f} ms")
+
+
+async def main():
+    limits = httpx.Limits(max_connections=KIOSKS + FLOODERS * FLOOD_CONNECTIONS)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60, limits=limits) as client:
+        deadline = time.perf_counter() + DURATION
+        kiosk_results, flood_results = [], []
+        await asyncio.gather(
+            *(kiosk(client, i, deadline, kiosk_results) for i in range(KIOSKS)),
+            *(flooder(client, i, deadline, flood_results) for i in range(FLOODERS)),
+        )
+        metrics = (await client.get("/metrics")).json().get("chat_rate_limit")
+
+    print(f"{KIOSKS} kiosks and {FLOODERS} flooders x {FLOOD_CONNECTIONS} connections for {DURATION:g} s against {BASE_URL}")
+    report("kiosks", kiosk_results)
+    report("flooders", flood_results)
+    print(f"  server admission stats: {metrics}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
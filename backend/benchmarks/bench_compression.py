@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes on the wire and latency with response compression.
+
+Serves a 5k-row appointments list (one JSON body) and a 20k-row NDJSON
+export (streamed in 1000-row pages) through middleware/compression.py and
+requests each with identity, gzip and brotli encodings.
+
+Usage: python benchmarks/bench_compression.py [rows]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+
+from benchmarks.bench_json_lists import make_rows
+from middleware.compression import ENCODERS, CompressionMiddleware, compression_stats
+from services.serialization import dumps
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+EXPORT_ROWS = ROWS * 4
+PAGE = 1000
+REPEATS = 10
+
+
+def build_app():
+    rows = make_rows(ROWS)
+    export_rows = make_rows(EXPORT_ROWS)
+    body = dumps(rows)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/appointments")
+    async def appointments():
+        return Response(body, media_type="application/json")
+
+    @app.get("/export")
+    async def export():
+        async def pages():
+            for start in range(0, EXPORT_ROWS, PAGE):
+                yield b"".join(dumps(row) + b"\n" for row in export_rows[start:start + PAGE])
+        return StreamingResponse(pages(), media_type="application/x-ndjson")
+
+    return app
+
+
+async def measure(client, path, encoding):
+    sizes, times = [], []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            wire = 0
+            async for chunk in response.aiter_raw():
+                wire += len(chunk)
+        times.append(time.perf_counter() - started)
+        sizes.append(wire)
+    return sizes[0], statistics.median(times)
+
+
+async def main():
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/appointments", "/export"):
+            print(path)
+            baseline = None
+            for encoding in ["identity", *ENCODERS]:
+                size, latency = await measure(client, path, encoding)
+                baseline = baseline or size
+                print(f"  {encoding:9s} {size:>10} bytes ({size / baseline:6.1%})  median {latency * 1000:7.2f} ms")
+    print("cpu seconds by coding:", {k: v["cpu_seconds"] for k, v in compression_stats.snapshot()["codings"].items()})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
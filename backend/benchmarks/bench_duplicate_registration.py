@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent duplicate patient registrations.
+
+Fires N simultaneous POST /api/patients/register requests with the same
+email at a running server and checks that exactly one succeeds, every other
+one gets a 400, and only one patient row exists afterwards.
+
+Usage: python benchmarks/bench_duplicate_registration.py [concurrency] [base_url]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+BASE_URL = sys.argv[2] if len(sys.argv) > 2 else os.getenv("API_URL", "http://localhost:8000")
+
+
+async def register(client: httpx.AsyncClient, payload: dict, start: asyncio.Event):
+    await start.wait()
+    started = time.perf_counter()
+    response = await client.post("/api/patients/register", json=payload)
+    return response.status_code, time.perf_counter() - started
+
+
+async def main():
+    email = f"dup-{uuid.uuid4().hex[:12]}@loadtest.example"
+    payload = {"first_name": "Load", "last_name": "Test", "email": email, "phone": "5550100", "age": 30}
+    start = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30, limits=limits) as client:
+        tasks = [asyncio.create_task(register(client, payload, start)) for _ in range(CONCURRENCY)]
+        await asyncio.sleep(0.1)
+        start.set()
+        results = await asyncio.gather(*tasks)
+
+        lookup = await client.post("/api/patients/lookup", params={"email": email})
+        rows = lookup.json() if lookup.status_code == 200 else []
+
+    codes = Counter(code for code, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    print(f"{CONCURRENCY} concurrent registrations for {email}")
+    print(f"  status codes: {dict(codes)}")
+    print(f"  latency p50 {statistics.median(latencies) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"  patient rows with this email: {len(rows)}")
+
+    ok = codes.get(200, 0) == 1 and codes.get(400, 0) == CONCURRENCY - 1 and len(rows) == 1
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: feedback summary at 500k feedback rows.
+
+Compares the old approach (load every feedback row, average it and run five
+list comprehensions for the star histogram) with the incrementally
+maintained aggregates in services/feedback_stats.py, and times a full
+reconciliation rebuild over the same rows.
+
+Usage: python benchmarks/bench_feedback_summary.py [rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.feedback_stats import FeedbackAggregates
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+DOCTORS = 500
+
+
+def make_rows(rows: int):
+    rng = random.Random(7)
+    return [
+        {
+            "id": f"fb-{i}",
+            "patient_id": f"pat-{i % 100000}",
+            "doctor_id": f"doc-{rng.randrange(DOCTORS)}",
+            "rating": rng.choice([1, 2, 3, 4, 4, 5, 5, 5]),
+            "feedback_text": "Friendly staff, short wait",
+            "is_anonymous": False,
+        }
+        for i in range(rows)
+    ]
+
+
+def old_summary(feedbacks):
+    avg_rating = sum(f['rating'] for f in feedbacks) / len(feedbacks)
+    rating_distribution = {
+        "5_stars": len([f for f in feedbacks if f['rating'] == 5]),
+        "4_stars": len([f for f in feedbacks if f['rating'] == 4]),
+        "3_stars": len([f for f in feedbacks if f['rating'] == 3]),
+        "2_stars": len([f for f in feedbacks if f['rating'] == 2]),
+        "1_stars": len([f for f in feedbacks if f['rating'] == 1])
+    }
+    return {"total_feedbacks": len(feedbacks), "average_rating": round(avg_rating, 2), "rating_distribution": rating_distribution}
+
+
+def old_doctor_summary(feedbacks, doctor_id):
+    mine = [f for f in feedbacks if f["doctor_id"] == doctor_id]
+    return round(sum(f['rating'] for f in mine) / len(mine), 2) if mine else 0
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    print(f"Generating {ROWS:,} synthetic feedback rows...")
+    rows = make_rows(ROWS)
+
+    aggregates = FeedbackAggregates()
+    rebuild_time, _ = timed(lambda: aggregates.rebuild(rows), repeat=1)
+
+    old_time, old_result = timed(lambda: old_summary(rows), repeat=3)
+    new_time, new_result = timed(aggregates.summary, repeat=1000)
+    assert old_result == new_result, (old_result, new_result)
+
+    old_doc_time, _ = timed(lambda: old_doctor_summary(rows, "doc-42"), repeat=3)
+    new_doc_time, _ = timed(lambda: aggregates.doctor_summary("doc-42"), repeat=1000)
+
+    record_time, _ = timed(lambda: aggregates.record(5, "doc-42"), repeat=1000)
+
+    print(f"\n{'operation':<34}{'best':>14}")
+    print(f"{'summary: full scan':<34}{old_time * 1000:>11.1f} ms")
+    print(f"{'summary: aggregates':<34}{new_time * 1e6:>11.2f} us")
+    print(f"{'doctor summary: full scan':<34}{old_doc_time * 1000:>11.1f} ms")
+    print(f"{'doctor summary: aggregates':<34}{new_doc_time * 1e6:>11.2f} us")
+    print(f"{'record one feedback':<34}{record_time * 1e6:>11.2f} us")
+    print(f"{'reconcile rebuild':<34}{rebuild_time * 1000:>11.1f} ms")
+    print("\n(the full-scan timings exclude transferring the rows from Supabase)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rendering a 5k-row appointments list.
+
+Compares FastAPI's default response path for `response_model=List[Appointment]`
+(validate every row into the model, jsonable_encoder, stdlib json) with the
+trusted-row path in services/serialization.py (project each DB row onto the
+model's fields, encode once with orjson).
+
+Usage: python benchmarks/bench_json_lists.py [rows]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.hospital import Appointment
+from services.serialization import orjson, render_json
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+REPEATS = 20
+
+
+def make_rows(rows: int):
+    start = datetime(2024, 1, 1, 9, 0)
+    statuses = ["scheduled", "confirmed", "completed", "cancelled"]
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "appointment_number": f"APT-{i:08d}",
+            "patient_id": str(uuid.uuid4()),
+            "doctor_id": str(uuid.uuid4()),
+            "department_id": str(uuid.uuid4()),
+            "appointment_date": (start + timedelta(minutes=15 * i)).isoformat() + "+00:00",
+            "reason_for_visit": "Follow-up consultation",
+            "priority": "normal",
+            "status": statuses[i % len(statuses)],
+            "room_number": f"{100 + i % 50}",
+            "confirmation_sent": False,
+            "confirmation_method": None,
+            "notes": None,
+            # Columns not in the response model, as returned by select("*")
+            "visit_id": None,
+            "created_at": start.isoformat() + "+00:00",
+            "updated_at": start.isoformat() + "+00:00",
+        }
+        for i in range(rows)
+    ]
+
+
+def timed(fn):
+    fn()
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+def main():
+    rows = make_rows(ROWS)
+    field = create_response_field(name="Response_list", type_=List[Appointment])
+
+    def default_path():
+        content = asyncio.run(serialize_response(field=field, response_content=rows, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def trusted_path():
+        return render_json(rows, List[Appointment])
+
+    print(f"{ROWS} appointment rows, best of {REPEATS} ({'orjson' if orjson else 'stdlib json'})")
+    default_time, default_size = timed(default_path)
+    trusted_time, trusted_size = timed(trusted_path)
+    print(f"  validate + jsonable_encoder + json : {default_time * 1000:8.2f} ms  ({default_size} bytes)")
+    print(f"  trusted rows + orjson              : {trusted_time * 1000:8.2f} ms  ({trusted_size} bytes)")
+    print(f"  speedup: {default_time / trusted_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
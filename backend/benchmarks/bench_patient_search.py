@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fuzzy patient search against a running server.
+
+Optionally seeds N synthetic patients through the streamed JSONL import
+(POST /api/patients/import), then issues GET /api/patients/search queries
+for seeded patients with a typo in their name (a swapped, dropped or
+replaced letter) and reports latency percentiles and how often the intended
+patient is in the top k. Needs database/patient_search.sql applied;
+without it the endpoint falls back to an unranked ILIKE scan, which is what
+this benchmark is meant to show the difference against.
+
+Usage: python benchmarks/bench_patient_search.py [seed_count] [queries] [base_url]
+"""
+
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+SEED_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+BASE_URL = sys.argv[3] if len(sys.argv) > 3 else os.getenv("API_URL", "http://localhost:8000")
+TOP_K = 10
+CONCURRENCY = 8
+SYLLABLES = ["ka", "ri", "an", "sh", "ma", "vi", "ne", "ra", "jo", "li", "su", "de", "pa", "ta", "mo", "ha", "ni", "ve", "ro", "bh"]
+
+
+def make_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_patients(rng: random.Random, tag: str, count: int):
+    for i in range(count):
+        yield {
+            "first_name": make_name(rng), "last_name": make_name(rng),
+            "email": f"search-{tag}-{i}@loadtest.example", "phone": f"9{rng.randint(100000000, 999999999)}",
+            "age": rng.randint(1, 95),
+        }
+
+
+def typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("swap", "drop", "replace"))
+    if edit == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice("aeioulnrst") + word[i + 1:]
+
+
+async def seed(client: httpx.AsyncClient, rng: random.Random, tag: str):
+    """Stream SEED_COUNT patients into the import endpoint, keeping a sample for querying"""
+    sample, rate = [], min(1.0, QUERIES * 4 / SEED_COUNT)
+
+    async def body():
+        for patient in make_patients(rng, tag, SEED_COUNT):
+            if rng.random() < rate:
+                sample.append(patient)
+            yield (json.dumps(patient) + "\n").encode()
+
+    started = time.perf_counter()
+    response = await client.post("/api/patients/import", params={"format": "jsonl", "chunk_size": 2000}, content=body(), timeout=None)
+    report = response.json()
+    print(f"  seeded {report.get('inserted')} patients in {time.perf_counter() - started:.1f} s ({report.get('status')})")
+    return sample
+
+
+async def existing_sample(client: httpx.AsyncClient):
+    response = await client.get("/api/patients/", params={"limit": 100})
+    response.raise_for_status()
+    return [p for p in response.json() if len(p.get("last_name") or "") >= 4]
+
+
+async def search(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, query: str, email: str):
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.get("/api/patients/search", params={"q": query, "limit": TOP_K})
+        elapsed = time.perf_counter() - started
+    found = response.status_code == 200 and any(p.get("email") == email for p in response.json())
+    return response.status_code, elapsed, found
+
+
+async def main():
+    rng = random.Random(11)
+    tag = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        sample = await seed(client, rng, tag) if SEED_COUNT else await existing_sample(client)
+        if not sample:
+            print("No patients to search for; pass a seed count")
+            sys.exit(1)
+
+        queries = []
+        for _ in range(QUERIES):
+            patient = rng.choice(sample)
+            queries.append((f"{patient['first_name']} {typo(rng, patient['last_name'])}", patient["email"]))
+
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        await search(client, semaphore, *queries[0])  # warm up the connection
+        started = time.perf_counter()
+        results = await asyncio.gather(*(search(client, semaphore, q, email) for q, email in queries))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for code, elapsed, _ in results if code == 200)
+    errors = sum(1 for code, _, _ in results if code != 200)
+    recall = sum(1 for _, _, found in results if found) / len(results)
+    print(f"{len(results)} typo'd name searches, top {TOP_K}, {CONCURRENCY} concurrent")
+    if latencies:
+        print(f"  latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"  throughput {len(results) / wall:.0f} req/s, errors {errors}")
+    print(f"  recall@{TOP_K}: {recall:.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Stress test: concurrent bookings for one doctor slot.
+
+Creates a department, doctor, slot (with the given capacity) and patient on
+a running server, then fires N simultaneous POST /api/appointments/
+requests for that slot. Checks that exactly `capacity` bookings succeed,
+every other one gets a 409, and the slot's booked count equals its
+capacity afterwards, i.e. the slot was never overbooked.
+
+Usage: python benchmarks/bench_slot_booking.py [concurrency] [capacity] [base_url]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+import httpx
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+CAPACITY = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+BASE_URL = sys.argv[3] if len(sys.argv) > 3 else os.getenv("API_URL", "http://localhost:8000")
+
+
+async def create(client: httpx.AsyncClient, path: str, payload: dict) -> dict:
+    response = await client.post(path, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def book(client: httpx.AsyncClient, payload: dict, start: asyncio.Event):
+    await start.wait()
+    started = time.perf_counter()
+    response = await client.post("/api/appointments/", json=payload)
+    return response.status_code, time.perf_counter() - started
+
+
+async def main():
+    tag = uuid.uuid4().hex[:8]
+    slot_date = (date.today() + timedelta(days=7)).isoformat()
+
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60, limits=limits) as client:
+        department = await create(client, "/api/departments/", {"name": f"Load test {tag}"})
+        doctor = await create(client, "/api/doctors/", {
+            "name": f"Dr. Load {tag}", "email": f"doctor-{tag}@loadtest.example", "phone": "5550100",
+            "department_id": department["id"],
+        })
+        slot = await create(client, f"/api/doctors/{doctor['id']}/slots", {
+            "doctor_id": doctor["id"], "slot_date": slot_date,
+            "start_time": "10:00:00", "end_time": "10:15:00", "capacity": CAPACITY,
+        })
+        patient = await create(client, "/api/patients/register", {
+            "first_name": "Load", "last_name": "Test", "email": f"patient-{tag}@loadtest.example",
+            "phone": "5550100", "age": 30,
+        })
+
+        payload = {
+            "patient_id": patient["id"], "doctor_id": doctor["id"], "department_id": department["id"],
+            "appointment_date": f"{slot_date}T10:00:00", "slot_id": slot["id"],
+        }
+        start = asyncio.Event()
+        tasks = [asyncio.create_task(book(client, payload, start)) for _ in range(CONCURRENCY)]
+        await asyncio.sleep(0.1)
+        start.set()
+        results = await asyncio.gather(*tasks)
+
+        slots = (await client.get(f"/api/doctors/{doctor['id']}/slots", params={"slot_date": slot_date})).json()
+        booked = next((s["booked"] for s in slots if s["id"] == slot["id"]), None)
+
+    codes = Counter(code for code, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    print(f"{CONCURRENCY} concurrent bookings for one slot (capacity {CAPACITY})")
+    print(f"  status codes: {dict(codes)}")
+    print(f"  latency p50 {statistics.median(latencies) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"  slot booked count afterwards: {booked}")
+
+    ok = codes.get(200, 0) == CAPACITY and codes.get(409, 0) == CONCURRENCY - CAPACITY and booked == CAPACITY
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
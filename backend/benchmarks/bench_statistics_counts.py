@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: counting appointments for /admin/statistics on a 1M-row table.
+
+Compares the old approach (download every matching row, then read the count)
+with count-only queries that return just the number. Uses an in-memory SQLite
+copy of the appointments table so it runs without a Supabase project; rows
+are JSON-encoded on the old path to approximate the PostgREST payload.
+
+Usage: python benchmarks/bench_statistics_counts.py [rows]
+"""
+
+import json
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DAYS = 365
+
+
+def build_table(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE appointments (
+            id INTEGER PRIMARY KEY,
+            appointment_number TEXT,
+            patient_id TEXT,
+            doctor_id TEXT,
+            department_id TEXT,
+            appointment_date TEXT,
+            status TEXT,
+            reason_for_visit TEXT,
+            priority TEXT
+        )
+    """)
+    rng = random.Random(42)
+    start = datetime.combine(date.today() - timedelta(days=DAYS - 1), datetime.min.time())
+    priorities = ["normal"] * 90 + ["urgent"] * 7 + ["emergency"] * 3
+    statuses = ["scheduled", "completed", "cancelled"]
+
+    def generate():
+        for i in range(rows):
+            when = start + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+            yield (
+                i, f"APT{i:010d}", f"pat-{i % 50000}", f"doc-{i % 500}", f"dep-{i % 6}",
+                when.isoformat(), rng.choice(statuses), "Routine check-up", rng.choice(priorities),
+            )
+
+    conn.executemany("INSERT INTO appointments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generate())
+    conn.execute("CREATE INDEX idx_appointments_date ON appointments(appointment_date)")
+    conn.execute("CREATE INDEX idx_appointments_priority_date ON appointments(priority, appointment_date)")
+    conn.commit()
+    return conn
+
+
+def old_path(conn: sqlite3.Connection, day: str, next_day: str):
+    """select("*") for today's appointments and all emergencies ever, then len()"""
+    cur = conn.execute("SELECT * FROM appointments WHERE appointment_date >= ? AND appointment_date < ?", (day, next_day))
+    today_rows = cur.fetchall()
+    json.dumps(today_rows)
+    cur = conn.execute("SELECT * FROM appointments WHERE priority = 'emergency'")
+    emergency_rows = cur.fetchall()
+    json.dumps(emergency_rows)
+    return len(today_rows), len(emergency_rows)
+
+
+def count_only_path(conn: sqlite3.Connection, day: str, next_day: str):
+    """Count-only queries with the emergency count scoped to the day"""
+    total = conn.execute(
+        "SELECT COUNT(*) FROM appointments WHERE appointment_date >= ? AND appointment_date < ?", (day, next_day)
+    ).fetchone()[0]
+    emergency = conn.execute(
+        "SELECT COUNT(*) FROM appointments WHERE priority = 'emergency' AND appointment_date >= ? AND appointment_date < ?",
+        (day, next_day),
+    ).fetchone()[0]
+    return total, emergency
+
+
+def timed(fn, *args, repeat: int = 5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    print(f"Building synthetic appointments table with {ROWS:,} rows...")
+    started = time.perf_counter()
+    conn = build_table(ROWS)
+    print(f"Built in {time.perf_counter() - started:.1f}s\n")
+
+    day = date.today().isoformat()
+    next_day = (date.today() + timedelta(days=1)).isoformat()
+
+    old_time, old_result = timed(old_path, conn, day, next_day)
+    new_time, new_result = timed(count_only_path, conn, day, next_day)
+
+    print(f"{'path':<22}{'best (ms)':>12}{'today':>10}{'emergency':>12}")
+    print(f"{'select(*) + len()':<22}{old_time * 1000:>12.1f}{old_result[0]:>10}{old_result[1]:>12}")
+    print(f"{'count-only':<22}{new_time * 1000:>12.2f}{new_result[0]:>10}{new_result[1]:>12}")
+    print(f"\nSpeedup: {old_time / new_time:.0f}x")
+    print("Note: the emergency count is now scoped to the target day, so the numbers differ by design.")
+
+
+if __name__ == "__main__":
+    main()
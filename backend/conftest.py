@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Shared test fixtures: an in-memory stand-in for the Supabase client"""
+
+import sys
+sys.path.append('.')
+
+import re
+import threading
+import uuid
+from datetime import datetime
+
+import pytest
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+def _stored(value):
+    """Values as PostgREST would hand them back: dates as ISO strings, "now()" as the current time"""
+    if value == "now()":
+        return datetime.now().isoformat()
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _like(pattern):
+    """Compile a LIKE pattern (% and _ wildcards, backslash escapes) to a case-insensitive regex"""
+    parts = re.findall(r"\\.|%|_|[^\\%_]+", pattern)
+    regex = "".join(".*" if p == "%" else "." if p == "_" else re.escape(p[-1] if p.startswith("\\") else p) for p in parts)
+    return re.compile(regex + r"\Z", re.IGNORECASE | re.DOTALL)
+
+
+class FakeSupabase:
+    """Tables of dict rows in memory, behind a lock like the database's row locks.
+
+    rpcs maps a function name to handler(client, params) returning the response data; handlers run under
+    the lock. defaults holds per-table column values for new rows (every new row also gets an id).
+    fail(op, table, rows) may return an exception for execute() to raise instead of writing. Every
+    write that reaches execute() is recorded in calls as (op, table, rows), and in writes as well once
+    it succeeds; op is insert, upsert, insert_missing (an upsert with ignore_duplicates), update or delete.
+    """
+
+    def __init__(self, tables=None, rpcs=None, defaults=None, fail=None):
+        self.tables = tables if tables is not None else {}
+        self.rpcs = rpcs or {}
+        self.defaults = defaults or {}
+        self.fail = fail
+        self.calls = []
+        self.writes = []
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params):
+        return Rpc(self, name, params)
+
+    def new_row(self, table, values):
+        return {"id": str(uuid.uuid4()), **self.defaults.get(table, {}), **values}
+
+
+class Rpc:
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params
+
+    def execute(self):
+        with self.client.lock:
+            return Result(self.client.rpcs[self.name](self.client, self.params))
+
+
+class Query:
+    """Just enough of the PostgREST builder: filters, order and limit on reads, and the write verbs"""
+
+    def __init__(self, client, table):
+        self.client, self.table_name = client, table
+        self.filters, self.ordering, self.count = [], [], None
+        self.action = ("select",)
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def insert(self, rows):
+        self.action = ("insert", rows if isinstance(rows, list) else [rows])
+        return self
+
+    def upsert(self, rows, on_conflict, ignore_duplicates=False):
+        op = "insert_missing" if ignore_duplicates else "upsert"
+        self.action = (op, rows if isinstance(rows, list) else [rows], on_conflict.split(","))
+        return self
+
+    def update(self, values):
+        self.action = ("update", values)
+        return self
+
+    def delete(self):
+        self.action = ("delete",)
+        return self
+
+    def _filter(self, column, test):
+        self.filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def in_(self, column, values):
+        return self._filter(column, lambda v: v in values)
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern)
+        return self._filter(column, lambda v: v is not None and regex.match(str(v)) is not None)
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        client = self.client
+        with client.lock:
+            rows = client.tables.setdefault(self.table_name, [])
+            op = self.action[0]
+            if op != "select":
+                written = self.action[1] if op in ("insert", "upsert", "insert_missing") else []
+                client.calls.append((op, self.table_name, written))
+                error = client.fail(op, self.table_name, written) if client.fail else None
+                if error is not None:
+                    raise error
+                client.writes.append((op, self.table_name, written))
+            if op == "insert":
+                new = [client.new_row(self.table_name, {k: _stored(v) for k, v in row.items()}) for row in written]
+                rows.extend(new)
+                return Result([dict(row) for row in new])
+            if op in ("upsert", "insert_missing"):
+                return Result(self._upsert(rows, written, self.action[2], op == "insert_missing"))
+            selected = [row for row in rows if all(f(row) for f in self.filters)]
+            if op == "update":
+                for row in selected:
+                    row.update({k: _stored(v) for k, v in self.action[1].items()})
+            elif op == "delete":
+                client.tables[self.table_name] = [row for row in rows if row not in selected]
+            for column, desc in reversed(self.ordering):
+                selected.sort(key=lambda row: row.get(column), reverse=desc)
+            if self.count is not None:
+                selected = selected[:self.count]
+            return Result([dict(row) for row in selected])
+
+    def _upsert(self, rows, new_rows, keys, ignore_duplicates):
+        written = []
+        for new in new_rows:
+            values = {k: _stored(v) for k, v in new.items()}
+            match = next((row for row in rows if all(row.get(k) == values.get(k) for k in keys)), None)
+            if match is None:
+                match = self.client.new_row(self.table_name, values)
+                rows.append(match)
+            elif ignore_duplicates:
+                continue
+            else:
+                match.update(values)
+            written.append(dict(match))
+        return written
+
+
+@pytest.fixture
+def fake_supabase():
+    """Factory for in-memory Supabase clients; see FakeSupabase for the arguments"""
+    return FakeSupabase
@@ -0,0 +1,2 @@
+-- Indexes for per-doctor feedback reads and aggregate reconciliation
+CREATE INDEX IF NOT EXISTS idx_feedback_doctor_created ON feedback(doctor_id, created_at DESC);
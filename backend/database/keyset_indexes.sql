@@ -0,0 +1,5 @@
+-- Composite indexes backing keyset (cursor) pagination on list endpoints
+CREATE INDEX IF NOT EXISTS idx_patients_registration_id ON patients(registration_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_date_id ON appointments(appointment_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_status_date_id ON appointments(status, appointment_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_doctors_created_id ON doctors(created_at, id);
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination helpers for Supabase list queries.
+
+Pages are ordered by (sort column, id) and the next page starts strictly
+after the last row of the previous one, so every page costs the same
+index range scan regardless of how deep the client has paged. Cursors are
+opaque url-safe tokens encoding that last (sort value, id) pair.
+
+Rows with a NULL sort value keep Postgres' default placement (first when
+descending, last when ascending, matching the composite indexes) and are
+paged by id alone.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Header used by endpoints whose body is a bare list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, row_id
+    except Exception:
+        raise InvalidCursor("Invalid pagination cursor")
+
+
+def quote_value(value: Any) -> str:
+    """Quote a value for a PostgREST logic tree (timestamps contain reserved characters)"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def keyset_page(
+    query,
+    sort_column: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    desc: bool = True,
+    id_column: str = "id",
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of `query` and return (rows, next_cursor).
+
+    Raises InvalidCursor for tokens that were not produced by encode_cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    op = "lt" if desc else "gt"
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if sort_value is None:
+            # Within the NULL rows only the id orders them; descending, the non-NULL rows are still to come
+            branches = [f"and({sort_column}.is.null,{id_column}.{op}.{quote_value(row_id)})"]
+            if desc:
+                branches.append(f"{sort_column}.not.is.null")
+        else:
+            branches = [
+                f"{sort_column}.{op}.{quote_value(sort_value)}",
+                f"and({sort_column}.eq.{quote_value(sort_value)},{id_column}.{op}.{quote_value(row_id)})",
+            ]
+            if not desc:
+                branches.append(f"{sort_column}.is.null")
+        # postgrest-py 0.13 has no or_() helper, so add the logic tree directly
+        query.params = query.params.add("or", f"({','.join(branches)})")
+
+    direction = ".desc" if desc else ""
+    # order() appends the direction to the last column, giving "<sort>.desc,id.desc"
+    query = query.order(f"{sort_column}{direction},{id_column}", desc=desc)
+
+    # One extra row tells us whether another page exists
+    result = query.limit(limit + 1).execute()
+    rows = result.data if result.data else []
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get(sort_column), last.get(id_column))
+    return rows, next_cursor
@@ -0,0 +1,37 @@
+-- Patient lookups (POST /api/patients/lookup) under the same normalization as the
+-- patient cache keys: case-insensitive email and E.164 phone numbers.
+
+-- Mirrors services/patient_cache.normalize_phone: keep digits, honour a leading
+-- '+' or '00', otherwise drop the trunk '0' and prefix the default country code
+CREATE OR REPLACE FUNCTION patient_phone_e164(p_phone TEXT, p_country_code TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN p_phone IS NULL THEN NULL
+        WHEN btrim(p_phone) LIKE '+%' THEN '+' || regexp_replace(p_phone, '\D', '', 'g')
+        WHEN regexp_replace(p_phone, '\D', '', 'g') LIKE '00%' THEN '+' || substr(regexp_replace(p_phone, '\D', '', 'g'), 3)
+        WHEN length(ltrim(regexp_replace(p_phone, '\D', '', 'g'), '0')) <= 10
+            THEN '+' || p_country_code || ltrim(regexp_replace(p_phone, '\D', '', 'g'), '0')
+        ELSE '+' || ltrim(regexp_replace(p_phone, '\D', '', 'g'), '0')
+    END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_patients_email_lower ON patients(lower(email));
+-- Built for the default country code (DEFAULT_COUNTRY_CODE=91); rebuild it if that changes
+CREATE INDEX IF NOT EXISTS idx_patients_phone_e164 ON patients(patient_phone_e164(phone, '91'));
+
+-- Patients matching an already-normalized email (lower-cased) or phone (E.164)
+CREATE OR REPLACE FUNCTION lookup_patients(p_email TEXT DEFAULT NULL, p_phone TEXT DEFAULT NULL, p_country_code TEXT DEFAULT '91')
+RETURNS SETOF patients
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT * FROM patients WHERE p_email IS NOT NULL AND lower(email) = p_email
+    UNION ALL
+    SELECT * FROM patients WHERE p_email IS NULL AND p_phone IS NOT NULL AND patient_phone_e164(phone, p_country_code) = p_phone;
+$$;
+
+GRANT EXECUTE ON FUNCTION patient_phone_e164(TEXT, TEXT) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION lookup_patients(TEXT, TEXT, TEXT) TO anon, authenticated, service_role;
@@ -0,0 +1,38 @@
+-- Fuzzy patient search (GET /api/patients/search) backed by a pg_trgm GIN index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Text searched for each patient: name, email, phone and patient ID
+CREATE OR REPLACE FUNCTION patient_search_text(
+    p_first_name TEXT, p_last_name TEXT, p_email TEXT, p_phone TEXT, p_patient_id TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT lower(
+        coalesce(p_first_name, '') || ' ' || coalesce(p_last_name, '') || ' ' ||
+        coalesce(p_email, '') || ' ' || coalesce(p_phone, '') || ' ' || coalesce(p_patient_id, '')
+    );
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_patients_search_trgm ON patients
+USING GIN (patient_search_text(first_name, last_name, email, phone, patient_id) gin_trgm_ops);
+
+-- Top-k patients whose name/email/phone/ID contains a word similar to the query,
+-- best match first. The <% operator is answered from idx_patients_search_trgm.
+CREATE OR REPLACE FUNCTION search_patients(p_query TEXT, p_limit INT DEFAULT 20)
+RETURNS SETOF patients
+LANGUAGE sql
+STABLE
+SET pg_trgm.word_similarity_threshold = 0.3
+AS $$
+    SELECT p.*
+    FROM patients p
+    WHERE lower(p_query) <% patient_search_text(p.first_name, p.last_name, p.email, p.phone, p.patient_id)
+    ORDER BY word_similarity(lower(p_query), patient_search_text(p.first_name, p.last_name, p.email, p.phone, p.patient_id)) DESC,
+             p.registration_date DESC
+    LIMIT p_limit;
+$$;
+
+GRANT EXECUTE ON FUNCTION patient_search_text(TEXT, TEXT, TEXT, TEXT, TEXT) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION search_patients(TEXT, INT) TO anon, authenticated, service_role;
@@ -0,0 +1,10 @@
+-- Registration is a single INSERT that relies on these indexes to reject duplicate emails
+-- (the API maps the resulting unique_violation, SQLSTATE 23505, to HTTP 400).
+-- Schemas created from schema.sql already have the plain constraint; this covers older databases.
+-- The bulk import upserts ON CONFLICT (email), which needs the plain index.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_patients_email_unique ON patients(email);
+
+-- Emails match case-insensitively everywhere else (lookup_patients, the patient cache), so
+-- Jane@x.com and jane@x.com are one patient. The API stores emails lower-cased; existing
+-- rows that differ only by case must be merged before this index can be built.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_patients_email_lower_unique ON patients(lower(email));
@@ -0,0 +1,80 @@
+"""
+Shared query helpers for aggregate reads against Supabase
+"""
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+PAGE_SIZE = 1000
+
+
+def day_bounds(target_date: date):
+    """Return the [start, end) ISO timestamps covering a calendar day"""
+    start = target_date.isoformat()
+    end = (target_date + timedelta(days=1)).isoformat()
+    return f"{start}T00:00:00", f"{end}T00:00:00"
+
+
+def count_rows(query) -> int:
+    """Execute a count-only select and return the exact row count.
+
+    The query must have been built with select("id", count="exact"); only one
+    row is transferred, the total comes from the Content-Range header.
+    """
+    result = query.limit(1).execute()
+    return result.count if getattr(result, "count", None) is not None else 0
+
+
+def fetch_all(supabase, table: str, columns: str, where: Callable = lambda query: query) -> List[Dict[str, Any]]:
+    """Read every matching row, paging by id so large tables don't hit the row limit"""
+    rows, last_id = [], None
+    while True:
+        query = where(supabase.table(table).select(columns))
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(PAGE_SIZE).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def daily_counters(supabase, target_date: date) -> Dict[str, Any]:
+    """Compute all dashboard counters for a day in as few round trips as possible.
+
+    Prefers the hospital_statistics_counters RPC (one round trip, see
+    database/statistics_counters.sql) and falls back to count-only queries
+    when the function has not been installed yet.
+    """
+    try:
+        result = supabase.rpc("hospital_statistics_counters", {"target_date": target_date.isoformat()}).execute()
+        if result.data:
+            counters = result.data[0] if isinstance(result.data, list) else result.data
+            return {
+                "total_patients_today": int(counters.get("total_patients_today") or 0),
+                "total_appointments_today": int(counters.get("total_appointments_today") or 0),
+                "emergency_cases": int(counters.get("emergency_cases") or 0),
+                "completed_visits": int(counters.get("completed_visits") or 0),
+                "available_doctors": int(counters.get("available_doctors") or 0),
+            }
+    except Exception as e:
+        print(f"[WARNING] hospital_statistics_counters RPC unavailable, using count queries: {e}")
+
+    start, end = day_bounds(target_date)
+
+    def appointments_today():
+        return (
+            supabase.table("appointments").select("id", count="exact")
+            .gte("appointment_date", start).lt("appointment_date", end)
+        )
+
+    return {
+        "total_patients_today": count_rows(
+            supabase.table("patients").select("id", count="exact").gte("registration_date", start).lt("registration_date", end)
+        ),
+        "total_appointments_today": count_rows(appointments_today().neq("status", "cancelled")),
+        "emergency_cases": count_rows(appointments_today().eq("priority", "emergency").neq("status", "cancelled")),
+        "completed_visits": count_rows(appointments_today().eq("status", "completed")),
+        "available_doctors": count_rows(
+            supabase.table("doctors").select("id", count="exact").eq("is_on_leave", False)
+        ),
+    }
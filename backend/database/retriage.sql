@@ -0,0 +1,4 @@
+-- Sessions whose ward was classified by keywords while LLM calls were being shed under load
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS needs_retriage BOOLEAN DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_needs_retriage ON chat_sessions(created_at DESC) WHERE needs_retriage;
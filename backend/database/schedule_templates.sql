@@ -0,0 +1,25 @@
+-- Weekly schedule templates, expanded server-side into doctor_slots
+CREATE TABLE IF NOT EXISTS doctor_schedule_templates (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    doctor_id UUID NOT NULL REFERENCES doctors(id) ON DELETE CASCADE,
+    weekday SMALLINT NOT NULL CHECK (weekday BETWEEN 0 AND 6), -- 0 = Monday
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    slot_minutes INT NOT NULL DEFAULT 15 CHECK (slot_minutes > 0),
+    capacity INT NOT NULL DEFAULT 1 CHECK (capacity > 0),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    CHECK (end_time > start_time)
+);
+
+CREATE INDEX IF NOT EXISTS idx_schedule_templates_doctor ON doctor_schedule_templates(doctor_id);
+
+-- Slots remember the template that generated them
+ALTER TABLE doctor_slots
+ADD COLUMN IF NOT EXISTS template_id UUID REFERENCES doctor_schedule_templates(id) ON DELETE SET NULL;
+
+-- One slot per doctor and start time; makes regeneration an idempotent upsert
+CREATE UNIQUE INDEX IF NOT EXISTS idx_doctor_slots_doctor_date_start ON doctor_slots(doctor_id, slot_date, start_time);
+
+ALTER TABLE doctor_schedule_templates DISABLE ROW LEVEL SECURITY;
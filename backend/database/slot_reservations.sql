@@ -0,0 +1,69 @@
+-- Atomic slot reservations for appointment booking
+-- A booking only succeeds if it can take one unit of a slot's capacity, so
+-- concurrent requests for the last place in a slot cannot both win.
+
+ALTER TABLE appointments
+    ADD COLUMN IF NOT EXISTS slot_id UUID REFERENCES doctor_slots(id);
+
+CREATE INDEX IF NOT EXISTS idx_appointments_slot ON appointments(slot_id);
+
+-- Take one place in a slot: either the one given, or the doctor's slot
+-- containing the appointment time. Returns
+--   {"status": "reserved", "slot": {...}}      on success,
+--   {"status": "full", "slot_id": ...}         if the slot has no room left,
+--   {"status": "time_mismatch", "slot_id": ...} if the given slot does not contain p_at,
+--   {"status": "no_slot"}                      if there is no matching slot.
+CREATE OR REPLACE FUNCTION reserve_doctor_slot(p_doctor_id UUID, p_at TIMESTAMP, p_slot_id UUID DEFAULT NULL)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    target UUID := p_slot_id;
+    reserved doctor_slots;
+BEGIN
+    IF target IS NULL THEN
+        SELECT id INTO target FROM doctor_slots
+        WHERE doctor_id = p_doctor_id AND slot_date = p_at::DATE
+          AND start_time <= p_at::TIME AND end_time > p_at::TIME
+        ORDER BY start_time DESC
+        LIMIT 1;
+        IF target IS NULL THEN
+            RETURN json_build_object('status', 'no_slot');
+        END IF;
+    END IF;
+
+    -- The row lock taken by this UPDATE serialises concurrent reservations;
+    -- each one re-checks booked < capacity against the committed count
+    UPDATE doctor_slots SET booked = booked + 1
+    WHERE id = target AND doctor_id = p_doctor_id AND is_available AND booked < capacity
+      AND slot_date = p_at::DATE AND start_time <= p_at::TIME AND end_time > p_at::TIME
+    RETURNING * INTO reserved;
+
+    IF FOUND THEN
+        RETURN json_build_object('status', 'reserved', 'slot', row_to_json(reserved));
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM doctor_slots WHERE id = target AND doctor_id = p_doctor_id
+          AND slot_date = p_at::DATE AND start_time <= p_at::TIME AND end_time > p_at::TIME
+    ) THEN
+        RETURN json_build_object('status', 'full', 'slot_id', target);
+    END IF;
+    IF EXISTS (SELECT 1 FROM doctor_slots WHERE id = target AND doctor_id = p_doctor_id) THEN
+        RETURN json_build_object('status', 'time_mismatch', 'slot_id', target);
+    END IF;
+    RETURN json_build_object('status', 'no_slot');
+END;
+$$;
+
+-- Give back a place taken by reserve_doctor_slot (cancellation or failed insert)
+CREATE OR REPLACE FUNCTION release_doctor_slot(p_slot_id UUID)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    UPDATE doctor_slots SET booked = GREATEST(booked - 1, 0)
+    WHERE id = p_slot_id
+    RETURNING row_to_json(doctor_slots.*);
+$$;
+
+GRANT EXECUTE ON FUNCTION reserve_doctor_slot(UUID, TIMESTAMP, UUID) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION release_doctor_slot(UUID) TO anon, authenticated, service_role;
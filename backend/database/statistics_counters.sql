@@ -0,0 +1,47 @@
+-- Single round-trip counters for /admin/statistics
+-- Returns every daily dashboard counter as one JSON object so the API does not
+-- have to download rows just to count them.
+CREATE OR REPLACE FUNCTION hospital_statistics_counters(target_date DATE)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_patients_today', (
+            SELECT COUNT(*) FROM patients
+            WHERE registration_date >= target_date AND registration_date < target_date + 1
+        ),
+        'total_appointments_today', (
+            SELECT COUNT(*) FROM appointments
+            WHERE status <> 'cancelled'
+              AND appointment_date >= target_date AND appointment_date < target_date + 1
+        ),
+        'emergency_cases', (
+            SELECT COUNT(*) FROM appointments
+            WHERE priority = 'emergency' AND status <> 'cancelled'
+              AND appointment_date >= target_date AND appointment_date < target_date + 1
+        ),
+        'completed_visits', (
+            SELECT COUNT(*) FROM appointments
+            WHERE status = 'completed'
+              AND appointment_date >= target_date AND appointment_date < target_date + 1
+        ),
+        'available_doctors', (
+            SELECT COUNT(*) FROM doctors WHERE is_on_leave = FALSE
+        )
+    );
+$$;
+
+-- Indexes so every counter above is an index range scan
+CREATE INDEX IF NOT EXISTS idx_patients_registration_date ON patients(registration_date);
+CREATE INDEX IF NOT EXISTS idx_appointments_priority_date ON appointments(priority, appointment_date);
+CREATE INDEX IF NOT EXISTS idx_appointments_status_date ON appointments(status, appointment_date);
+
+GRANT EXECUTE ON FUNCTION hospital_statistics_counters(DATE) TO anon, authenticated, service_role;
+
+-- One row per day so the API can upsert incrementally maintained counters
+DELETE FROM hospital_statistics a
+USING hospital_statistics b
+WHERE a.statistic_date = b.statistic_date AND a.created_at < b.created_at;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_hospital_statistics_date ON hospital_statistics(statistic_date);
@@ -1,13 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import chat, patients, appointments, doctors, admin
+from fastapi.responses import JSONResponse, ORJSONResponse
+from middleware.compression import CompressionMiddleware
+from routers import chat, patients, patient_import, appointments, doctors, admin, export
 from database import init_db
+from database.pagination import NEXT_CURSOR_HEADER
+from services.background import start_periodic
+from services import assignment, availability, feedback_stats, load_shedding, metrics, schedule, spool, statistics, symptom_router
+from services.serialization import orjson
 import sys
 
 app = FastAPI(
     title="Hospital Management System with AI Receptionist",
     version="2.0.0",
-    description="Complete hospital management platform with AI-powered patient intake"
+    description="Complete hospital management platform with AI-powered patient intake",
+    default_response_class=ORJSONResponse if orjson else JSONResponse
 )
 
 # Configure CORS
@@ -22,8 +29,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After"],
 )
 
+# Negotiated gzip/brotli; streaming-safe, so exports and event streams pass through it
+app.add_middleware(CompressionMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     try:
@@ -32,6 +43,25 @@ async def startup_event():
     except Exception as e:
         print(f"[WARNING] Database initialization failed: {e}")
         # Don't crash on startup - allow app to run without DB for now
+    
+    # Keep dashboard counters persisted and periodically reconciled
+    start_periodic("statistics-flush", statistics.FLUSH_INTERVAL_SECONDS, statistics.flush_statistics)
+    start_periodic("statistics-reconcile", statistics.RECONCILE_INTERVAL_SECONDS, statistics.reconcile_statistics)
+    # Feedback aggregates are loaded straight away rather than by the first summary request
+    start_periodic("feedback-reconcile", feedback_stats.RECONCILE_INTERVAL_SECONDS, feedback_stats.reconcile_feedback, run_first=True)
+    # Keep template-generated doctor slots rolling forward
+    start_periodic("schedule-extend", schedule.SCHEDULE_EXTEND_INTERVAL_SECONDS, schedule.extend_schedules)
+    # Reconcile the in-memory availability index with the database
+    start_periodic("availability-rebuild", availability.REBUILD_INTERVAL_SECONDS, availability.rebuild_availability)
+    # Symptom -> department matcher for intake; reloading picks up mapping edits without a restart
+    start_periodic("symptom-mapping-reload", symptom_router.RELOAD_INTERVAL_SECONDS, symptom_router.reload_symptom_mappings, run_first=True)
+    # Doctor queues for intake assignment; loaded straight away so the first patients get a doctor
+    start_periodic("assignment-rebuild", assignment.REBUILD_INTERVAL_SECONDS, assignment.rebuild_assignment, run_first=True)
+    # Event loop lag is one of the signals for shedding LLM classification
+    load_shedding.start_lag_monitor()
+    # Replay intake writes spooled while Supabase was unreachable, including any left by a previous run
+    spool.write_spool.open()
+    start_periodic("spool-replay", spool.SPOOL_REPLAY_INTERVAL_SECONDS, spool.replay_spool, run_first=True)
 
 @app.get("/")
 async def root():
@@ -46,15 +76,22 @@ async def health():
     """Health check endpoint for Render"""
     return {"status": "ok", "service": "hospital-ai-backend"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime metrics (caches, compression, ...)"""
+    return metrics.snapshot()
+
 # Include routers
 try:
     app.include_router(chat.router, prefix="/api")
     app.include_router(patients.router, prefix="/api")
+    app.include_router(patient_import.router, prefix="/api")
     app.include_router(appointments.appointments_router, prefix="/api")
     app.include_router(appointments.departments_router, prefix="/api")
     app.include_router(doctors.router, prefix="/api")
     app.include_router(admin.router, prefix="/api")
     app.include_router(admin.feedback_router, prefix="/api")
+    app.include_router(export.router, prefix="/api")
     print("[SUCCESS] All routers loaded")
 except Exception as e:
     print(f"[ERROR] Failed to load routers: {e}", file=sys.stderr)
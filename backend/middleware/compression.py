@@ -0,0 +1,229 @@
+"""
+Negotiated gzip / brotli response compression.
+
+A pure ASGI middleware, so it never buffers a streamed response: complete
+bodies above a size threshold are compressed in one go, while streamed
+bodies (exports, server-sent events) are compressed chunk by chunk with a
+sync flush after each one, so every chunk reaches the client as soon as it
+is produced. Brotli is used when the `brotli` package is installed and the
+client prefers it. Encoded responses carry a weakened ETag, since their
+bytes differ from the identity representation's.
+"""
+import asyncio
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from services import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Bodies larger than this are compressed in a worker thread instead of on the event loop
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(256 * 1024)))
+
+# Already-compressed or binary payloads that would not shrink
+UNCOMPRESSIBLE_TYPES = ("application/gzip", "application/zip", "image/", "video/", "audio/", "font/woff")
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        # wbits=31 writes a gzip container
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick the supported coding with the highest q-value (brotli wins ties)"""
+    best, best_q = None, 0.0
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding not in ENCODERS:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if q > best_q or (q == best_q and coding == "br"):
+            best, best_q = coding, q
+    return best
+
+
+class CompressionStats:
+    """Bytes in/out and compression CPU time per coding"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codings: Dict[str, Dict[str, float]] = {}
+        self.skipped = 0
+
+    def record(self, coding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, responses: int = 0):
+        with self._lock:
+            stats = self._codings.setdefault(coding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+            stats["responses"] += responses
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            stats["cpu_seconds"] += cpu_seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            codings = {}
+            for coding, stats in self._codings.items():
+                codings[coding] = {
+                    **stats,
+                    "cpu_seconds": round(stats["cpu_seconds"], 6),
+                    "ratio": round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else None,
+                }
+            return {
+                "gzip_level": GZIP_LEVEL,
+                "brotli_quality": BROTLI_QUALITY if brotli is not None else None,
+                "min_size": COMPRESSION_MIN_SIZE,
+                "skipped": self.skipped,
+                "codings": codings,
+            }
+
+
+compression_stats = CompressionStats()
+metrics.register("compression", compression_stats.snapshot)
+
+
+def _encode(encoder, data: bytes, final: bool) -> Tuple[bytes, float]:
+    started = time.thread_time()
+    out = encoder.encode(data, final)
+    return out, time.thread_time() - started
+
+
+class _CompressingSend:
+    """Wraps `send` for one response, deciding on the first body message whether to compress"""
+
+    def __init__(self, send, coding: str, minimum_size: int):
+        self.send = send
+        self.coding = coding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    def _compressible(self) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        content_type = ""
+        for name, value in self.start.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return not content_type.startswith(UNCOMPRESSIBLE_TYPES)
+
+    def _start_headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (name, value) for name, value in self.start.get("headers", [])
+            if name.lower() not in (b"content-length", b"vary", b"etag")
+        ]
+        for name, value in self.start.get("headers", []):
+            if name.lower() == b"etag":
+                # The encoded bytes differ from the identity body, so a strong validator must not
+                # be shared between them; weak comparison (If-None-Match) still matches it
+                headers.append((name, value if value.startswith(b"W/") else b"W/" + value))
+        vary = [value for name, value in self.start.get("headers", []) if name.lower() == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.coding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return headers
+
+    async def _encode(self, data: bytes, final: bool) -> bytes:
+        if len(data) > COMPRESSION_OFFLOAD_SIZE:
+            out, cpu = await asyncio.get_event_loop().run_in_executor(None, _encode, self.encoder, data, final)
+        else:
+            out, cpu = _encode(self.encoder, data, final)
+        compression_stats.record(self.coding, len(data), len(out), cpu, responses=1 if final else 0)
+        return out
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            whole = not more_body
+            if not self._compressible() or (whole and len(body) < self.minimum_size):
+                compression_stats.skipped += 1
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.coding]()
+            if whole:
+                out = await self._encode(body, True)
+                await self.send({**self.start, "headers": self._start_headers(len(out))})
+                await self.send({"type": "http.response.body", "body": out})
+                return
+            # Streamed: length is unknown up front, chunks are flushed as they come
+            await self.send({**self.start, "headers": self._start_headers(None)})
+
+        out = await self._encode(body, not more_body)
+        if out or not more_body:
+            await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        coding = negotiate(accept_encoding)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(send, coding, self.minimum_size))
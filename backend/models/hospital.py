@@ -124,11 +124,41 @@ class DoctorSlot(DoctorSlotBase):
     id: str
     booked: int
     is_available: bool
+    template_id: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+# ============ Schedule Template Models ============
+class ScheduleTemplateBase(BaseModel):
+    weekday: int  # 0 = Monday ... 6 = Sunday
+    start_time: time
+    end_time: time
+    slot_minutes: int = 15
+    capacity: int = 1
+
+class ScheduleTemplateCreate(ScheduleTemplateBase):
+    pass
+
+class ScheduleTemplateUpdate(BaseModel):
+    weekday: Optional[int] = None
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    slot_minutes: Optional[int] = None
+    capacity: Optional[int] = None
+    is_active: Optional[bool] = None
+
+class ScheduleTemplate(ScheduleTemplateBase):
+    id: str
+    doctor_id: str
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # ============ Patient Models ============
 class PatientBase(BaseModel):
     first_name: str
@@ -189,6 +219,7 @@ class AppointmentBase(BaseModel):
     appointment_date: datetime
     reason_for_visit: Optional[str] = None
     priority: Optional[Priority] = Priority.NORMAL
+    slot_id: Optional[str] = None
 
 class AppointmentCreate(AppointmentBase):
     pass
@@ -12,6 +12,11 @@ class PatientData(BaseModel):
     patient_age: Optional[int] = None
     patient_query: Optional[str] = None
     ward: Optional[Ward] = None
+    department_id: Optional[str] = None
+    priority: Optional[str] = None
+    assigned_doctor_id: Optional[str] = None
+    # Classified by keywords while the LLM was shed; staff should re-check the ward
+    needs_retriage: bool = False
 
 class ChatMessage(BaseModel):
     message: str
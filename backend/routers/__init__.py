@@ -1,4 +1,4 @@
 # Routers module
-from . import chat, patients, appointments, doctors, admin
+from . import chat, patients, patient_import, appointments, doctors, admin, export
 
-__all__ = ["chat", "patients", "appointments", "doctors", "admin"]
+__all__ = ["chat", "patients", "patient_import", "appointments", "doctors", "admin", "export"]
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
 from database import get_supabase_admin
+from database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, keyset_page
+from database.queries import count_rows, day_bounds
 from models.hospital import (
     HospitalStatistics, Feedback, FeedbackCreate,
     SuccessResponse, ErrorResponse
 )
+from services.cache import cached_json_response, conditional_json_response
+from services.events import emergency_events
+from services.feedback_stats import feedback_aggregates
+from services.serialization import render_json
+from services.singleflight import single_flight
+from services.statistics import statistics_counters
+from services.symptom_router import symptom_router
 from datetime import date, datetime, timedelta
+import asyncio
+import os
+import time
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -20,49 +33,54 @@ async def get_hospital_statistics(target_date: Optional[date] = None):
         if target_date is None:
             target_date = date.today()
         
-        # Get or create statistics record
-        result = supabase.table("hospital_statistics").select("*").eq("statistic_date", target_date.isoformat()).execute()
-        
-        if result.data and len(result.data) > 0:
-            return result.data[0]
-        
-        # Calculate statistics from other tables
-        today_str = target_date.isoformat()
-        
-        # Count patients registered today
-        patients_result = supabase.table("patients").select("*", count="exact").gte("registration_date", f"{today_str}T00:00:00").lte("registration_date", f"{today_str}T23:59:59").execute()
-        total_patients_today = patients_result.count if hasattr(patients_result, 'count') else 0
-        
-        # Count appointments today
-        appointments_result = supabase.table("appointments").select("*", count="exact").gte("appointment_date", f"{today_str}T00:00:00").lte("appointment_date", f"{today_str}T23:59:59").execute()
-        total_appointments_today = appointments_result.count if hasattr(appointments_result, 'count') else 0
-        
-        # Count emergency cases
-        emergency_result = supabase.table("appointments").select("*", count="exact").eq("priority", "emergency").execute()
-        emergency_cases = emergency_result.count if hasattr(emergency_result, 'count') else 0
-        
-        # Create and store statistics
-        stats_data = {
-            "statistic_date": today_str,
-            "total_patients_today": total_patients_today,
-            "total_appointments_today": total_appointments_today,
-            "emergency_cases": emergency_cases,
-            "completed_visits": 0,
-            "available_doctors": 0,
-            "occupied_rooms": 0
-        }
-        
-        insert_result = supabase.table("hospital_statistics").insert(stats_data).execute()
-        if insert_result.data and len(insert_result.data) > 0:
-            return insert_result.data[0]
-        
-        return HospitalStatistics(**stats_data)
+        # Served from incrementally maintained counters; first read of a day recounts it
+        return statistics_counters.get_or_load(supabase, target_date)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Simultaneous admin tabs share one overview computation for this long
+OVERVIEW_TTL_SECONDS = float(os.getenv("DASHBOARD_OVERVIEW_TTL_SECONDS", "5"))
+_overview_cache: Dict[str, Any] = {"expires_at": 0.0, "overview": None}
+
+async def _compute_dashboard_overview(supabase) -> Dict[str, Any]:
+    """Run the four independent dashboard queries concurrently"""
+    loop = asyncio.get_event_loop()
+    
+    def fetch_statistics():
+        return statistics_counters.get_or_load(supabase, date.today())
+    
+    def count_pending_appointments():
+        return count_rows(supabase.table("appointments").select("id", count="exact").eq("status", "scheduled"))
+    
+    def fetch_recent_patients():
+        result = supabase.table("patients").select("*").order("registration_date", desc=True).limit(10).execute()
+        return result.data if result.data else []
+    
+    def count_available_doctors():
+        return count_rows(supabase.table("doctors").select("id", count="exact").eq("is_on_leave", False))
+    
+    queries = {
+        "statistics": (fetch_statistics, {}),
+        "pending_appointments": (count_pending_appointments, 0),
+        "recent_patients": (fetch_recent_patients, []),
+        "available_doctors": (count_available_doctors, 0),
+    }
+    results = await asyncio.gather(
+        *(loop.run_in_executor(None, fn) for fn, _ in queries.values()),
+        return_exceptions=True
+    )
+    
+    overview = {}
+    for (key, (_, default)), value in zip(queries.items(), results):
+        if isinstance(value, Exception):
+            print(f"[WARNING] Failed to fetch {key}: {value}")
+            value = default
+        overview[key] = value
+    return overview
+
 @router.get("/dashboard/overview")
 async def get_dashboard_overview():
     """Get overall dashboard data"""
@@ -71,45 +89,17 @@ async def get_dashboard_overview():
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        today = date.today()
-        
-        try:
-            # Get today's statistics
-            stats_result = supabase.table("hospital_statistics").select("*").eq("statistic_date", today.isoformat()).execute()
-            stats = stats_result.data[0] if stats_result.data else {}
-        except Exception as e:
-            print(f"[WARNING] Failed to fetch hospital_statistics: {e}")
-            stats = {}
-        
-        try:
-            # Get pending appointments
-            pending_appointments = supabase.table("appointments").select("*").eq("status", "scheduled").execute()
-        except Exception as e:
-            print(f"[WARNING] Failed to fetch appointments: {e}")
-            pending_appointments = type('obj', (object,), {'data': []})()
-        
-        try:
-            # Get recent patients
-            recent_patients = supabase.table("patients").select("*").order("registration_date", desc=True).limit(10).execute()
-        except Exception as e:
-            print(f"[WARNING] Failed to fetch patients: {e}")
-            recent_patients = type('obj', (object,), {'data': []})()
-        
-        try:
-            # Get doctors on duty
-            doctors_result = supabase.table("doctors").select("*").eq("is_on_leave", False).execute()
-            available_doctors_count = len(doctors_result.data) if doctors_result.data else 0
-        except Exception as e:
-            print(f"[WARNING] Failed to fetch doctors: {e}")
-            available_doctors_count = 0
+        if _overview_cache["overview"] is not None and time.monotonic() < _overview_cache["expires_at"]:
+            return _overview_cache["overview"]
         
-        return {
-            "statistics": stats,
-            "pending_appointments": len(pending_appointments.data) if pending_appointments.data else 0,
-            "recent_patients": recent_patients.data if recent_patients.data else [],
-            "available_doctors": available_doctors_count
-        }
+        # Requests arriving while it is being computed wait for the same result
+        overview = await single_flight.do("dashboard_overview", None, _compute_dashboard_overview, supabase)
+        _overview_cache["overview"] = overview
+        _overview_cache["expires_at"] = time.monotonic() + OVERVIEW_TTL_SECONDS
+        return overview
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Dashboard overview error: {e}")
         import traceback
@@ -136,42 +126,75 @@ async def get_emergency_cases(days: int = Query(1)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/emergency-cases/stream")
+async def stream_emergency_cases(last_event_id: Optional[str] = Header(None)):
+    """Server-sent events for new emergency intakes and emergency appointments"""
+    return StreamingResponse(
+        emergency_events.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/patients/today")
-async def get_patients_today():
-    """Get all patients registered today"""
+async def get_patients_today(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get patients registered today, newest first, one page at a time"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
         today = date.today()
-        today_str = today.isoformat()
         
-        result = supabase.table("patients").select("*").gte("registration_date", f"{today_str}T00:00:00").lte("registration_date", f"{today_str}T23:59:59").order("registration_date", desc=True).execute()
+        def load():
+            start, end = day_bounds(today)
+            query = supabase.table("patients").select("*").gte("registration_date", start).lt("registration_date", end)
+            patients, next_cursor = keyset_page(query, "registration_date", cursor, limit)
+            return {
+                "total": statistics_counters.get_or_load(supabase, today)["total_patients_today"],
+                "patients": patients,
+                "next_cursor": next_cursor
+            }
         
-        return {
-            "total": len(result.data) if result.data else 0,
-            "patients": result.data if result.data else []
-        }
+        # Lobby screens and admin tabs refreshing together share one query per page
+        page = await single_flight.do("patients_today", (today.isoformat(), cursor, limit), load)
+        return conditional_json_response(request, render_json(page))
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/patients/all")
-async def get_all_patients():
-    """Get all patients"""
+async def get_all_patients(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get all patients, newest first, one page at a time"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("patients").select("*").order("registration_date", desc=True).execute()
+        query = supabase.table("patients").select("*")
+        patients, next_cursor = keyset_page(query, "registration_date", cursor, limit)
         
-        return {
-            "total": len(result.data) if result.data else 0,
-            "patients": result.data if result.data else []
-        }
+        return conditional_json_response(request, render_json({
+            "total": count_rows(supabase.table("patients").select("id", count="exact")),
+            "patients": patients,
+            "next_cursor": next_cursor
+        }))
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -183,23 +206,64 @@ async def get_total_patients():
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("patients").select("*", count="exact").execute()
-        return {"total_patients": result.count if hasattr(result, 'count') else 0}
+        total = count_rows(supabase.table("patients").select("id", count="exact"))
+        return {"total_patients": total}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/doctors/available")
-async def get_available_doctors():
+async def get_available_doctors(request: Request):
     """Get list of available doctors"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("doctors").select("*").eq("is_on_leave", False).execute()
-        return {"total": len(result.data) if result.data else 0, "doctors": result.data if result.data else []}
+        def load():
+            result = supabase.table("doctors").select("*").eq("is_on_leave", False).execute()
+            doctors = result.data if result.data else []
+            return {"total": len(doctors), "doctors": doctors}, {}
         
+        return await cached_json_response("doctors:available", ("doctors",), load, request=request)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/retriage")
+async def get_retriage_sessions(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Intake sessions classified by keywords while the LLM was shed, newest first"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        result = supabase.table("chat_sessions").select(
+            "session_id,patient_name,patient_age,symptoms,suggested_ward,created_at"
+        ).eq("needs_retriage", True).order("created_at", desc=True).limit(limit).execute()
+        sessions = result.data if result.data else []
+        return {"total": len(sessions), "sessions": sessions}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/symptom-mappings/reload")
+async def reload_symptom_mappings():
+    """Rebuild the in-memory symptom -> department matcher after editing symptom_department_mapping"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        await asyncio.get_event_loop().run_in_executor(None, symptom_router.load, supabase)
+        return symptom_router.stats()
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -232,6 +296,7 @@ async def submit_feedback(feedback: FeedbackCreate):
         
         result = supabase.table("feedback").insert(data).execute()
         if result.data and len(result.data) > 0:
+            feedback_aggregates.record(feedback.rating, feedback.doctor_id, result.data[0].get("id"))
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to submit feedback")
@@ -241,29 +306,36 @@ async def submit_feedback(feedback: FeedbackCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def load_feedback_aggregates(supabase):
+    """Wait for the aggregates if a request arrives before the startup load has finished"""
+    if not feedback_aggregates.loaded:
+        await single_flight.do("feedback_aggregates", "load", feedback_aggregates.ensure_loaded, supabase)
+
 @feedback_router.get("/doctor/{doctor_id}")
-async def get_doctor_feedback(doctor_id: str):
-    """Get feedback for a doctor"""
+async def get_doctor_feedback(doctor_id: str, limit: int = Query(50, ge=0, le=500)):
+    """Get feedback for a doctor (aggregates plus the most recent entries)"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("feedback").select("*").eq("doctor_id", doctor_id).execute()
-        
-        feedbacks = result.data if result.data else []
+        await load_feedback_aggregates(supabase)
+        summary = feedback_aggregates.doctor_summary(doctor_id)
         
-        if feedbacks:
-            avg_rating = sum(f['rating'] for f in feedbacks) / len(feedbacks)
-        else:
-            avg_rating = 0
+        feedbacks = []
+        if limit and summary["total_feedbacks"]:
+            result = supabase.table("feedback").select("*").eq("doctor_id", doctor_id).order("created_at", desc=True).limit(limit).execute()
+            feedbacks = result.data if result.data else []
         
         return {
-            "total_feedbacks": len(feedbacks),
-            "average_rating": round(avg_rating, 2),
+            "total_feedbacks": summary["total_feedbacks"],
+            "average_rating": summary["average_rating"],
+            "rating_distribution": summary["rating_distribution"],
             "feedbacks": feedbacks
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -289,28 +361,11 @@ async def get_feedback_summary():
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("feedback").select("*").execute()
-        
-        feedbacks = result.data if result.data else []
-        
-        if feedbacks:
-            avg_rating = sum(f['rating'] for f in feedbacks) / len(feedbacks)
-            rating_distribution = {
-                "5_stars": len([f for f in feedbacks if f['rating'] == 5]),
-                "4_stars": len([f for f in feedbacks if f['rating'] == 4]),
-                "3_stars": len([f for f in feedbacks if f['rating'] == 3]),
-                "2_stars": len([f for f in feedbacks if f['rating'] == 2]),
-                "1_stars": len([f for f in feedbacks if f['rating'] == 1])
-            }
-        else:
-            avg_rating = 0
-            rating_distribution = {"5_stars": 0, "4_stars": 0, "3_stars": 0, "2_stars": 0, "1_stars": 0}
-        
-        return {
-            "total_feedbacks": len(feedbacks),
-            "average_rating": round(avg_rating, 2),
-            "rating_distribution": rating_distribution
-        }
+        # Served from in-memory aggregates, which are loaded at startup
+        await load_feedback_aggregates(supabase)
+        return feedback_aggregates.summary()
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,42 +1,106 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from database import get_supabase_admin
+from database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, InvalidCursor, keyset_page
 from models.hospital import (
     AppointmentCreate, AppointmentUpdate, Appointment, AppointmentStatus,
     DepartmentCreate, Department, SpecializationCreate, Specialization
 )
+from services.assignment import OPEN_STATUSES, assignment_engine
+from services.availability import availability_index
+from services.booking import FULL, NO_SLOT, TIME_MISMATCH, find_slot_id, local_wall_clock, release_slot, reserve_slot
+from services.cache import cached_json_response, reference_cache
+from services.events import publish_emergency_appointment
+from services.serialization import json_response
+from services.statistics import statistics_counters
 from datetime import datetime, date
 import uuid
 
 # ============ Appointments Router ============
 appointments_router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
+def _reserve(supabase, doctor_id: str, appointment_date: datetime, slot_id: Optional[str] = None) -> Optional[dict]:
+    """Take a place in the doctor's slot, returning the reserved slot row (None if the time has no slot)"""
+    reservation = reserve_slot(supabase, doctor_id, appointment_date, slot_id)
+    if reservation["status"] == FULL:
+        raise HTTPException(status_code=409, detail="This slot is fully booked")
+    if reservation["status"] == TIME_MISMATCH:
+        raise HTTPException(status_code=400, detail="Appointment time is outside the selected slot")
+    if reservation["status"] == NO_SLOT and slot_id:
+        raise HTTPException(status_code=404, detail="Slot not found for this doctor")
+    return reservation.get("slot")
+
+def _release(supabase, appointment: dict):
+    """Give back the slot place an appointment held and update the availability index"""
+    if appointment.get("slot_id"):
+        try:
+            slot = release_slot(supabase, appointment["slot_id"])
+            if slot:
+                availability_index.upsert_slot(slot)
+        except Exception as e:
+            print(f"[WARNING] Failed to release slot {appointment['slot_id']}: {e}")
+    else:
+        availability_index.record_release(appointment.get("doctor_id"), appointment.get("appointment_date"), appointment.get("id"))
+
+def _record_change(before: dict, after: dict):
+    """Move the statistics counters and the doctor's queue by what an update actually changed"""
+    statistics_counters.record_appointment_changed(before, after)
+    was_open, is_open = before.get("status") in OPEN_STATUSES, after.get("status") in OPEN_STATUSES
+    moved = before.get("appointment_date") != after.get("appointment_date")
+    if was_open and (moved or not is_open):
+        assignment_engine.record_finished(before)
+    if is_open and (moved or not was_open):
+        assignment_engine.record_appointment(after)
+
 @appointments_router.post("/", response_model=Appointment)
 async def create_appointment(appointment: AppointmentCreate):
-    """Book a new appointment"""
+    """Book a new appointment, taking a place in the doctor's slot for that time.
+    
+    Returns 409 if the slot is already full.
+    """
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        # Generate appointment number
-        appointment_number = f"APT{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        # Generate appointment number (random suffix: many bookings can land in the same second)
+        appointment_number = f"APT{datetime.now().strftime('%y%m%d%H%M%S')}{uuid.uuid4().hex[:5].upper()}"
         
         data = {
             "appointment_number": appointment_number,
             "patient_id": appointment.patient_id,
             "doctor_id": appointment.doctor_id,
             "department_id": appointment.department_id,
-            "appointment_date": appointment.appointment_date.isoformat(),
+            # appointment_date is a TIMESTAMP without time zone, which would drop an offset
+            "appointment_date": local_wall_clock(appointment.appointment_date).isoformat(),
             "reason_for_visit": appointment.reason_for_visit,
             "priority": appointment.priority.value if appointment.priority else "normal",
             "status": "scheduled"
         }
         
-        result = supabase.table("appointments").insert(data).execute()
+        slot = _reserve(supabase, appointment.doctor_id, appointment.appointment_date, appointment.slot_id)
+        if slot:
+            data["slot_id"] = slot["id"]
+        
+        try:
+            result = supabase.table("appointments").insert(data).execute()
+        except Exception:
+            if slot:
+                _release(supabase, data)
+            raise
         if result.data and len(result.data) > 0:
+            statistics_counters.record_appointment_created(result.data[0])
+            assignment_engine.record_appointment(result.data[0])
+            if slot:
+                availability_index.upsert_slot(slot)
+            else:
+                availability_index.record_booking(result.data[0].get("doctor_id"), result.data[0].get("appointment_date"), result.data[0].get("id"))
+            if result.data[0].get("priority") == "emergency":
+                publish_emergency_appointment(result.data[0])
             return result.data[0]
         else:
+            if slot:
+                _release(supabase, data)
             raise HTTPException(status_code=500, detail="Failed to create appointment")
             
     except HTTPException:
@@ -80,11 +144,61 @@ async def update_appointment(appointment_id: str, appointment: AppointmentUpdate
                     data[field] = value
         
         data["updated_at"] = "now()"
+        if appointment.appointment_date:
+            data["appointment_date"] = local_wall_clock(appointment.appointment_date)
+        
+        current = supabase.table("appointments").select("*").eq("id", appointment_id).execute()
+        if not current.data:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        previous = current.data[0]
         
-        result = supabase.table("appointments").update(data).eq("id", appointment_id).execute()
+        # Rescheduling moves the appointment's slot place: take the new one before giving up the old
+        new_slot = None
+        status = data.get("status")
+        cancelling = status == AppointmentStatus.CANCELLED.value
+        if appointment.appointment_date and not cancelling:
+            held = previous.get("slot_id")
+            # A move within the slot it already holds keeps that place; reserving first
+            # would otherwise fail with 409 whenever that slot is full
+            if previous.get("status") != AppointmentStatus.CANCELLED.value and not (
+                held and find_slot_id(supabase, previous["doctor_id"], appointment.appointment_date) == held
+            ):
+                new_slot = _reserve(supabase, previous["doctor_id"], appointment.appointment_date)
+                if new_slot or held:
+                    data["slot_id"] = new_slot["id"] if new_slot else None
+        
+        query = supabase.table("appointments").update(data).eq("id", appointment_id)
+        finishing = status in (AppointmentStatus.CANCELLED.value, AppointmentStatus.COMPLETED.value)
+        if finishing:
+            # Only the request that actually cancels or completes it moves the counters
+            # and the doctor's queue (and, for a cancel, gives the slot place back)
+            query = query.neq("status", status)
+        try:
+            result = query.execute()
+        except Exception:
+            if new_slot:
+                _release(supabase, {"slot_id": new_slot["id"]})
+            raise
+        applied = bool(result.data)
+        if not applied and finishing:
+            # Already in that status: the update changed nothing
+            if new_slot:
+                _release(supabase, {"slot_id": new_slot["id"]})
+                new_slot = None
+            result = supabase.table("appointments").select("*").eq("id", appointment_id).execute()
         if result.data and len(result.data) > 0:
+            if applied:
+                _record_change(previous, result.data[0])
+                if cancelling:
+                    _release(supabase, result.data[0])
+                if new_slot:
+                    availability_index.upsert_slot(new_slot)
+                if "slot_id" in data:
+                    _release(supabase, previous)
             return result.data[0]
         else:
+            if new_slot:
+                _release(supabase, {"slot_id": new_slot["id"]})
             raise HTTPException(status_code=500, detail="Failed to update appointment")
             
     except HTTPException:
@@ -107,20 +221,30 @@ async def get_patient_appointments(patient_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @appointments_router.get("/", response_model=List[Appointment])
-async def get_all_appointments(status: Optional[str] = None):
-    """Get all appointments, optionally filtered by status (scheduled, confirmed, completed, cancelled, etc.)"""
+async def get_all_appointments(
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get appointments newest first, optionally filtered by status (scheduled, confirmed, completed, cancelled, etc.).
+    
+    Paginated by cursor: pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
+        query = supabase.table("appointments").select("*")
         if status:
-            result = supabase.table("appointments").select("*").eq("status", status).order("appointment_date", desc=True).execute()
-        else:
-            result = supabase.table("appointments").select("*").order("appointment_date", desc=True).execute()
+            query = query.eq("status", status)
         
-        return result.data if result.data else []
+        appointments, next_cursor = keyset_page(query, "appointment_date", cursor, limit)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response(appointments, List[Appointment], headers)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -132,11 +256,19 @@ async def cancel_appointment(appointment_id: str):
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("appointments").update({"status": "cancelled"}).eq("id", appointment_id).execute()
-        if result.data:
-            return {"message": "Appointment cancelled successfully"}
-        else:
+        current = supabase.table("appointments").select("*").eq("id", appointment_id).execute()
+        if not current.data:
             raise HTTPException(status_code=500, detail="Failed to cancel appointment")
+        
+        # Only the request that actually cancels gives the slot place back
+        result = (
+            supabase.table("appointments").update({"status": "cancelled"})
+            .eq("id", appointment_id).neq("status", "cancelled").execute()
+        )
+        if result.data:
+            _record_change(current.data[0], result.data[0])
+            _release(supabase, result.data[0])
+        return {"message": "Appointment cancelled successfully"}
             
     except HTTPException:
         raise
@@ -161,6 +293,7 @@ async def create_department(department: DepartmentCreate):
         
         result = supabase.table("departments").insert(data).execute()
         if result.data and len(result.data) > 0:
+            reference_cache.invalidate("departments")
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to create department")
@@ -171,32 +304,39 @@ async def create_department(department: DepartmentCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @departments_router.get("/", response_model=List[Department])
-async def list_departments():
+async def list_departments(request: Request):
     """List all departments"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("departments").select("*").execute()
-        return result.data if result.data else []
+        def load():
+            result = supabase.table("departments").select("*").execute()
+            return (result.data if result.data else []), {}
         
+        return await cached_json_response("departments:list", ("departments",), load, List[Department], request=request)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @departments_router.get("/{department_id}", response_model=Department)
-async def get_department(department_id: str):
+async def get_department(department_id: str, request: Request):
     """Get department details"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("departments").select("*").eq("id", department_id).execute()
-        if result.data and len(result.data) > 0:
-            return result.data[0]
-        else:
+        def load():
+            result = supabase.table("departments").select("*").eq("id", department_id).execute()
+            if result.data and len(result.data) > 0:
+                return result.data[0], {}
             raise HTTPException(status_code=404, detail="Department not found")
+        
+        return await cached_json_response(f"departments:{department_id}", ("departments",), load, Department, request=request)
             
     except HTTPException:
         raise
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from models.patient import ChatMessage, PatientData
 from workflow.graph import graph
 from database import get_supabase, get_supabase_admin
-from typing import Dict, Any
+from services.rate_limit import CHAT_MAX_IN_FLIGHT, chat_admission, client_ip
+from services.spool import write_spool
+from datetime import datetime, timezone
+from typing import Dict, Any, List
+from contextlib import asynccontextmanager
 import uuid
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
@@ -15,34 +19,68 @@ conversation_states: Dict[str, Dict[str, Any]] = {}
 # Thread pool for non-blocking database operations
 executor = ThreadPoolExecutor(max_workers=3)
 
+# Chat turns (LLM-bound) get their own threads, one per admitted turn, so slow
+# Gemini calls cannot starve the default executor the rest of the API shares
+turn_executor = ThreadPoolExecutor(max_workers=CHAT_MAX_IN_FLIGHT, thread_name_prefix="chat-turn")
+
+# One turn at a time per session: [lock, holders and waiters], dropped when unused
+_session_locks: Dict[str, List[Any]] = {}
+
+@asynccontextmanager
+async def session_turn(session_id: str):
+    """Serialize the read-invoke-store of a session's state, so a double-submit cannot lose a turn"""
+    entry = _session_locks.get(session_id)
+    if entry is None:
+        entry = _session_locks[session_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _session_locks[session_id]
+
 @router.post("/chat")
-async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
+async def chat_endpoint(chat_message: ChatMessage, request: Request) -> Dict[str, str]:
     """Handle chat messages and return AI responses (optimized for speed)"""
+    # Refuse floods and overload before spending an LLM call or a thread on them
+    rejection = chat_admission.try_acquire(chat_message.session_id, client_ip(request))
+    if rejection:
+        reason, retry_after = rejection
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many chat messages ({reason}), please retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
     try:
         session_id = chat_message.session_id
 
-        # Get or create conversation state
-        if session_id not in conversation_states:
-            conversation_states[session_id] = {
-                "messages": [],
-                "patient_data": PatientData().model_dump(),
-                "current_node": "router",
-                "session_id": session_id,
-                "router_greeting_shown": False
-            }
+        async with session_turn(session_id):
+            # Get or create conversation state
+            if session_id not in conversation_states:
+                conversation_states[session_id] = {
+                    "messages": [],
+                    "patient_data": PatientData().model_dump(),
+                    "current_node": "router",
+                    "session_id": session_id,
+                    "router_greeting_shown": False
+                }
 
-        state = conversation_states[session_id]
+            state = conversation_states[session_id]
 
-        # Add user message to state
-        from langchain_core.messages import HumanMessage
-        human_message = HumanMessage(content=chat_message.message)
-        state["messages"].append(human_message)
+            # Add user message to state
+            from langchain_core.messages import HumanMessage
+            human_message = HumanMessage(content=chat_message.message)
+            state["messages"].append(human_message)
 
-        # Process through LangGraph (this is the main slow operation)
-        result = graph.invoke(state)
+            # Process through LangGraph (this is the main slow operation); on the chat
+            # turn pool so a slow LLM call does not stall every other request. The session
+            # lock keeps a double-submit from running two turns on this state at once.
+            result = await asyncio.get_event_loop().run_in_executor(turn_executor, graph.invoke, state)
 
-        # Update stored state
-        conversation_states[session_id] = result
+            # Update stored state
+            conversation_states[session_id] = result
 
         # Get AI response - look for the last message that's not the human message
         from langchain_core.messages import AIMessage
@@ -84,7 +122,8 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
                 patient_name=patient_name,
                 patient_age=patient_age,
                 symptoms=symptoms,
-                suggested_ward=ward_value
+                suggested_ward=ward_value,
+                needs_retriage=bool(patient_data.get("needs_retriage"))
             ))
         else:
             print(f"[DEBUG] Ward not yet determined, skipping consultation save")
@@ -106,6 +145,12 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    finally:
+        chat_admission.release()
+
+def _spooled_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Row to replay later: "now()" would stamp the replay time, so record the time of the write"""
+    return {**data, "created_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat()}
 
 def store_patient_data(session_id: str, patient_data: Dict[str, Any]):
     """Store completed patient data in Supabase (blocking)"""
@@ -135,11 +180,16 @@ def store_patient_data(session_id: str, patient_data: Dict[str, Any]):
             "created_at": "now()"
         }
 
+        if write_spool.queue_if_backlogged("patient", "patients", _spooled_row(data)):
+            return
+
         # Insert data (with basic error handling)
         try:
             result = supabase_admin.table("patients").insert(data).execute()
         except Exception as insert_error:
-            pass  # Silent fail for background task
+            # Keep the record for replay rather than dropping it
+            if not write_spool.save_failed("patient", "patients", _spooled_row(data), insert_error):
+                print(f"[WARNING] Patient record for session {session_id} rejected: {insert_error}")
 
     except Exception as e:
         pass  # Silent fail for background storage
@@ -152,15 +202,15 @@ async def save_chat_to_database(session_id: str, messages: list):
     except Exception as e:
         print(f"[WARNING] Failed to save chat to database: {e}")
 
-async def save_patient_consultation(session_id: str, patient_name: str, patient_age: int, symptoms: str, suggested_ward: str):
+async def save_patient_consultation(session_id: str, patient_name: str, patient_age: int, symptoms: str, suggested_ward: str, needs_retriage: bool = False):
     """Save patient consultation details (name, age, symptoms, suggested ward) to database"""
     loop = asyncio.get_event_loop()
     try:
-        await loop.run_in_executor(executor, _save_consultation_blocking, session_id, patient_name, patient_age, symptoms, suggested_ward)
+        await loop.run_in_executor(executor, _save_consultation_blocking, session_id, patient_name, patient_age, symptoms, suggested_ward, needs_retriage)
     except Exception as e:
         print(f"[WARNING] Failed to save consultation: {e}")
 
-def _save_consultation_blocking(session_id: str, patient_name: str, patient_age: int, symptoms: str, suggested_ward: str):
+def _save_consultation_blocking(session_id: str, patient_name: str, patient_age: int, symptoms: str, suggested_ward: str, needs_retriage: bool = False):
     """Blocking function to save patient consultation data to database"""
     try:
         supabase_admin = get_supabase_admin()
@@ -203,9 +253,15 @@ def _save_consultation_blocking(session_id: str, patient_name: str, patient_age:
             print(f"[DEBUG-SAVE] Symptoms is None or empty: {symptoms}")
         if ward_value and ward_value != "None":
             consultation_data["suggested_ward"] = ward_value
+        if needs_retriage:
+            # Ward came from keywords while the LLM was shed (database/retriage.sql)
+            consultation_data["needs_retriage"] = True
         
         print(f"[DEBUG-SAVE] Final consultation data to save: {consultation_data}")
         
+        if write_spool.queue_if_backlogged("consultation", "chat_sessions", _spooled_row(consultation_data), on_conflict="session_id"):
+            return
+        
         # Try to update existing consultation, or insert new one
         try:
             # First check if session exists
@@ -224,6 +280,12 @@ def _save_consultation_blocking(session_id: str, patient_name: str, patient_age:
                 if result.data:
                     print(f"[SUCCESS] Inserted with: patient_name={result.data[0].get('patient_name')}, age={result.data[0].get('patient_age')}, symptoms={result.data[0].get('symptoms')}, ward={result.data[0].get('suggested_ward')}")
         except Exception as db_error:
+            if needs_retriage and "needs_retriage" in str(db_error):
+                # database/retriage.sql not applied yet: keep the consultation, lose only the flag
+                print("[WARNING] chat_sessions.needs_retriage missing, saving consultation without it")
+                return _save_consultation_blocking(session_id, patient_name, patient_age, symptoms, suggested_ward)
+            if write_spool.save_failed("consultation", "chat_sessions", _spooled_row(consultation_data), db_error, on_conflict="session_id"):
+                return
             print(f"[ERROR] Database operation failed: {db_error}")
             import traceback
             traceback.print_exc()
@@ -258,6 +320,9 @@ def _save_chat_blocking(session_id: str, messages: list):
             "status": "active"
         }
         
+        if write_spool.queue_if_backlogged("chat", "chat_sessions", _spooled_row(chat_data), on_conflict="session_id"):
+            return
+        
         # Try to update existing session, or insert new one
         try:
             # First check if session exists
@@ -272,7 +337,8 @@ def _save_chat_blocking(session_id: str, messages: list):
                 supabase_admin.table("chat_sessions").insert(chat_data).execute()
                 print(f"[DATABASE] Saved chat session: {session_id}")
         except Exception as db_error:
-            print(f"[WARNING] Database save failed: {db_error}")
+            if not write_spool.save_failed("chat", "chat_sessions", _spooled_row(chat_data), db_error, on_conflict="session_id"):
+                print(f"[WARNING] Database save failed: {db_error}")
     
     except Exception as e:
         print(f"[ERROR] Failed to save chat: {e}")
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from database import get_supabase_admin
+from database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, InvalidCursor, keyset_page
 from models.hospital import (
-    DoctorCreate, DoctorUpdate, Doctor, DoctorSlotCreate, DoctorSlot
+    DoctorCreate, DoctorUpdate, Doctor, DoctorSlotCreate, DoctorSlot,
+    ScheduleTemplateCreate, ScheduleTemplateUpdate, ScheduleTemplate
 )
+from services.assignment import assignment_engine
+from services.availability import availability_index
+from services.cache import cached_json_response, reference_cache
+from services.schedule import SCHEDULE_HORIZON_DAYS, generate_slots, validate_template
+from services.statistics import statistics_counters
 from datetime import date, datetime
+import asyncio
 
 router = APIRouter(prefix="/doctors", tags=["Doctors"])
 
@@ -38,6 +46,11 @@ async def create_doctor(doctor: DoctorCreate):
         
         result = supabase.table("doctors").insert(data).execute()
         if result.data and len(result.data) > 0:
+            if not result.data[0].get("is_on_leave"):
+                statistics_counters.record_doctor_availability(1)
+            reference_cache.invalidate("doctors")
+            availability_index.update_doctor(result.data[0])
+            assignment_engine.update_doctor(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to create doctor")
@@ -47,19 +60,44 @@ async def create_doctor(doctor: DoctorCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/availability/earliest")
+async def get_earliest_availability(
+    department_id: str,
+    after: Optional[datetime] = None,
+    n: int = Query(5, ge=1, le=100)
+):
+    """Earliest free slots across a department's doctors, served from the in-memory availability index"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        if not availability_index.loaded:
+            await asyncio.get_event_loop().run_in_executor(None, availability_index.ensure_loaded, supabase)
+        
+        slots = availability_index.earliest(department_id, after or datetime.now(), n)
+        return {"department_id": department_id, "total": len(slots), "slots": slots}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{doctor_id}", response_model=Doctor)
-async def get_doctor(doctor_id: str):
+async def get_doctor(doctor_id: str, request: Request):
     """Get doctor details"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        result = supabase.table("doctors").select("*").eq("id", doctor_id).execute()
-        if result.data and len(result.data) > 0:
-            return result.data[0]
-        else:
+        def load():
+            result = supabase.table("doctors").select("*").eq("id", doctor_id).execute()
+            if result.data and len(result.data) > 0:
+                return result.data[0], {}
             raise HTTPException(status_code=404, detail="Doctor not found")
+        
+        return await cached_json_response(f"doctors:{doctor_id}", ("doctors",), load, Doctor, request=request)
             
     except HTTPException:
         raise
@@ -84,8 +122,20 @@ async def update_doctor(doctor_id: str, doctor: DoctorUpdate):
         
         data["updated_at"] = "now()"
         
+        # Leave changes move the doctor in or out of today's available_doctors counter
+        was_on_leave = None
+        if "is_on_leave" in data:
+            existing = supabase.table("doctors").select("is_on_leave").eq("id", doctor_id).execute()
+            if existing.data:
+                was_on_leave = bool(existing.data[0].get("is_on_leave"))
+        
         result = supabase.table("doctors").update(data).eq("id", doctor_id).execute()
         if result.data and len(result.data) > 0:
+            if was_on_leave is not None and was_on_leave != bool(result.data[0].get("is_on_leave")):
+                statistics_counters.record_doctor_availability(1 if was_on_leave else -1)
+            reference_cache.invalidate("doctors")
+            availability_index.update_doctor(result.data[0])
+            assignment_engine.update_doctor(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to update doctor")
@@ -96,22 +146,32 @@ async def update_doctor(doctor_id: str, doctor: DoctorUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=List[Doctor])
-async def list_doctors(department_id: Optional[str] = None, skip: int = Query(0), limit: int = Query(10)):
-    """List all doctors, optionally filtered by department"""
+async def list_doctors(
+    request: Request,
+    department_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """List doctors, optionally filtered by department (cursor-paginated via X-Next-Cursor)"""
     try:
         supabase = get_supabase_admin()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        query = supabase.table("doctors").select("*")
-        
-        if department_id:
-            query = query.eq("department_id", department_id)
+        def load():
+            query = supabase.table("doctors").select("*")
+            if department_id:
+                query = query.eq("department_id", department_id)
+            doctors, next_cursor = keyset_page(query, "created_at", cursor, limit, desc=False)
+            return doctors, ({NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {})
         
-        result = query.range(skip, skip + limit - 1).execute()
-        print(f"DEBUG list_doctors: total_doctors={len(result.data) if result.data else 0}, doctors={result.data}")
-        return result.data if result.data else []
+        key = f"doctors:list:{department_id}:{cursor}:{limit}"
+        return await cached_json_response(key, ("doctors",), load, List[Doctor], request=request)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in list_doctors: {e}")
         import traceback
@@ -138,6 +198,7 @@ async def create_doctor_slot(doctor_id: str, slot: DoctorSlotCreate):
         
         result = supabase.table("doctor_slots").insert(data).execute()
         if result.data and len(result.data) > 0:
+            availability_index.upsert_slot(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to create slot")
@@ -165,3 +226,145 @@ async def get_doctor_slots(doctor_id: str, slot_date: Optional[date] = None):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+# ============ Schedule Templates ============
+
+async def _regenerate_slots(supabase, doctor_id: str, start: Optional[date] = None, days: int = SCHEDULE_HORIZON_DAYS):
+    def regenerate():
+        summary = generate_slots(supabase, doctor_id, start, days)
+        availability_index.refresh_doctor(supabase, doctor_id)
+        return summary
+    
+    return await asyncio.get_event_loop().run_in_executor(None, regenerate)
+
+@router.post("/{doctor_id}/schedule-templates", response_model=ScheduleTemplate)
+async def create_schedule_template(doctor_id: str, template: ScheduleTemplateCreate):
+    """Add a weekly schedule template and generate its slots"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        error = validate_template(template.model_dump())
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        
+        data = {
+            "doctor_id": doctor_id,
+            "weekday": template.weekday,
+            "start_time": template.start_time.isoformat(),
+            "end_time": template.end_time.isoformat(),
+            "slot_minutes": template.slot_minutes,
+            "capacity": template.capacity,
+            "is_active": True
+        }
+        
+        result = supabase.table("doctor_schedule_templates").insert(data).execute()
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to create schedule template")
+        
+        await _regenerate_slots(supabase, doctor_id)
+        return result.data[0]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{doctor_id}/schedule-templates", response_model=List[ScheduleTemplate])
+async def list_schedule_templates(doctor_id: str):
+    """List a doctor's schedule templates"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        result = supabase.table("doctor_schedule_templates").select("*").eq("doctor_id", doctor_id).order("weekday").execute()
+        return result.data if result.data else []
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{doctor_id}/schedule-templates/{template_id}", response_model=ScheduleTemplate)
+async def update_schedule_template(doctor_id: str, template_id: str, template: ScheduleTemplateUpdate):
+    """Change a schedule template and regenerate the doctor's upcoming slots"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        existing = supabase.table("doctor_schedule_templates").select("*").eq("id", template_id).eq("doctor_id", doctor_id).execute()
+        if not existing.data:
+            raise HTTPException(status_code=404, detail="Schedule template not found")
+        
+        data = {}
+        for field, value in template.model_dump().items():
+            if value is not None:
+                data[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+        
+        error = validate_template({**existing.data[0], **data})
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        
+        data["updated_at"] = "now()"
+        result = supabase.table("doctor_schedule_templates").update(data).eq("id", template_id).execute()
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to update schedule template")
+        
+        await _regenerate_slots(supabase, doctor_id)
+        return result.data[0]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{doctor_id}/schedule-templates/{template_id}")
+async def delete_schedule_template(doctor_id: str, template_id: str):
+    """Deactivate a schedule template and remove its unbooked upcoming slots"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        result = supabase.table("doctor_schedule_templates").update({"is_active": False, "updated_at": "now()"}).eq("id", template_id).eq("doctor_id", doctor_id).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Schedule template not found")
+        
+        summary = await _regenerate_slots(supabase, doctor_id)
+        return {"success": True, "message": "Schedule template deactivated", "slots": summary}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{doctor_id}/slots/generate")
+async def regenerate_doctor_slots(
+    doctor_id: str,
+    start_date: Optional[date] = None,
+    days: int = Query(SCHEDULE_HORIZON_DAYS, ge=1, le=366)
+):
+    """Regenerate a doctor's slots from their templates (idempotent)"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        summary = await _regenerate_slots(supabase, doctor_id, start_date, days)
+        return {"doctor_id": doctor_id, "start_date": (start_date or date.today()).isoformat(), "days": days, **summary}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============ Walk-in Queue ============
+
+@router.post("/{doctor_id}/queue/seen")
+async def mark_walk_in_seen(doctor_id: str):
+    """Mark the next walk-in assigned to this doctor by intake as seen"""
+    queue_length = assignment_engine.record_seen(doctor_id)
+    if queue_length is None:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return {"doctor_id": doctor_id, "queue_length": queue_length}
@@ -0,0 +1,162 @@
+"""
+Streaming exports of large tables for admin reporting.
+
+Rows are read server-side in pages and written straight to the response as
+NDJSON or CSV, optionally gzip-compressed, so memory stays constant no
+matter how large the table grows. The id keyspace is split into UUID ranges
+that are scanned in parallel (keyset pages within each range) and emitted
+in range order.
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
+from database import get_supabase_admin
+from datetime import date
+import asyncio
+import csv
+import io
+import json
+import os
+import zlib
+
+router = APIRouter(prefix="/admin/export", tags=["Admin"])
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+EXPORT_PARTITIONS = 16
+EXPORT_PARALLELISM = int(os.getenv("EXPORT_PARALLELISM", "4"))
+# Pages a partition may buffer ahead of the writer
+EXPORT_PREFETCH_PAGES = 2
+
+EXPORTABLE_TABLES = {"patients", "appointments", "chat_sessions"}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _uuid_partitions(count: int) -> List[tuple]:
+    """Split the UUID keyspace into `count` contiguous [lo, hi) ranges"""
+    bounds = [None] + [f"{(i * 0x100 // count):02x}000000-0000-0000-0000-000000000000" for i in range(1, count)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _fetch_page(supabase, table: str, columns: str, lo: Optional[str], hi: Optional[str], after: Optional[str]):
+    query = supabase.table(table).select(columns)
+    if after is not None:
+        query = query.gt("id", after)
+    elif lo is not None:
+        query = query.gte("id", lo)
+    if hi is not None:
+        query = query.lt("id", hi)
+    result = query.order("id").limit(EXPORT_PAGE_SIZE).execute()
+    return result.data if result.data else []
+
+
+async def _scan_partition(supabase, table: str, columns: str, lo, hi, queue: asyncio.Queue, slots: asyncio.Semaphore):
+    loop = asyncio.get_event_loop()
+    try:
+        async with slots:
+            after = None
+            while True:
+                rows = await loop.run_in_executor(None, _fetch_page, supabase, table, columns, lo, hi, after)
+                if rows:
+                    await queue.put(rows)
+                if len(rows) < EXPORT_PAGE_SIZE:
+                    break
+                after = rows[-1]["id"]
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def iter_table_pages(supabase, table: str, columns: str = "*") -> AsyncIterator[List[Dict]]:
+    """Yield pages of a table, scanning several id ranges concurrently"""
+    partitions = _uuid_partitions(EXPORT_PARTITIONS)
+    slots = asyncio.Semaphore(EXPORT_PARALLELISM)
+    queues = [asyncio.Queue(maxsize=EXPORT_PREFETCH_PAGES) for _ in partitions]
+    tasks = [
+        asyncio.create_task(_scan_partition(supabase, table, columns, lo, hi, queue, slots))
+        for (lo, hi), queue in zip(partitions, queues)
+    ]
+    try:
+        for queue in queues:
+            while True:
+                page = await queue.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _ndjson_lines(rows: List[Dict]) -> str:
+    return "".join(json.dumps(row, default=str, ensure_ascii=False) + "\n" for row in rows)
+
+
+class _CsvEncoder:
+    """Encode pages as CSV, taking the header from the first row seen"""
+
+    def __init__(self):
+        self.fieldnames = None
+
+    def encode(self, rows: List[Dict]) -> str:
+        buffer = io.StringIO()
+        if self.fieldnames is None:
+            self.fieldnames = list(rows[0].keys())
+            writer = csv.DictWriter(buffer, fieldnames=self.fieldnames, extrasaction="ignore")
+            writer.writeheader()
+        else:
+            writer = csv.DictWriter(buffer, fieldnames=self.fieldnames, extrasaction="ignore")
+        for row in rows:
+            writer.writerow({
+                key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                for key, value in row.items()
+            })
+        return buffer.getvalue()
+
+
+async def _export_stream(supabase, table: str, columns: str, fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    encode = _ndjson_lines if fmt == "ndjson" else _CsvEncoder().encode
+    # wbits=31 writes a gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    async for page in iter_table_pages(supabase, table, columns):
+        chunk = encode(page).encode("utf-8")
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+@router.get("/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+    columns: str = Query("*", description="Comma-separated column list")
+):
+    """Stream a full table export as NDJSON or CSV (optionally gzip-compressed)"""
+    if table not in EXPORTABLE_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{table}'")
+
+    supabase = get_supabase_admin()
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+
+    if columns != "*" and "id" not in [c.strip() for c in columns.split(",")]:
+        # Pagination is keyed on id
+        columns = f"id,{columns}"
+
+    filename = f"{table}-{date.today().isoformat()}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _export_stream(supabase, table, columns, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
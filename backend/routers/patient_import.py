@@ -0,0 +1,278 @@
+"""
+Bulk patient import from a streamed CSV or JSONL upload.
+
+The request body is parsed as it arrives: every row is validated against
+PatientCreate and valid rows are inserted in chunks while the upload is
+still streaming, so only one chunk of rows is held at a time. Emails are
+de-duplicated within the batch against the most recent
+IMPORT_MAX_TRACKED_EMAILS addresses, which caps that memory too; an older
+duplicate, like an email that already exists in the database, is skipped
+by the unique index on patients.email. Progress of a running import can be
+polled by its job id.
+"""
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from database import get_supabase_admin
+from models.hospital import PatientCreate
+from pydantic import ValidationError
+from routers.patients import on_patient_registered, patient_row
+import asyncio
+import codecs
+import csv
+import json
+import os
+import time
+import uuid
+
+router = APIRouter(prefix="/patients/import", tags=["Patients"])
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+# Emails remembered for in-batch duplicate reports; older ones fall back to the unique index
+IMPORT_MAX_TRACKED_EMAILS = int(os.getenv("IMPORT_MAX_TRACKED_EMAILS", "100000"))
+# Per-row errors kept in the report; further errors are only counted
+IMPORT_MAX_ERRORS = 1000
+# Finished jobs kept around for polling
+IMPORT_JOBS_RETAINED = 100
+
+
+class ImportJob:
+    def __init__(self, job_id: str, fmt: str, chunk_size: int):
+        self.job_id = job_id
+        self.format = fmt
+        self.chunk_size = chunk_size
+        self.status = "running"
+        self.rows_read = 0
+        self.inserted = 0
+        self.skipped_existing = 0
+        self.duplicates_in_batch = 0
+        self.invalid = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def error(self, line: int, email: Optional[str], message: str):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "email": email, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "format": self.format,
+            "chunk_size": self.chunk_size,
+            "rows_read": self.rows_read,
+            "inserted": self.inserted,
+            "skipped_existing": self.skipped_existing,
+            "duplicates_in_batch": self.duplicates_in_batch,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_read / elapsed, 1) if elapsed > 0 else None,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+
+
+def _register_job(job: ImportJob):
+    jobs[job.job_id] = job
+    while len(jobs) > IMPORT_JOBS_RETAINED:
+        oldest = next(iter(jobs))
+        if jobs[oldest].status == "running":
+            break
+        jobs.pop(oldest)
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    """Decode the request body incrementally and yield complete lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _iter_jsonl(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    line_number = 0
+    async for line in _iter_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    header: Optional[List[str]] = None
+    record, record_line, line_number = "", 0, 0
+    async for line in _iter_lines(request):
+        line_number += 1
+        if not record:
+            record_line = line_number
+        record = f"{record}\n{line}" if record else line
+        # A quoted field may span lines; wait until its quotes are balanced
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record])), ""
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if not any(value.strip() for value in values):
+            continue
+        if len(values) != len(header):
+            yield record_line, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells mean "not provided"
+        yield record_line, {name: (value if value.strip() else None) for name, value in zip(header, values)}
+    if record:
+        yield record_line, ValueError("Unterminated quoted field")
+
+
+def _insert_chunk(supabase, rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Dict], List[Tuple[int, Dict, str]]]:
+    """Insert a chunk, returning (inserted rows, [(line, row, error)]).
+
+    Existing emails are skipped by the unique index; if the chunk fails as a
+    whole it is retried row by row so errors can be attributed to lines.
+    """
+    payload = [row for _, row in rows]
+    try:
+        result = supabase.table("patients").upsert(payload, on_conflict="email", ignore_duplicates=True).execute()
+        return (result.data or []), []
+    except Exception:
+        pass
+
+    inserted, failures = [], []
+    for line, row in rows:
+        try:
+            result = supabase.table("patients").upsert(row, on_conflict="email", ignore_duplicates=True).execute()
+            inserted.extend(result.data or [])
+        except Exception as e:
+            failures.append((line, row, str(e)))
+    return inserted, failures
+
+
+async def _flush(supabase, job: ImportJob, chunk: List[Tuple[int, Dict[str, Any]]]):
+    inserted, failures = await asyncio.get_event_loop().run_in_executor(None, _insert_chunk, supabase, chunk)
+
+    # Bulk rows are not worth an LRU slot each; just drop lookups they would change
+    for row in inserted:
+        on_patient_registered(row, cache_row=False)
+
+    failed_lines = {line for line, _, _ in failures}
+    inserted_emails = {row.get("email") for row in inserted}
+    for line, row, message in failures:
+        job.failed += 1
+        job.error(line, row.get("email"), message)
+    for line, row in chunk:
+        if line in failed_lines:
+            continue
+        if row["email"] in inserted_emails:
+            # Each inserted row accounts for the first line with its email; later ones were skipped
+            inserted_emails.discard(row["email"])
+            continue
+        job.skipped_existing += 1
+        job.error(line, row["email"], "Patient with this email already exists")
+    job.inserted += len(inserted)
+
+
+async def run_import(supabase, request: Request, job: ImportJob):
+    records = _iter_csv(request) if job.format == "csv" else _iter_jsonl(request)
+    seen_emails: Dict[str, int] = {}
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+
+    async for line, record in records:
+        job.rows_read += 1
+        if isinstance(record, Exception):
+            job.invalid += 1
+            job.error(line, None, f"Unparseable row: {record}")
+            continue
+        if not isinstance(record, dict):
+            job.invalid += 1
+            job.error(line, None, "Row must be an object")
+            continue
+
+        try:
+            patient = PatientCreate.model_validate(record)
+        except ValidationError as e:
+            job.invalid += 1
+            problems = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            job.error(line, record.get("email"), problems)
+            continue
+
+        email_key = patient.email.strip().lower()
+        if email_key in seen_emails:
+            job.duplicates_in_batch += 1
+            job.error(line, patient.email, f"Duplicate email in batch (first seen on line {seen_emails[email_key]})")
+            continue
+        seen_emails[email_key] = line
+        if len(seen_emails) > IMPORT_MAX_TRACKED_EMAILS:
+            del seen_emails[next(iter(seen_emails))]
+
+        chunk.append((line, patient_row(patient)))
+        if len(chunk) >= job.chunk_size:
+            await _flush(supabase, job, chunk)
+            chunk = []
+
+    if chunk:
+        await _flush(supabase, job, chunk)
+
+
+@router.post("")
+async def import_patients(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=5000),
+    job_id: Optional[str] = Query(None, description="Client-chosen id to poll progress while the upload runs")
+):
+    """Import patients from a streamed CSV (with header row) or JSONL body"""
+    try:
+        supabase = get_supabase_admin()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+
+        job_id = job_id or uuid.uuid4().hex
+        if job_id in jobs and jobs[job_id].status == "running":
+            raise HTTPException(status_code=409, detail="An import with this job id is already running")
+
+        job = ImportJob(job_id, format, chunk_size)
+        _register_job(job)
+        try:
+            await run_import(supabase, request, job)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error(0, None, str(e))
+        finally:
+            job.finished_at = time.time()
+
+        print(f"[INFO] Patient import {job_id}: {job.inserted} inserted, {job.error_count} rejected ({job.status})")
+        return job.to_dict()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{job_id}")
+async def get_import_status(job_id: str):
+    """Progress (or final report) of a patient import"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
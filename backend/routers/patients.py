@@ -1,16 +1,27 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Any, Dict, List, Optional, Tuple
 from database import get_supabase_admin
+from database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, InvalidCursor, quote_value, keyset_page
 from models.hospital import (
     PatientCreate, PatientUpdate, Patient, PatientLookup,
     SuccessResponse, ErrorResponse
 )
+from services.booking import is_missing_function
+from services.cache import conditional_json_response
+from services.patient_cache import DEFAULT_COUNTRY_CODE, lookup_key, patient_cache
+from services.serialization import json_response, render_json
+from services.statistics import statistics_counters
 import uuid
 import os
 from supabase import create_client
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
+# Characters with meaning in a PostgREST or= filter, dropped from the ILIKE fallback term
+SEARCH_STRIP = str.maketrans("", "", ",()*")
+_warned_search_fallback = False
+_warned_lookup_fallback = False
+
 def get_fresh_admin_client():
     """Create a fresh admin client to avoid cached permissions"""
     url = os.getenv("SUPABASE_URL")
@@ -20,64 +31,106 @@ def get_fresh_admin_client():
         return None
     return create_client(url, key)
 
+def patient_row(patient: PatientCreate) -> dict:
+    """Insert payload for a new patient"""
+    return {
+        "first_name": patient.first_name,
+        "last_name": patient.last_name,
+        # Stored lower-cased, the form lookups and the unique indexes compare
+        "email": patient.email.strip().lower(),
+        "phone": patient.phone,
+        "age": patient.age,
+        "gender": patient.gender.value if patient.gender else None,
+        "blood_group": patient.blood_group,
+        "address": patient.address,
+        "emergency_contact_name": patient.emergency_contact_name,
+        "emergency_contact_phone": patient.emergency_contact_phone,
+        "medical_history": patient.medical_history,
+        "allergies": patient.allergies,
+        "has_emergency_flag": patient.has_emergency_flag or False,
+        "emergency_description": patient.emergency_description,
+        "preferred_department_id": patient.preferred_department_id,
+        "registration_date": "now()"
+    }
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so an ilike filter matches the value literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def find_patients(supabase, kind: str, value: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """Patients matching a lookup, normalized exactly like its cache key.
+
+    Returns (rows, cacheable); rows that could not be matched under the
+    normalized key must not be cached under it.
+    """
+    global _warned_lookup_fallback
+    _, normalized = lookup_key(kind, value)
+    if kind == "patient_id":
+        return supabase.table("patients").select("*").eq(kind, normalized).execute().data or [], True
+    try:
+        params = {"p_email": None, "p_phone": None, "p_country_code": DEFAULT_COUNTRY_CODE}
+        params[f"p_{kind}"] = normalized
+        return supabase.rpc("lookup_patients", params).execute().data or [], True
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        # database/patient_lookup.sql not applied yet
+        if not _warned_lookup_fallback:
+            print(f"[WARNING] lookup_patients RPC unavailable, falling back to direct filters: {e}")
+            _warned_lookup_fallback = True
+    if kind == "email":
+        return supabase.table("patients").select("*").ilike("email", escape_like(normalized)).execute().data or [], True
+    # Stored numbers cannot be normalized in a plain filter; match as typed and keep it out of the cache
+    return supabase.table("patients").select("*").eq("phone", value.strip()).execute().data or [], False
+
+# Unique constraints on patients.email: the indexes from patients_email_unique.sql and the column constraint in schema.sql
+EMAIL_UNIQUE_CONSTRAINTS = ("idx_patients_email_unique", "idx_patients_email_lower_unique", "patients_email_key")
+
+def is_unique_violation(error: Exception) -> bool:
+    """True for Postgres unique_violation (23505) on any constraint"""
+    return getattr(error, "code", None) == "23505" or "23505" in str(error) or "duplicate key" in str(error).lower()
+
+def is_duplicate_email(error: Exception) -> bool:
+    """True when the unique_violation names one of the patients.email constraints"""
+    return is_unique_violation(error) and any(name in str(error) for name in EMAIL_UNIQUE_CONSTRAINTS)
+
+def is_permission_denied(error: Exception) -> bool:
+    return getattr(error, "code", None) == "42501" or "42501" in str(error) or "permission denied" in str(error).lower()
+
+def on_patient_registered(row: dict, cache_row: bool = True):
+    statistics_counters.record_patient_registered(row.get("registration_date"))
+    if cache_row:
+        patient_cache.remember(row)
+    else:
+        patient_cache.invalidate(row)
+
 @router.post("/register", response_model=Patient)
 async def register_patient(patient: PatientCreate):
-    """Register a new patient"""
+    """Register a new patient (duplicate emails are rejected by the unique index on patients.email)"""
     try:
         # Use fresh client to avoid any caching issues
         supabase = get_fresh_admin_client()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
-        # Check if patient already exists
         try:
-            existing = supabase.table("patients").select("*").eq("email", patient.email).execute()
-            if existing.data and len(existing.data) > 0:
-                raise HTTPException(status_code=400, detail="Patient with this email already exists")
-        except Exception as check_error:
-            print(f"[DEBUG] Existing patient check error (continuing): {check_error}")
-        
-        data = {
-            "first_name": patient.first_name,
-            "last_name": patient.last_name,
-            "email": patient.email,
-            "phone": patient.phone,
-            "age": patient.age,
-            "gender": patient.gender.value if patient.gender else None,
-            "blood_group": patient.blood_group,
-            "address": patient.address,
-            "emergency_contact_name": patient.emergency_contact_name,
-            "emergency_contact_phone": patient.emergency_contact_phone,
-            "medical_history": patient.medical_history,
-            "allergies": patient.allergies,
-            "has_emergency_flag": patient.has_emergency_flag or False,
-            "emergency_description": patient.emergency_description,
-            "preferred_department_id": patient.preferred_department_id,
-            "registration_date": "now()"
-        }
-        
-        try:
-            print(f"[DEBUG] Attempting patient registration with data: {data.get('email')}")
-            result = supabase.table("patients").insert(data).execute()
-            if result.data and len(result.data) > 0:
-                print(f"[SUCCESS] Patient registered: {result.data[0].get('patient_id', 'unknown')}")
-                return result.data[0]
-            else:
-                raise HTTPException(status_code=500, detail="Failed to register patient")
+            result = supabase.table("patients").insert(patient_row(patient)).execute()
         except Exception as db_error:
-            error_str = str(db_error).lower()
-            print(f"[DEBUG] Insert attempt 1 failed: {db_error}")
-            if "permission denied" in error_str or "42501" in str(db_error):
-                print(f"[WARNING] RLS permission error detected - trying alternative approach")
-                try:
-                    # Retry with count parameter
-                    result = supabase.table("patients").insert(data, count='exact').execute()
-                    if result.data and len(result.data) > 0:
-                        print(f"[SUCCESS] Patient registered after count retry: {result.data[0].get('patient_id', 'unknown')}")
-                        return result.data[0]
-                except Exception as retry_error:
-                    print(f"[DEBUG] Count retry also failed: {retry_error}")
+            if is_duplicate_email(db_error):
+                raise HTTPException(status_code=400, detail="Patient with this email already exists")
+            if is_unique_violation(db_error):
+                raise HTTPException(status_code=400, detail="Patient conflicts with an existing record")
+            if is_permission_denied(db_error):
+                print(f"[ERROR] Patient insert denied by RLS: {db_error}")
+                raise HTTPException(status_code=500, detail="Database write failed: permission denied. RLS might still be enabled.")
             raise
+        
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to register patient")
+        
+        print(f"[SUCCESS] Patient registered: {result.data[0].get('patient_id', 'unknown')}")
+        on_patient_registered(result.data[0])
+        return result.data[0]
             
     except HTTPException:
         raise
@@ -89,26 +142,30 @@ async def register_patient(patient: PatientCreate):
 
 @router.post("/lookup", response_model=List[Patient])
 async def lookup_patient(email: Optional[str] = Query(None), phone: Optional[str] = Query(None), patient_id: Optional[str] = Query(None)):
-    """Look up existing patient by email, phone, or patient ID"""
+    """Look up existing patient by email, phone, or patient ID (served from the patient cache when possible)"""
     try:
-        supabase = get_fresh_admin_client()
-        if not supabase:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
-        query = supabase.table("patients").select("*")
-        
         if email:
-            query = query.eq("email", email)
+            kind, value = "email", email
         elif phone:
-            query = query.eq("phone", phone)
+            kind, value = "phone", phone
         elif patient_id:
-            query = query.eq("patient_id", patient_id)
+            kind, value = "patient_id", patient_id
         else:
             raise HTTPException(status_code=400, detail="Provide email, phone, or patient_id for lookup")
         
-        result = query.execute()
-        print(f"DEBUG lookup_patient: email={email}, phone={phone}, patient_id={patient_id}, result={result.data}")
-        return result.data if result.data else []
+        cached = patient_cache.get(kind, value)
+        if cached is not None:
+            return cached
+        
+        supabase = get_fresh_admin_client()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+        
+        generation = patient_cache.generation()
+        rows, cacheable = find_patients(supabase, kind, value)
+        if cacheable:
+            patient_cache.put(kind, value, rows, generation)
+        return rows
         
     except HTTPException:
         raise
@@ -142,16 +199,56 @@ async def debug_all_patients():
             "error": str(e)
         }
 
+@router.get("/search", response_model=List[Patient])
+async def search_patients(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Fuzzy search by name, email, phone or patient ID, best matches first (tolerates typos)"""
+    global _warned_search_fallback
+    try:
+        supabase = get_fresh_admin_client()
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
+
+        try:
+            result = supabase.rpc("search_patients", {"p_query": q.strip(), "p_limit": limit}).execute()
+            return json_response(result.data or [], List[Patient])
+        except Exception as e:
+            if not is_missing_function(e):
+                raise
+            # database/patient_search.sql not applied yet: substring match without ranking
+            if not _warned_search_fallback:
+                print(f"[WARNING] search_patients RPC unavailable, falling back to ILIKE: {e}")
+                _warned_search_fallback = True
+
+        term = quote_value(f"*{q.strip().translate(SEARCH_STRIP)}*")
+        query = supabase.table("patients").select("*")
+        query.params = query.params.add("or", f"(first_name.ilike.{term},last_name.ilike.{term},email.ilike.{term},phone.ilike.{term},patient_id.ilike.{term})")
+        result = query.order("registration_date", desc=True).limit(limit).execute()
+        return json_response(result.data or [], List[Patient])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{patient_id}", response_model=Patient)
 async def get_patient(patient_id: str):
     """Get patient details by ID"""
     try:
+        cached = patient_cache.get("patient_id", patient_id)
+        if cached:
+            return cached[0]
+        
         supabase = get_fresh_admin_client()
         if not supabase:
             raise HTTPException(status_code=500, detail="Database connection failed")
         
+        generation = patient_cache.generation()
         result = supabase.table("patients").select("*").eq("patient_id", patient_id).execute()
         if result.data and len(result.data) > 0:
+            patient_cache.put("patient_id", patient_id, result.data[:1], generation)
             return result.data[0]
         else:
             raise HTTPException(status_code=404, detail="Patient not found")
@@ -187,6 +284,9 @@ async def update_patient(patient_id: str, patient: PatientUpdate):
         
         result = supabase.table("patients").update(data).eq("patient_id", patient_id).execute()
         if result.data and len(result.data) > 0:
+            # Drop entries under the old email/phone, then cache the updated row
+            patient_cache.invalidate(existing.data[0])
+            patient_cache.remember(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to update patient")
@@ -197,11 +297,25 @@ async def update_patient(patient_id: str, patient: PatientUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=List[Patient])
-async def list_patients(skip: int = Query(0), limit: int = Query(10)):
-    """List all patients with pagination"""
+async def list_patients(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """List patients newest first (cursor-paginated via X-Next-Cursor)"""
     try:
         supabase = get_fresh_admin_client()
-        return result.data if result.data else []
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
+        patients, next_cursor = keyset_page(supabase.table("patients").select("*"), "registration_date", cursor, limit)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        # Patient rows change through paths that never touch the cache, so the ETag is the body's hash
+        return conditional_json_response(request, render_json(patients, List[Patient]), headers)
+        
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,295 @@
+"""
+Doctor assignment for patients routed by the intake workflow.
+
+Once handle_ward_logic has picked a ward, the patient is assigned to the
+doctor in a matching department with the shortest queue today, ties going
+to whoever has the earliest free slot. Each department keeps a min-heap
+keyed on (queue length, next free slot); changes push a fresh entry and
+bump the doctor's version, and stale entries are discarded lazily when
+they reach the top, so both assignments and updates are O(log n).
+
+Queues count today's open appointments plus walk-in assignments made
+here. They are updated in place when appointments are created, completed
+or cancelled, and rebuilt from Supabase periodically and at midnight.
+Next free slots come from the availability index, which is loaded before
+the first build; doctors are re-keyed whenever that index is rebuilt.
+"""
+import heapq
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database import get_supabase_admin
+from database.queries import fetch_all
+from services import metrics
+from services.availability import availability_index
+
+REBUILD_INTERVAL_SECONDS = float(os.getenv("ASSIGNMENT_REBUILD_SECONDS", "300"))
+
+OPEN_STATUSES = ("scheduled", "confirmed", "in-progress")
+
+# Department names that serve each ward; a ward with no matching department may use any
+WARD_DEPARTMENT_KEYWORDS = {
+    "general": ("general", "medicine", "family"),
+    "emergency": ("emergency", "casualty", "trauma", "accident"),
+    "mental_health": ("mental", "psych", "behavioral", "behavioural"),
+}
+
+# Sort key for doctors with no free slot in the availability window
+NO_FREE_SLOT = float("inf")
+
+
+def _as_day(value: Any) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DoctorLoad:
+    __slots__ = ("doctor_id", "name", "department_id", "on_leave", "leave_start", "leave_end",
+                 "appointments", "walk_ins", "next_free", "version")
+
+    def __init__(self, doctor_id: str):
+        self.doctor_id = doctor_id
+        self.name: Optional[str] = None
+        self.department_id: Optional[str] = None
+        self.on_leave = False
+        self.leave_start: Optional[int] = None
+        self.leave_end: Optional[int] = None
+        self.appointments = 0
+        self.walk_ins = 0
+        self.next_free = NO_FREE_SLOT
+        self.version = 0
+
+    @property
+    def queue(self) -> int:
+        return self.appointments + self.walk_ins
+
+    def set_row(self, row: Dict[str, Any]):
+        self.name = row.get("name", self.name)
+        self.department_id = row.get("department_id")
+        self.on_leave = bool(row.get("is_on_leave"))
+        self.leave_start = _as_day(row["leave_start_date"]) if row.get("leave_start_date") else None
+        self.leave_end = _as_day(row["leave_end_date"]) if row.get("leave_end_date") else None
+
+    def away_on(self, day: int) -> bool:
+        if not self.on_leave:
+            return False
+        if self.leave_start is None and self.leave_end is None:
+            return True
+        return (self.leave_start or day) <= day <= (self.leave_end or day)
+
+
+class AssignmentEngine:
+    """Per-department min-heaps of doctors keyed on (queue length, next free slot)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._doctors: Dict[str, DoctorLoad] = {}
+        self._heaps: Dict[str, List[Tuple[int, float, int, str]]] = {}
+        self._ward_departments: Dict[str, List[str]] = {}
+        self.day = date.today().toordinal()
+        self.loaded = False
+        self.assignments = 0
+        self.unassigned = 0
+
+    # ---- heap maintenance (callers hold the lock) ----
+
+    def _push(self, doctor: DoctorLoad):
+        """Re-key a doctor: older heap entries for them become stale"""
+        doctor.version += 1
+        if doctor.department_id is None or doctor.away_on(self.day):
+            return
+        heap = self._heaps.setdefault(doctor.department_id, [])
+        heapq.heappush(heap, (doctor.queue, doctor.next_free, doctor.version, doctor.doctor_id))
+        # Stale entries are dropped lazily; compact if they start to dominate
+        if len(heap) > 4 * len(self._doctors) + 64:
+            self._heaps[doctor.department_id] = [
+                entry for entry in heap
+                if self._doctors[entry[3]].version == entry[2]
+            ]
+            heapq.heapify(self._heaps[doctor.department_id])
+
+    def _top(self, department_id: str) -> Optional[Tuple[int, float, int, str]]:
+        heap = self._heaps.get(department_id)
+        while heap:
+            entry = heap[0]
+            doctor = self._doctors.get(entry[3])
+            if doctor is not None and doctor.version == entry[2]:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _refresh_next_free(self, doctor: DoctorLoad, now: Optional[datetime] = None):
+        when = availability_index.next_free(doctor.doctor_id, now or datetime.now())
+        doctor.next_free = when.timestamp() if when else NO_FREE_SLOT
+
+    def _roll_day(self):
+        """At midnight yesterday's queues no longer apply; start every doctor from zero"""
+        today = date.today().toordinal()
+        if today == self.day:
+            return
+        self.day = today
+        self._heaps = {}
+        for doctor in self._doctors.values():
+            doctor.appointments = doctor.walk_ins = 0
+            self._push(doctor)
+
+    def refresh_next_free(self):
+        """Re-key every doctor from the availability index (after it was rebuilt)"""
+        now = datetime.now()
+        with self._lock:
+            self._heaps = {}
+            for doctor in self._doctors.values():
+                self._refresh_next_free(doctor, now)
+                self._push(doctor)
+
+    # ---- building ----
+
+    def build(self, doctors: Iterable[Dict], departments: Iterable[Dict], appointments: Iterable[Dict], day: Optional[date] = None):
+        """Replace the engine state with one built from doctor, department and today's appointment rows"""
+        day = (day or date.today()).toordinal()
+        ward_departments: Dict[str, List[str]] = {}
+        for row in departments:
+            name = (row.get("name") or "").lower()
+            for ward, keywords in WARD_DEPARTMENT_KEYWORDS.items():
+                if any(keyword in name for keyword in keywords):
+                    ward_departments.setdefault(ward, []).append(row["id"])
+
+        counts: Dict[str, int] = {}
+        for row in appointments:
+            if row.get("doctor_id") and row.get("status", "scheduled") in OPEN_STATUSES:
+                counts[row["doctor_id"]] = counts.get(row["doctor_id"], 0) + 1
+
+        now = datetime.now()
+        with self._lock:
+            # Walk-ins only exist in memory, so carry today's over
+            walk_ins = {d.doctor_id: d.walk_ins for d in self._doctors.values()} if self.day == day else {}
+            self._doctors, self._heaps = {}, {}
+            self.day = day
+            for row in doctors:
+                doctor = self._doctors[row["id"]] = DoctorLoad(row["id"])
+                doctor.set_row(row)
+                doctor.appointments = counts.get(doctor.doctor_id, 0)
+                doctor.walk_ins = walk_ins.get(doctor.doctor_id, 0)
+                self._refresh_next_free(doctor, now)
+                self._push(doctor)
+            self._ward_departments = ward_departments
+            self.loaded = True
+
+    def load(self, supabase):
+        today = date.today()
+        start, end = today.isoformat(), (today + timedelta(days=1)).isoformat()
+        doctors = fetch_all(supabase, "doctors", "id,name,department_id,is_on_leave,leave_start_date,leave_end_date")
+        departments = supabase.table("departments").select("id,name").execute().data or []
+        appointments = fetch_all(
+            supabase, "appointments", "id,doctor_id,status",
+            lambda q: q.gte("appointment_date", start).lt("appointment_date", end).in_("status", list(OPEN_STATUSES))
+        )
+        self.build(doctors, departments, appointments, today)
+
+    # ---- assignment ----
+
+    def _best(self, departments: Iterable[str]) -> Optional[Tuple[int, float, int, str]]:
+        best = None
+        for department_id in departments:
+            entry = self._top(department_id)
+            if entry is not None and (best is None or entry < best):
+                best = entry
+        return best
+
+    def assign(self, ward: Any, department_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Add a walk-in to the least-loaded doctor in a department, else anywhere in the ward"""
+        ward = getattr(ward, "value", ward)
+        with self._lock:
+            self._roll_day()
+            best = self._best([department_id]) if department_id else None
+            if best is None:
+                # No free doctor in the mapped department: any of the ward's departments will do
+                best = self._best(self._ward_departments.get(ward) or list(self._heaps))
+            if best is None:
+                self.unassigned += 1
+                return None
+
+            doctor = self._doctors[best[3]]
+            doctor.walk_ins += 1
+            self._push(doctor)
+            self.assignments += 1
+            return {
+                "doctor_id": doctor.doctor_id,
+                "doctor_name": doctor.name,
+                "department_id": doctor.department_id,
+                "queue_position": doctor.queue,
+                "next_free_slot": datetime.fromtimestamp(doctor.next_free).isoformat() if doctor.next_free != NO_FREE_SLOT else None,
+            }
+
+    # ---- incremental updates ----
+
+    def _adjust(self, appointment: Dict[str, Any], delta: int):
+        doctor_id = appointment.get("doctor_id")
+        with self._lock:
+            self._roll_day()
+            doctor = self._doctors.get(doctor_id)
+            if doctor is None:
+                return
+            if appointment.get("appointment_date") and _as_day(appointment["appointment_date"]) == self.day:
+                doctor.appointments = max(0, doctor.appointments + delta)
+            # A booking on any day can change the doctor's next free slot
+            self._refresh_next_free(doctor)
+            self._push(doctor)
+
+    def record_appointment(self, appointment: Dict[str, Any]):
+        self._adjust(appointment, 1)
+
+    def record_finished(self, appointment: Dict[str, Any]):
+        """An appointment was completed or cancelled"""
+        self._adjust(appointment, -1)
+
+    def record_seen(self, doctor_id: str) -> Optional[int]:
+        """A walk-in in the doctor's queue has been seen; returns the new queue length"""
+        with self._lock:
+            self._roll_day()
+            doctor = self._doctors.get(doctor_id)
+            if doctor is None:
+                return None
+            doctor.walk_ins = max(0, doctor.walk_ins - 1)
+            self._push(doctor)
+            return doctor.queue
+
+    def update_doctor(self, row: Dict[str, Any]):
+        with self._lock:
+            doctor = self._doctors.get(row["id"])
+            if doctor is None:
+                doctor = self._doctors[row["id"]] = DoctorLoad(row["id"])
+                self._refresh_next_free(doctor)
+            doctor.set_row(row)
+            self._push(doctor)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queues = [d.queue for d in self._doctors.values()]
+            return {
+                "loaded": self.loaded,
+                "doctors": len(self._doctors),
+                "assignments": self.assignments,
+                "unassigned": self.unassigned,
+                "max_queue": max(queues, default=0),
+                "heap_entries": sum(len(heap) for heap in self._heaps.values()),
+            }
+
+
+# Process-wide engine
+assignment_engine = AssignmentEngine()
+metrics.register("assignment", assignment_engine.stats)
+availability_index.on_rebuilt(assignment_engine.refresh_next_free)
+
+
+def rebuild_assignment():
+    supabase = get_supabase_admin()
+    if supabase:
+        # Without the index every doctor would tie on "no free slot"
+        availability_index.ensure_loaded(supabase)
+        assignment_engine.load(supabase)
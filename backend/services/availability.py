@@ -0,0 +1,538 @@
+"""
+In-memory availability index over doctor_slots, appointments and leave.
+
+Each doctor keeps one compact record per day: slot start/end minutes in
+sorted order, capacity and booked counts, and a bitmap of slots that still
+have room. Each department keeps, per day, the sorted start minutes that
+have room and a bitmask of the doctors free at each one. "Earliest N free
+slots in department X after time T" is then a bisect plus a walk over set
+bits, with no query and no per-doctor scan.
+
+The index is built from Supabase on first use and rebuilt periodically;
+between rebuilds it is updated in place when slots are created or
+regenerated, appointments are booked or cancelled, and doctors change.
+Updates made while a rebuild is reading the database are replayed onto the
+new index before it is swapped in, so they are not lost; bookings and
+releases the scanned appointment rows already reflect are skipped. Listeners added
+with on_rebuilt are called after each swap, for state derived from the index.
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from database import get_supabase_admin
+from database.queries import fetch_all
+from services import metrics
+from services.booking import local_wall_clock
+
+AVAILABILITY_DAYS = int(os.getenv("AVAILABILITY_DAYS", "30"))
+REBUILD_INTERVAL_SECONDS = float(os.getenv("AVAILABILITY_REBUILD_SECONDS", "600"))
+
+SLOT_COLUMNS = "id,doctor_id,slot_date,start_time,end_time,capacity,booked,is_available"
+
+# Shared int objects for every minute of the day, so slot columns don't each allocate their own
+_MINUTES = tuple(range(24 * 60 + 1))
+
+
+@lru_cache(maxsize=4096)
+def _parse_day(value: str) -> int:
+    return date.fromisoformat(value[:10]).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _parse_minute(value: str) -> int:
+    parsed = time.fromisoformat(value[:8])
+    return _MINUTES[parsed.hour * 60 + parsed.minute]
+
+
+def _day(value: Any) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return _parse_day(str(value))
+
+
+def _minute(value: Any) -> int:
+    if isinstance(value, (time, datetime)):
+        return _MINUTES[value.hour * 60 + value.minute]
+    return _parse_minute(str(value))
+
+
+def _when(value: Any) -> datetime:
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    # Slots are wall-clock times, so compare appointments the same way
+    return local_wall_clock(value)
+
+
+_CLOCKS = tuple(f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in _MINUTES)
+
+
+class DaySlots:
+    """One doctor's slots on one day, with a bitmap of those that have room"""
+
+    __slots__ = ("starts", "ends", "capacity", "booked", "ids", "available", "free")
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        rows = sorted(rows, key=lambda row: _minute(row["start_time"]))
+        self.starts = [_minute(row["start_time"]) for row in rows]
+        self.ends = [_minute(row["end_time"]) for row in rows]
+        self.capacity = [int(row.get("capacity") or 1) for row in rows]
+        self.booked = [int(row.get("booked") or 0) for row in rows]
+        self.ids = [row["id"] for row in rows]
+        self.available = [row.get("is_available", True) is not False for row in rows]
+        self._refresh()
+
+    def _refresh(self):
+        free = 0
+        for i in range(len(self.starts)):
+            if self.available[i] and self.booked[i] < self.capacity[i]:
+                free |= 1 << i
+        self.free = free
+
+    def insert(self, row: Dict[str, Any]):
+        start = _minute(row["start_time"])
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, _minute(row["end_time"]))
+        self.capacity.insert(i, int(row.get("capacity") or 1))
+        self.booked.insert(i, int(row.get("booked") or 0))
+        self.ids.insert(i, row["id"])
+        self.available.insert(i, row.get("is_available", True) is not False)
+        self._refresh()
+
+    def remove(self, slot_id: str) -> Optional[int]:
+        """Drop a slot, returning its start minute"""
+        if slot_id not in self.ids:
+            return None
+        i = self.ids.index(slot_id)
+        start = self.starts[i]
+        for column in (self.starts, self.ends, self.capacity, self.booked, self.ids, self.available):
+            del column[i]
+        self._refresh()
+        return start
+
+    def slot_at(self, minute: int) -> Optional[int]:
+        """Position of the slot containing `minute`, if any"""
+        i = bisect_right(self.starts, minute) - 1
+        if i < 0 or minute >= self.ends[i]:
+            return None
+        return i
+
+    def free_at(self, minute: int) -> Optional[int]:
+        """Position of a slot with room starting exactly at `minute`, if any"""
+        for i in range(bisect_left(self.starts, minute), bisect_right(self.starts, minute)):
+            if (self.free >> i) & 1:
+                return i
+        return None
+
+    def set_booked(self, i: int, booked: int):
+        self.booked[i] = max(0, booked)
+        if self.available[i] and self.booked[i] < self.capacity[i]:
+            self.free |= 1 << i
+        else:
+            self.free &= ~(1 << i)
+
+
+class DepartmentDay:
+    """Start minutes with room in one department on one day, each with a bitmask of doctors"""
+
+    __slots__ = ("minutes", "doctors")
+
+    def __init__(self):
+        self.minutes: List[int] = []
+        self.doctors: Dict[int, int] = {}
+
+    def set(self, minute: int, bit: int, free: bool):
+        mask = self.doctors.get(minute, 0)
+        if free and not mask & bit:
+            if not mask:
+                insort(self.minutes, minute)
+            self.doctors[minute] = mask | bit
+        elif not free and mask & bit:
+            mask &= ~bit
+            if mask:
+                self.doctors[minute] = mask
+            else:
+                del self.doctors[minute]
+                del self.minutes[bisect_left(self.minutes, minute)]
+
+
+class DoctorAvailability:
+    __slots__ = ("doctor_id", "bit", "department_id", "on_leave", "leave_start", "leave_end", "days")
+
+    def __init__(self, doctor_id: str, position: int):
+        self.doctor_id = doctor_id
+        self.bit = 1 << position
+        self.department_id: Optional[str] = None
+        self.on_leave = False
+        self.leave_start: Optional[int] = None
+        self.leave_end: Optional[int] = None
+        self.days: Dict[int, DaySlots] = {}
+
+    def set_leave(self, row: Dict[str, Any]):
+        self.on_leave = bool(row.get("is_on_leave"))
+        self.leave_start = _day(row["leave_start_date"]) if row.get("leave_start_date") else None
+        self.leave_end = _day(row["leave_end_date"]) if row.get("leave_end_date") else None
+
+    def away_on(self, day: int) -> bool:
+        if not self.on_leave:
+            return False
+        if self.leave_start is None and self.leave_end is None:
+            return True
+        return (self.leave_start or day) <= day <= (self.leave_end or day)
+
+
+class AvailabilityIndex:
+    """Earliest-free-slot lookups by department, kept current by booking and slot events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._doctors: Dict[str, DoctorAvailability] = {}
+        self._by_position: List[DoctorAvailability] = []
+        self._departments: Dict[Optional[str], Dict[int, DepartmentDay]] = {}
+        self._on_leave: Set[str] = set()
+        self.first_day = date.today().toordinal()
+        self.last_day = self.first_day
+        self.loaded = False
+        # One load at a time; reentrant so ensure_loaded can hold it across load()
+        self._rebuild_lock = threading.RLock()
+        # Updates made while a rebuild is reading the database, as (method, args)
+        self._pending: Optional[List[Tuple[str, tuple]]] = None
+        self._listeners: List[Callable[[], None]] = []
+
+    # ---- internal bookkeeping (callers hold the lock) ----
+
+    def _doctor(self, doctor_id: str) -> DoctorAvailability:
+        doctor = self._doctors.get(doctor_id)
+        if doctor is None:
+            doctor = DoctorAvailability(doctor_id, len(self._by_position))
+            self._doctors[doctor_id] = doctor
+            self._by_position.append(doctor)
+        return doctor
+
+    def _mark(self, doctor: DoctorAvailability, day: int, minute: int, free: bool):
+        days = self._departments.setdefault(doctor.department_id, {})
+        department_day = days.get(day)
+        if department_day is None:
+            if not free:
+                return
+            department_day = days[day] = DepartmentDay()
+        department_day.set(minute, doctor.bit, free)
+        if not department_day.minutes:
+            del days[day]
+
+    def _sync(self, doctor: DoctorAvailability, day: int, minute: int):
+        """Mirror whether the doctor has room at (day, minute) into their department"""
+        slots = doctor.days.get(day)
+        self._mark(doctor, day, minute, slots is not None and slots.free_at(minute) is not None)
+
+    def _attach(self, doctor: DoctorAvailability):
+        for day, slots in doctor.days.items():
+            for minute in set(slots.starts):
+                self._sync(doctor, day, minute)
+
+    def _detach(self, doctor: DoctorAvailability):
+        for day, slots in doctor.days.items():
+            for minute in set(slots.starts):
+                self._mark(doctor, day, minute, False)
+
+    def _put_doctor(self, row: Dict[str, Any]):
+        doctor = self._doctor(row["id"])
+        department_id = row.get("department_id")
+        if department_id != doctor.department_id:
+            self._detach(doctor)
+            doctor.department_id = department_id
+            self._attach(doctor)
+        doctor.set_leave(row)
+        if doctor.on_leave:
+            self._on_leave.add(doctor.doctor_id)
+        else:
+            self._on_leave.discard(doctor.doctor_id)
+
+    def _locate(self, doctor_id: Optional[str], when: Any) -> Optional[Tuple[DoctorAvailability, int, int]]:
+        """(doctor, day, slot position) of the slot an appointment time falls in"""
+        doctor = self._doctors.get(doctor_id) if doctor_id else None
+        if doctor is None or when is None:
+            return None
+        moment = _when(when)
+        slots = doctor.days.get(moment.toordinal())
+        if not slots:
+            return None
+        i = slots.slot_at(moment.hour * 60 + moment.minute)
+        return None if i is None else (doctor, moment.toordinal(), i)
+
+    def _apply_appointments(self, appointments: Iterable[Dict]) -> Set[Any]:
+        """Count appointments into slot booked counts (department masks are left to the caller); returns their ids"""
+        # Appointments and the slots' booked column describe the same bookings,
+        # so each slot counts whichever is higher, never both
+        per_slot: Dict[Tuple[DoctorAvailability, int, int], int] = {}
+        seen: Set[Any] = set()
+        for row in appointments:
+            seen.add(row.get("id"))
+            located = self._locate(row.get("doctor_id"), row.get("appointment_date"))
+            if located:
+                per_slot[located] = per_slot.get(located, 0) + 1
+        for (doctor, day, i), count in per_slot.items():
+            slots = doctor.days[day]
+            if count > slots.booked[i]:
+                slots.set_booked(i, count)
+        return seen
+
+    def _excluded(self, department_id: Optional[str], day: int) -> int:
+        mask = 0
+        for doctor_id in self._on_leave:
+            doctor = self._doctors[doctor_id]
+            if doctor.department_id == department_id and doctor.away_on(day):
+                mask |= doctor.bit
+        return mask
+
+    # ---- building ----
+
+    def build(self, doctors: Iterable[Dict], slots: Iterable[Dict], appointments: Iterable[Dict], start: date, days: int):
+        """Replace the index with one built from raw doctor, slot and appointment rows"""
+        index = AvailabilityIndex()
+        index.first_day = start.toordinal()
+        index.last_day = index.first_day + days - 1
+        for row in doctors:
+            index._put_doctor(row)
+
+        grouped: Dict[Tuple[str, int], List[Dict]] = {}
+        for row in slots:
+            day = _day(row["slot_date"])
+            if index.first_day <= day <= index.last_day:
+                grouped.setdefault((row["doctor_id"], day), []).append(row)
+        for (doctor_id, day), rows in grouped.items():
+            index._doctor(doctor_id).days[day] = DaySlots(rows)
+        del grouped
+
+        seen = index._apply_appointments(appointments)
+        for doctor in index._by_position:
+            index._attach(doctor)
+
+        with self._lock:
+            if self._pending is not None:
+                replayed: Set[Any] = set()
+                for method, args in self._pending:
+                    if method == "_book" and args[3] is not None:
+                        appointment_id, booking = args[3], args[2] > 0
+                        # The scan already counts a booking it read, and a release of one it did not
+                        if booking and appointment_id in seen:
+                            continue
+                        if not booking and appointment_id not in seen and appointment_id not in replayed:
+                            continue
+                        if booking:
+                            replayed.add(appointment_id)
+                    getattr(index, method)(*args)
+                self._pending = None
+            self._doctors = index._doctors
+            self._by_position = index._by_position
+            self._departments = index._departments
+            self._on_leave = index._on_leave
+            self.first_day, self.last_day = index.first_day, index.last_day
+            self.loaded = True
+        for listener in self._listeners:
+            listener()
+
+    def on_rebuilt(self, listener: Callable[[], None]):
+        """Call listener (without the index lock held) whenever a new build is swapped in"""
+        self._listeners.append(listener)
+
+    # ---- incremental updates ----
+
+    def _update(self, method: str, *args):
+        """Apply an update to the live index, and keep it for the rebuild in progress if any"""
+        with self._lock:
+            getattr(self, method)(*args)
+            if self._pending is not None:
+                self._pending.append((method, args))
+
+    def _upsert_slot(self, row: Dict[str, Any]):
+        day = _day(row["slot_date"])
+        if not self.first_day <= day <= self.last_day:
+            return
+        doctor = self._doctor(row["doctor_id"])
+        slots = doctor.days.get(day)
+        if slots is None:
+            slots = doctor.days[day] = DaySlots()
+        old_start = slots.remove(row["id"])
+        slots.insert(row)
+        if old_start is not None:
+            self._sync(doctor, day, old_start)
+        self._sync(doctor, day, _minute(row["start_time"]))
+
+    def _remove_slot(self, row: Dict[str, Any]):
+        day = _day(row["slot_date"])
+        doctor = self._doctors.get(row.get("doctor_id"))
+        slots = doctor.days.get(day) if doctor else None
+        start = slots.remove(row["id"]) if slots else None
+        if start is not None:
+            self._sync(doctor, day, start)
+
+    def _book(self, doctor_id: Optional[str], when: Any, delta: int, appointment_id: Any = None):
+        located = self._locate(doctor_id, when)
+        if located:
+            doctor, day, i = located
+            slots = doctor.days[day]
+            slots.set_booked(i, slots.booked[i] + delta)
+            self._sync(doctor, day, slots.starts[i])
+
+    def _replace_doctor_days(self, doctor_id: str, slots: List[Dict], appointments: List[Dict]):
+        grouped: Dict[int, List[Dict]] = {}
+        for row in slots:
+            day = _day(row["slot_date"])
+            if self.first_day <= day <= self.last_day:
+                grouped.setdefault(day, []).append(row)
+        doctor = self._doctor(doctor_id)
+        self._detach(doctor)
+        doctor.days = {day: DaySlots(rows) for day, rows in grouped.items()}
+        self._apply_appointments(appointments)
+        self._attach(doctor)
+
+    def upsert_slot(self, row: Dict[str, Any]):
+        self._update("_upsert_slot", row)
+
+    def remove_slot(self, row: Dict[str, Any]):
+        self._update("_remove_slot", row)
+
+    def update_doctor(self, row: Dict[str, Any]):
+        self._update("_put_doctor", row)
+
+    def record_booking(self, doctor_id: Optional[str], appointment_date: Any, appointment_id: Any = None):
+        self._update("_book", doctor_id, appointment_date, 1, appointment_id)
+
+    def record_release(self, doctor_id: Optional[str], appointment_date: Any, appointment_id: Any = None):
+        self._update("_book", doctor_id, appointment_date, -1, appointment_id)
+
+    # ---- queries ----
+
+    def earliest(self, department_id: Optional[str], after: datetime, n: int = 5) -> List[Dict[str, Any]]:
+        """The first `n` free slots in a department starting at or after `after`"""
+        after = _when(after)
+        results: List[Dict[str, Any]] = []
+        with self._lock:
+            days = self._departments.get(department_id)
+            if not days:
+                return results
+            day = max(after.toordinal(), self.first_day)
+            minute = after.hour * 60 + after.minute if day == after.toordinal() else 0
+            while day <= self.last_day:
+                department_day = days.get(day)
+                if department_day is not None:
+                    excluded = self._excluded(department_id, day) if self._on_leave else 0
+                    minutes = department_day.minutes
+                    slot_date = date.fromordinal(day).isoformat()
+                    for k in range(bisect_left(minutes, minute), len(minutes)):
+                        mask = department_day.doctors[minutes[k]] & ~excluded
+                        while mask:
+                            bit = mask & -mask
+                            mask ^= bit
+                            doctor = self._by_position[bit.bit_length() - 1]
+                            slots = doctor.days[day]
+                            i = slots.free_at(minutes[k])
+                            results.append({
+                                "slot_id": slots.ids[i],
+                                "doctor_id": doctor.doctor_id,
+                                "slot_date": slot_date,
+                                "start_time": _CLOCKS[slots.starts[i]],
+                                "end_time": _CLOCKS[slots.ends[i]],
+                                "remaining": slots.capacity[i] - slots.booked[i],
+                            })
+                            if len(results) == n:
+                                return results
+                day += 1
+                minute = 0
+        return results
+
+    def next_free(self, doctor_id: str, after: datetime) -> Optional[datetime]:
+        """Start of the doctor's first slot with room at or after `after`"""
+        after = _when(after)
+        with self._lock:
+            doctor = self._doctors.get(doctor_id)
+            if doctor is None:
+                return None
+            day = max(after.toordinal(), self.first_day)
+            minute = after.hour * 60 + after.minute if day == after.toordinal() else 0
+            while day <= self.last_day:
+                slots = doctor.days.get(day)
+                if slots is not None and slots.free and not doctor.away_on(day):
+                    for i in range(bisect_left(slots.starts, minute), len(slots.starts)):
+                        if (slots.free >> i) & 1:
+                            return datetime.combine(date.fromordinal(day), time(slots.starts[i] // 60, slots.starts[i] % 60))
+                day += 1
+                minute = 0
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "doctors": len(self._doctors),
+                "first_day": date.fromordinal(self.first_day).isoformat(),
+                "last_day": date.fromordinal(self.last_day).isoformat(),
+                "free_start_times": sum(
+                    len(department_day.minutes) for days in self._departments.values() for department_day in days.values()
+                ),
+            }
+
+    # ---- loading from Supabase ----
+
+    def load(self, supabase, start: Optional[date] = None, days: int = AVAILABILITY_DAYS):
+        start = start or date.today()
+        end = start + timedelta(days=days)
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                doctors = supabase.table("doctors").select("id,department_id,is_on_leave,leave_start_date,leave_end_date").execute().data or []
+                slots = fetch_all(
+                    supabase, "doctor_slots", SLOT_COLUMNS,
+                    lambda q: q.gte("slot_date", start.isoformat()).lt("slot_date", end.isoformat())
+                )
+                appointments = fetch_all(
+                    supabase, "appointments", "id,doctor_id,appointment_date",
+                    lambda q: q.gte("appointment_date", start.isoformat()).lt("appointment_date", end.isoformat()).neq("status", "cancelled")
+                )
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            self.build(doctors, slots, appointments, start, days)
+
+    def refresh_doctor(self, supabase, doctor_id: str):
+        """Re-read one doctor's slots and bookings (after their slots were regenerated)"""
+        if not self.loaded:
+            return
+        start, end = date.fromordinal(self.first_day).isoformat(), date.fromordinal(self.last_day + 1).isoformat()
+        slots = fetch_all(
+            supabase, "doctor_slots", SLOT_COLUMNS,
+            lambda q: q.eq("doctor_id", doctor_id).gte("slot_date", start).lt("slot_date", end)
+        )
+        appointments = fetch_all(
+            supabase, "appointments", "id,doctor_id,appointment_date",
+            lambda q: q.eq("doctor_id", doctor_id).gte("appointment_date", start).lt("appointment_date", end).neq("status", "cancelled")
+        )
+        self._update("_replace_doctor_days", doctor_id, slots, appointments)
+
+    def ensure_loaded(self, supabase):
+        if self.loaded:
+            return
+        with self._rebuild_lock:
+            # Another caller may have loaded it while we waited
+            if not self.loaded:
+                self.load(supabase)
+
+
+# Process-wide index
+availability_index = AvailabilityIndex()
+metrics.register("availability_index", availability_index.stats)
+
+
+def rebuild_availability():
+    supabase = get_supabase_admin()
+    if supabase:
+        availability_index.load(supabase)
@@ -0,0 +1,33 @@
+"""
+Periodic background jobs started from the FastAPI startup hook
+"""
+import asyncio
+from typing import Callable, Dict
+
+# Running job tasks, keyed by job name
+jobs: Dict[str, asyncio.Task] = {}
+
+
+async def _run_periodic(name: str, interval: float, fn: Callable[[], None], run_first: bool):
+    loop = asyncio.get_event_loop()
+    while True:
+        if not run_first:
+            await asyncio.sleep(interval)
+        run_first = False
+        try:
+            # Jobs talk to Supabase synchronously, keep them off the event loop
+            await loop.run_in_executor(None, fn)
+        except Exception as e:
+            print(f"[WARNING] Background job '{name}' failed: {e}")
+
+
+def start_periodic(name: str, interval: float, fn: Callable[[], None], run_first: bool = False) -> asyncio.Task:
+    """Run fn every `interval` seconds in the default executor (idempotent per name).
+
+    With run_first, fn also runs once straight away instead of after the first interval.
+    """
+    if name in jobs and not jobs[name].done():
+        return jobs[name]
+    jobs[name] = asyncio.create_task(_run_periodic(name, interval, fn, run_first))
+    print(f"[INFO] Background job '{name}' scheduled every {interval:g}s")
+    return jobs[name]
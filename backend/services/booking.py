@@ -0,0 +1,78 @@
+"""
+Atomic slot reservation for appointment booking.
+
+create_appointment takes a place in the doctor's slot through the
+reserve_doctor_slot RPC (database/slot_reservations.sql) before inserting
+the appointment, and gives it back if the insert fails or the appointment
+is later cancelled. The conditional UPDATE inside the RPC is what rules
+out overbooking; nothing here reads a booked count and writes it back.
+A reschedule to another time in the same slot keeps its place. Slots are
+wall-clock times, so appointment times are compared in server local time.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+RESERVED = "reserved"
+FULL = "full"
+TIME_MISMATCH = "time_mismatch"
+NO_SLOT = "no_slot"
+
+_warned_missing = False
+
+
+def _unwrap(data: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(data, list):
+        data = data[0] if data else None
+    return data or None
+
+
+def is_missing_function(error: Exception) -> bool:
+    """True when PostgREST cannot find the RPC, i.e. the migration has not been applied"""
+    return getattr(error, "code", None) == "PGRST202" or "PGRST202" in str(error)
+
+
+def local_wall_clock(value: datetime) -> datetime:
+    """Naive server-local time for comparing with slot times; an aware value is converted, not truncated"""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def reserve_slot(supabase, doctor_id: str, appointment_date: datetime, slot_id: Optional[str] = None) -> Dict[str, Any]:
+    """Take one place in `slot_id`, or in the doctor's slot containing `appointment_date`"""
+    global _warned_missing
+    params = {
+        "p_doctor_id": doctor_id,
+        "p_at": local_wall_clock(appointment_date).isoformat(),
+        "p_slot_id": slot_id,
+    }
+    try:
+        result = supabase.rpc("reserve_doctor_slot", params).execute()
+    except Exception as e:
+        if slot_id or not is_missing_function(e):
+            raise
+        # Without the migration there are no reservations to take; book as before
+        if not _warned_missing:
+            print(f"[WARNING] reserve_doctor_slot RPC unavailable, booking without slot reservation: {e}")
+            _warned_missing = True
+        return {"status": NO_SLOT}
+    return _unwrap(result.data) or {"status": NO_SLOT}
+
+
+def find_slot_id(supabase, doctor_id: str, at: datetime) -> Optional[str]:
+    """Id of the doctor's slot containing `at` (the slot reserve_slot would pick), if any"""
+    at = local_wall_clock(at)
+    clock = at.strftime("%H:%M:%S")
+    result = (
+        supabase.table("doctor_slots").select("id")
+        .eq("doctor_id", doctor_id).eq("slot_date", at.date().isoformat())
+        .lte("start_time", clock).gt("end_time", clock)
+        .order("start_time", desc=True).limit(1).execute()
+    )
+    return result.data[0]["id"] if result.data else None
+
+
+def release_slot(supabase, slot_id: str) -> Optional[Dict[str, Any]]:
+    """Give back a place taken by reserve_slot; returns the updated slot row"""
+    result = supabase.rpc("release_doctor_slot", {"p_slot_id": slot_id}).execute()
+    return _unwrap(result.data)
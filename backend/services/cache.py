@@ -0,0 +1,210 @@
+"""
+Process-local read-through cache for reference data responses.
+
+Entries hold the already-serialized JSON body (plus any response headers),
+so a hit skips both Supabase and JSON encoding. Entries expire after a TTL
+and can be dropped early by tag (e.g. "doctors") when the underlying data
+changes. Concurrent misses for the same key share one load (see
+services/singleflight.py).
+
+Strong ETags for conditional GETs are a hash of the rendered body, so they
+change whenever the data does, however it changed (a TTL reload, a write
+that bypassed invalidation, a direct edit in the database).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+from services import metrics
+from services.serialization import render_json
+from services.singleflight import single_flight
+
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "300"))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "512"))
+
+# Reference data is shared and changes rarely; patient data must always be revalidated
+REFERENCE_CACHE_CONTROL = os.getenv("REFERENCE_CACHE_CONTROL", "public, max-age=30, stale-while-revalidate=300")
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+
+def body_etag(body: bytes, headers: Optional[Dict[str, str]] = None) -> str:
+    """Strong ETag for a rendered response: a hash of its body and any data-carrying headers"""
+    digest = hashlib.sha1(body)
+    for name in sorted(headers or ()):
+        digest.update(f"\n{name}:{headers[name]}".encode())
+    return '"' + digest.hexdigest()[:20] + '"'
+
+
+class CachedBody:
+    __slots__ = ("body", "headers", "expires_at", "tags", "etag")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], expires_at: float, tags: Tuple[str, ...]):
+        self.body = body
+        self.headers = headers
+        self.expires_at = expires_at
+        self.tags = tags
+        # Computed once per load, so revalidating against a cached entry costs no hashing
+        self.etag = body_etag(body, headers)
+
+
+class ResponseCache:
+    """TTL + tag-invalidated cache of serialized responses with stampede protection"""
+
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL_SECONDS, max_entries: int = REFERENCE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._tag_keys: Dict[str, Set[str]] = {}
+        # Bumped on invalidation so loads that started earlier are not stored
+        self._tag_generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for tag in entry.tags:
+                self._tag_keys.get(tag, set()).discard(key)
+
+    def _generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._tag_generations.get(tag, 0) for tag in tags)
+
+    def _store(self, key: str, entry: CachedBody, generations: Tuple[int, ...]):
+        with self._lock:
+            current = tuple(self._tag_generations.get(tag, 0) for tag in entry.tags)
+            if current != generations:
+                return
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the tags and bump their versions"""
+        with self._lock:
+            for tag in tags:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+                for key in list(self._tag_keys.pop(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for tag in list(self._tag_keys):
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+            self._entries.clear()
+            self._tag_keys.clear()
+
+    async def get_or_load(
+        self,
+        key: str,
+        tags: Tuple[str, ...],
+        loader: Callable[[], Tuple[bytes, Dict[str, str]]],
+        ttl: Optional[float] = None,
+    ) -> CachedBody:
+        """Return the cached body for key, running loader (in a thread) on a miss"""
+        entry = self._get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return await single_flight.do("reference_cache", key, self._load, key, tags, loader, ttl)
+
+    def _load(self, key: str, tags: Tuple[str, ...], loader, ttl: Optional[float]) -> CachedBody:
+        generations = self._generations(tags)
+        body, headers = loader()
+        entry = CachedBody(body, headers, time.monotonic() + (ttl or self.ttl), tags)
+        self._store(key, entry, generations)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Shared cache for departments, doctors and other slow-changing reference data
+reference_cache = ResponseCache()
+metrics.register("reference_cache", reference_cache.stats)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def conditional_json_response(
+    request: Request,
+    body: bytes,
+    headers: Optional[Dict[str, str]] = None,
+    cache_control: str = PRIVATE_CACHE_CONTROL,
+    etag: Optional[str] = None,
+) -> Response:
+    """JSON response for a rendered body with an ETag, or 304 if the client already has it"""
+    etag = etag or body_etag(body, headers)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+async def cached_json_response(
+    key: str,
+    tags: Tuple[str, ...],
+    loader: Callable[[], Tuple[Any, Dict[str, str]]],
+    model=None,
+    ttl: Optional[float] = None,
+    request: Optional[Request] = None,
+    cache_control: str = REFERENCE_CACHE_CONTROL,
+) -> Response:
+    """Serve loader()'s (content, headers) through the reference cache as a JSON response.
+
+    When the request is given, the response carries the cached entry's ETag
+    and a matching If-None-Match is answered with 304; on a cache hit that
+    needs no Supabase access.
+    """
+    def load():
+        content, headers = loader()
+        return render_json(content, model), headers
+
+    entry = await reference_cache.get_or_load(key, tags, load, ttl)
+    if request is not None:
+        return conditional_json_response(request, entry.body, entry.headers, cache_control, entry.etag)
+    return Response(content=entry.body, media_type="application/json", headers=dict(entry.headers))
@@ -0,0 +1,148 @@
+"""
+Circuit breaker for calls to an unreliable dependency (the Gemini LLM).
+
+Closed: calls go through and their outcomes are kept for a sliding time
+window. Once the window holds enough calls and the failure rate crosses
+the threshold, the breaker opens. Open: calls are refused straight away,
+so an outage costs callers nothing but their fallback. Half-open: after a
+cool-down a limited number of probe calls are let through; if they
+succeed the breaker closes again, and any failure re-opens it for another
+cool-down.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from services import metrics
+
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_HALF_OPEN_PROBES = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker; call allow() before and record_*() after each call"""
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = LLM_BREAKER_WINDOW_SECONDS,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        half_open_probes: int = LLM_BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(half_open_probes, 1)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        # (monotonic time, succeeded) for calls in the window, closed state only
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def _prune(self, now: float):
+        while self._window and self._window[0][0] <= now - self.window_seconds:
+            _, succeeded = self._window.popleft()
+            if not succeeded:
+                self._failures -= 1
+
+    def _transition(self, state: str, now: float):
+        previous, self.state = self.state, state
+        self.transitions.append({"from": previous, "to": state, "at": time.time()})
+        if state == OPEN:
+            self._opened_at = now
+            print(f"[WARNING] Circuit '{self.name}' {previous} -> open for {self.open_seconds:g}s")
+        elif state == HALF_OPEN:
+            self._probes_started = 0
+            self._probes_succeeded = 0
+            print(f"[INFO] Circuit '{self.name}' open -> half_open, probing")
+        else:
+            self._window.clear()
+            self._failures = 0
+            print(f"[INFO] Circuit '{self.name}' {previous} -> closed")
+
+    def allow(self) -> bool:
+        """True if a call may be made now; every allowed call must be recorded"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                if self._probes_started >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes_started += 1
+            return True
+
+    def record_success(self):
+        now = time.monotonic()
+        with self._lock:
+            self.successes += 1
+            if self.state == HALF_OPEN:
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.half_open_probes:
+                    self._transition(CLOSED, now)
+            elif self.state == CLOSED:
+                self._window.append((now, True))
+                self._prune(now)
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._transition(OPEN, now)
+            elif self.state == CLOSED:
+                self._window.append((now, False))
+                self._failures += 1
+                self._prune(now)
+                if len(self._window) >= self.min_calls and self._failures / len(self._window) >= self.failure_rate:
+                    self._transition(OPEN, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._window)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "transitions": list(self.transitions),
+                "config": {
+                    "window_seconds": self.window_seconds,
+                    "min_calls": self.min_calls,
+                    "failure_rate": self.failure_rate,
+                    "open_seconds": self.open_seconds,
+                    "half_open_probes": self.half_open_probes,
+                },
+            }
+
+
+# Guards the Gemini client used for symptom classification
+llm_breaker = CircuitBreaker("gemini")
+metrics.register("llm_circuit_breaker", llm_breaker.stats)
@@ -0,0 +1,149 @@
+"""
+Server-sent event fan-out for admin dashboards.
+
+Producers (intake routing to the emergency ward, emergency appointments)
+call publish() from any thread; every connected dashboard has its own
+bounded buffer, so a slow or stalled client only ever loses its own oldest
+events and never holds up the producer or the other clients. A short
+history is kept so a dashboard that reconnects with Last-Event-ID gets the
+events it missed instead of having to re-query the whole window.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+from services import metrics
+
+SUBSCRIBER_BUFFER_SIZE = int(os.getenv("EVENT_SUBSCRIBER_BUFFER_SIZE", "100"))
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "200"))
+# Comment lines sent on idle streams so proxies do not time the connection out
+HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+class Subscriber:
+    """One connected client: a bounded queue owned by the event loop serving it"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]):
+        """Enqueue on the subscriber's loop, discarding its oldest event when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventBroadcaster:
+    """Publishes events to every subscriber's buffer"""
+
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER_SIZE, history_size: int = EVENT_HISTORY_SIZE):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._next_id = 1
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fan an event out to all subscribers (safe to call from any thread)"""
+        with self._lock:
+            event = {"id": self._next_id, "type": event_type, "data": data, "published_at": time.time()}
+            self._next_id += 1
+            self._history.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.discard(subscriber)
+                self.dropped += subscriber.dropped
+
+    def since(self, last_event_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Retained events newer than a client's Last-Event-ID"""
+        try:
+            after = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        with self._lock:
+            return [event for event in self._history if event["id"] > after]
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """SSE body for one client: missed events first, then live ones until disconnect"""
+        subscriber = self.subscribe()
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            sent = 0
+            for event in self.since(last_event_id):
+                sent = event["id"]
+                yield format_sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["id"] > sent:
+                    yield format_sse(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "buffered": sum(s.queue.qsize() for s in subscribers),
+            "dropped": self.dropped + sum(s.dropped for s in subscribers),
+            "buffer_size": self.buffer_size,
+        }
+
+
+# Emergency intakes and emergency appointments, streamed to admin dashboards
+emergency_events = EventBroadcaster()
+metrics.register("emergency_events", emergency_events.stats)
+
+
+def publish_emergency_intake(patient_data: Dict[str, Any], session_id: Optional[str] = None):
+    """Intake routed a patient to the emergency ward"""
+    emergency_events.publish("emergency_intake", {
+        "session_id": session_id,
+        "patient_name": patient_data.get("patient_name"),
+        "patient_age": patient_data.get("patient_age"),
+        "symptoms": patient_data.get("patient_query"),
+        "priority": patient_data.get("priority") or "emergency",
+        "department_id": patient_data.get("department_id"),
+        "assigned_doctor_id": patient_data.get("assigned_doctor_id"),
+    })
+
+
+def publish_emergency_appointment(appointment: Dict[str, Any]):
+    """An appointment with emergency priority was booked"""
+    emergency_events.publish("emergency_appointment", appointment)
@@ -0,0 +1,147 @@
+"""
+Incrementally maintained feedback rating aggregates.
+
+Global and per-doctor count, sum and star histogram are updated on every
+submitted feedback, so summaries are served in O(1) without reading the
+feedback table. They are loaded at startup and a periodic reconciliation
+rebuilds them from the table, paging through only the doctor_id and
+rating columns. Only one rebuild runs at a time; ratings submitted while it
+runs are added to the rebuilt totals unless the scan already read them.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import get_supabase_admin
+
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("FEEDBACK_RECONCILE_SECONDS", "1800"))
+RECONCILE_PAGE_SIZE = 1000
+
+
+class RatingAggregate:
+    """Count, sum and 1-5 star histogram for a set of ratings"""
+
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0, 0, 0, 0, 0]
+
+    def add(self, rating: int):
+        self.count += 1
+        self.total += rating
+        self.histogram[rating - 1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        average = self.total / self.count if self.count else 0
+        return {
+            "total_feedbacks": self.count,
+            "average_rating": round(average, 2),
+            "rating_distribution": {f"{stars}_stars": self.histogram[stars - 1] for stars in range(5, 0, -1)},
+        }
+
+
+class FeedbackAggregates:
+    """Global and per-doctor rating aggregates with periodic reconciliation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = RatingAggregate()
+        self._by_doctor: Dict[str, RatingAggregate] = {}
+        self.loaded = False
+        # Serializes rebuilds; reentrant so ensure_loaded can hold it across its reconcile
+        self._rebuild_lock = threading.RLock()
+        # Ratings submitted while a rebuild is paging through the table, as (feedback id, rating, doctor)
+        self._pending: Optional[List[Tuple[Any, int, Optional[str]]]] = None
+
+    def _apply(self, global_agg: RatingAggregate, by_doctor: Dict[str, RatingAggregate], rating: int, doctor_id: Optional[str]):
+        global_agg.add(rating)
+        if doctor_id:
+            if doctor_id not in by_doctor:
+                by_doctor[doctor_id] = RatingAggregate()
+            by_doctor[doctor_id].add(rating)
+
+    def record(self, rating: int, doctor_id: Optional[str] = None, feedback_id: Any = None):
+        if not 1 <= rating <= 5:
+            return
+        with self._lock:
+            self._apply(self._global, self._by_doctor, rating, doctor_id)
+            if self._pending is not None:
+                self._pending.append((feedback_id, rating, doctor_id))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._global.to_dict()
+
+    def doctor_summary(self, doctor_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._by_doctor.get(doctor_id, RatingAggregate()).to_dict()
+
+    def rebuild(self, rows):
+        """Rebuild aggregates from an iterable of {"doctor_id", "rating"} rows"""
+        with self._rebuild_lock:
+            self._rebuild(rows)
+
+    def _rebuild(self, rows):
+        with self._lock:
+            self._pending = []
+        global_agg = RatingAggregate()
+        by_doctor: Dict[str, RatingAggregate] = {}
+        scanned = set()
+        try:
+            for row in rows:
+                scanned.add(row.get("id"))
+                rating = row.get("rating")
+                if rating is not None and 1 <= rating <= 5:
+                    self._apply(global_agg, by_doctor, rating, row.get("doctor_id"))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            # A rating recorded mid-rebuild may already be in the scanned pages
+            for feedback_id, rating, doctor_id in self._pending:
+                if feedback_id is None or feedback_id not in scanned:
+                    self._apply(global_agg, by_doctor, rating, doctor_id)
+            self._pending = None
+            self._global = global_agg
+            self._by_doctor = by_doctor
+            self.loaded = True
+
+    def reconcile(self, supabase):
+        self.rebuild(_iter_ratings(supabase))
+
+    def ensure_loaded(self, supabase):
+        """Load the aggregates if the startup load has not finished (blocking; run it in a thread)"""
+        if self.loaded:
+            return
+        with self._rebuild_lock:
+            # Another caller may have loaded them while we waited
+            if not self.loaded:
+                self.reconcile(supabase)
+
+
+def _iter_ratings(supabase):
+    """Page through feedback by id, fetching only the columns the aggregates need"""
+    last_id = None
+    while True:
+        query = supabase.table("feedback").select("id,doctor_id,rating")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        result = query.order("id").limit(RECONCILE_PAGE_SIZE).execute()
+        rows = result.data or []
+        yield from rows
+        if len(rows) < RECONCILE_PAGE_SIZE:
+            return
+        last_id = rows[-1]["id"]
+
+
+# Process-wide aggregates
+feedback_aggregates = FeedbackAggregates()
+
+
+def reconcile_feedback():
+    supabase = get_supabase_admin()
+    if supabase:
+        feedback_aggregates.reconcile(supabase)
@@ -0,0 +1,187 @@
+"""
+Load-aware LLM usage for symptom classification.
+
+Three signals are tracked: the latency of recent Gemini calls (EWMA), the
+number of Gemini calls in flight and the event loop's scheduling lag.
+When any of them crosses its threshold the shedder switches to degraded
+mode, in which classify_symptom_with_llm answers from keywords instead of
+adding another LLM call to an already struggling system, and the session
+is flagged for a later re-triage by staff. It switches back only once
+every signal has stayed below a fraction of its threshold for a while
+(hysteresis), so it does not flap at the boundary. While degraded, an
+occasional probe call still goes to the LLM to keep the latency signal
+current.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from services import metrics
+
+LLM_SHED_LATENCY_SECONDS = float(os.getenv("LLM_SHED_LATENCY_SECONDS", "5"))
+LLM_SHED_IN_FLIGHT = int(os.getenv("LLM_SHED_IN_FLIGHT", "8"))
+LLM_SHED_LOOP_LAG_SECONDS = float(os.getenv("LLM_SHED_LOOP_LAG_SECONDS", "0.25"))
+# Recover once every signal is below this fraction of its threshold for LLM_RECOVER_SECONDS
+LLM_RECOVER_FRACTION = float(os.getenv("LLM_RECOVER_FRACTION", "0.5"))
+LLM_RECOVER_SECONDS = float(os.getenv("LLM_RECOVER_SECONDS", "30"))
+LLM_PROBE_INTERVAL_SECONDS = float(os.getenv("LLM_PROBE_INTERVAL_SECONDS", "10"))
+LOOP_LAG_SAMPLE_SECONDS = 0.5
+
+NORMAL = "normal"
+DEGRADED = "degraded"
+
+# Weight of the newest sample in the moving averages
+_EWMA_ALPHA = 0.3
+
+
+class LoadShedder:
+    """Decides per classification whether the LLM may be called"""
+
+    def __init__(
+        self,
+        latency_threshold: float = LLM_SHED_LATENCY_SECONDS,
+        in_flight_threshold: int = LLM_SHED_IN_FLIGHT,
+        loop_lag_threshold: float = LLM_SHED_LOOP_LAG_SECONDS,
+        recover_fraction: float = LLM_RECOVER_FRACTION,
+        recover_seconds: float = LLM_RECOVER_SECONDS,
+        probe_interval: float = LLM_PROBE_INTERVAL_SECONDS,
+    ):
+        self.latency_threshold = latency_threshold
+        self.in_flight_threshold = in_flight_threshold
+        self.loop_lag_threshold = loop_lag_threshold
+        self.recover_fraction = recover_fraction
+        self.recover_seconds = recover_seconds
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self.mode = NORMAL
+        self.reasons: List[str] = []
+        self.llm_in_flight = 0
+        self.llm_latency = 0.0
+        self.loop_lag = 0.0
+        self._calm_since: Optional[float] = None
+        self._last_probe = 0.0
+        self.changed_at = time.time()
+        self.transitions = 0
+        self.llm_calls = 0
+        self.shed = 0
+        self.probes = 0
+
+    def _overloaded(self, scale: float) -> List[str]:
+        reasons = []
+        if self.llm_latency > self.latency_threshold * scale:
+            reasons.append("llm_latency")
+        if self.llm_in_flight >= max(1, int(self.in_flight_threshold * scale)):
+            reasons.append("llm_in_flight")
+        if self.loop_lag > self.loop_lag_threshold * scale:
+            reasons.append("loop_lag")
+        return reasons
+
+    def _switch(self, mode: str, reasons: List[str]):
+        self.mode = mode
+        self.reasons = reasons
+        self.changed_at = time.time()
+        self.transitions += 1
+        if mode == DEGRADED:
+            print(f"[WARNING] LLM load shedding on ({', '.join(reasons)}): classifying symptoms by keywords")
+        else:
+            print("[INFO] LLM load shedding off: symptom classification back on the LLM")
+
+    def _evaluate(self, now: float):
+        if self.mode == NORMAL:
+            reasons = self._overloaded(1.0)
+            if reasons:
+                self._switch(DEGRADED, reasons)
+                self._calm_since = None
+            return
+        if self._overloaded(self.recover_fraction):
+            self._calm_since = None
+        elif self._calm_since is None:
+            self._calm_since = now
+        elif now - self._calm_since >= self.recover_seconds:
+            self._switch(NORMAL, [])
+
+    def allow_llm(self, gate: Optional[Callable[[], bool]] = None) -> bool:
+        """True if this classification may call the LLM; False means use keywords and re-triage later.
+
+        gate (e.g. a circuit breaker's allow) is asked only once the shedder
+        would let the call through, so a probe is counted only if it is sent.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evaluate(now)
+            if self.mode == NORMAL:
+                return gate is None or gate()
+            if self.llm_in_flight == 0 and now - self._last_probe >= self.probe_interval:
+                if gate is not None and not gate():
+                    return False
+                self._last_probe = now
+                self.probes += 1
+                return True
+            self.shed += 1
+            return False
+
+    @contextmanager
+    def llm_call(self):
+        """Wrap an LLM call to record its latency and in-flight count"""
+        with self._lock:
+            self.llm_in_flight += 1
+            self.llm_calls += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.llm_in_flight -= 1
+                self.llm_latency += _EWMA_ALPHA * (elapsed - self.llm_latency)
+
+    def record_loop_lag(self, lag: float):
+        with self._lock:
+            self.loop_lag += _EWMA_ALPHA * (max(lag, 0.0) - self.loop_lag)
+            self._evaluate(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "reasons": list(self.reasons),
+            "changed_at": self.changed_at,
+            "transitions": self.transitions,
+            "llm_in_flight": self.llm_in_flight,
+            "llm_latency_seconds": round(self.llm_latency, 4),
+            "loop_lag_seconds": round(self.loop_lag, 4),
+            "thresholds": {
+                "llm_latency_seconds": self.latency_threshold,
+                "llm_in_flight": self.in_flight_threshold,
+                "loop_lag_seconds": self.loop_lag_threshold,
+                "recover_fraction": self.recover_fraction,
+                "recover_seconds": self.recover_seconds,
+            },
+            "llm_calls": self.llm_calls,
+            "shed": self.shed,
+            "probes": self.probes,
+        }
+
+
+# Process-wide shedder consulted by the intake workflow
+load_shedder = LoadShedder()
+metrics.register("llm_load_shedding", load_shedder.stats)
+
+_lag_monitor: Optional[asyncio.Task] = None
+
+
+async def _monitor_loop_lag():
+    """Measure how late the event loop wakes us up after a fixed sleep"""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(LOOP_LAG_SAMPLE_SECONDS)
+        load_shedder.record_loop_lag(time.monotonic() - started - LOOP_LAG_SAMPLE_SECONDS)
+
+
+def start_lag_monitor() -> asyncio.Task:
+    global _lag_monitor
+    if _lag_monitor is None or _lag_monitor.done():
+        _lag_monitor = asyncio.create_task(_monitor_loop_lag())
+    return _lag_monitor
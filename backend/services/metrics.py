@@ -0,0 +1,23 @@
+"""
+Process metrics registry.
+
+Components register a provider callable under a name; the /metrics endpoint
+calls every provider and returns the combined snapshot as JSON.
+"""
+from typing import Any, Callable, Dict
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, provider: Callable[[], Dict[str, Any]]):
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Any]:
+    metrics = {}
+    for name, provider in list(_providers.items()):
+        try:
+            metrics[name] = provider()
+        except Exception as e:
+            metrics[name] = {"error": str(e)}
+    return metrics
@@ -0,0 +1,154 @@
+"""
+Bounded LRU cache for patient lookups.
+
+Lookups by email, phone or patient_id are cached under normalized keys
+(lower-cased email, E.164 phone), so "Jane@Example.com " and
+"jane@example.com" share an entry, as do "098765 43210" and
+"+91 98765 43210". Every cached row is indexed by the patient's id, and
+when a patient changes all of their keys are dropped and the fresh row is
+stored. A process therefore reads its own writes. Other processes see the
+change within the TTL. Empty results are never cached, so a patient
+registered elsewhere is found as soon as they exist.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services import metrics
+
+PATIENT_CACHE_MAX_ENTRIES = int(os.getenv("PATIENT_CACHE_MAX_ENTRIES", "10000"))
+PATIENT_CACHE_TTL_SECONDS = float(os.getenv("PATIENT_CACHE_TTL_SECONDS", "300"))
+# Country calling code assumed for numbers written without one
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "91")
+
+Key = Tuple[str, str]
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+    """Best-effort E.164: '+' followed by country code and subscriber number"""
+    raw = phone.strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    # National format: drop the trunk prefix and add the default country code
+    digits = digits.lstrip("0")
+    if len(digits) <= 10:
+        return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+    return f"+{digits}"
+
+
+def lookup_key(kind: str, value: str) -> Key:
+    if kind == "email":
+        return kind, normalize_email(value)
+    if kind == "phone":
+        return kind, normalize_phone(value)
+    return kind, value.strip()
+
+
+class PatientCache:
+    """LRU of lookup key -> patient rows, with per-patient invalidation"""
+
+    def __init__(self, max_entries: int = PATIENT_CACHE_MAX_ENTRIES, ttl: float = PATIENT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Key, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._keys_by_patient: Dict[str, Set[Key]] = {}
+        # Bumped on every invalidation so a lookup that read the database
+        # before a concurrent update cannot store its stale rows afterwards
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for row in entry[1]:
+                keys = self._keys_by_patient.get(row.get("id"))
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._keys_by_patient[row.get("id")]
+
+    def _store(self, key: Key, rows: List[Dict[str, Any]]):
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, rows)
+        for row in rows:
+            self._keys_by_patient.setdefault(row.get("id"), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, kind: str, value: str) -> Optional[List[Dict[str, Any]]]:
+        key = lookup_key(kind, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(row) for row in entry[1]]
+
+    def put(self, kind: str, value: str, rows: List[Dict[str, Any]], generation: int):
+        """Cache lookup results read while the cache was at `generation`"""
+        if not rows:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._store(lookup_key(kind, value), [dict(row) for row in rows])
+
+    def invalidate(self, row: Dict[str, Any]):
+        """Forget every entry holding this patient, plus entries under their email and phone"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            for key in list(self._keys_by_patient.pop(row.get("id"), ())):
+                self._drop(key)
+            # A new patient sharing a phone number changes that lookup's result
+            for kind in ("email", "phone"):
+                if row.get(kind):
+                    self._drop(lookup_key(kind, row[kind]))
+
+    def remember(self, row: Dict[str, Any]):
+        """Store a freshly written patient so this process reads its own write"""
+        self.invalidate(row)
+        with self._lock:
+            if row.get("email"):
+                self._store(lookup_key("email", row["email"]), [dict(row)])
+            if row.get("patient_id"):
+                self._store(lookup_key("patient_id", row["patient_id"]), [dict(row)])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Process-wide cache for /patients lookups
+patient_cache = PatientCache()
+metrics.register("patient_cache", patient_cache.stats)
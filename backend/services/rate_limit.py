@@ -0,0 +1,163 @@
+"""
+Admission control for /api/chat.
+
+Every chat message may cost a Gemini call and a worker thread, so a single
+misbehaving kiosk or script can starve everyone else. Before any work is
+done a message must pass three checks:
+
+- a token bucket per session id (a steady message rate with a small burst),
+- a token bucket per client IP (shared by all sessions from one address),
+- a global cap on messages being processed at once.
+
+A rejected message gets 429 with a Retry-After telling the client when a
+token will be available (or, for the global cap, a short fixed back-off).
+Buckets are kept in bounded LRUs, so many distinct clients cannot grow
+memory without limit; an evicted bucket simply starts full again.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from services import metrics
+
+CHAT_SESSION_RATE = float(os.getenv("CHAT_SESSION_RATE", "0.5"))  # messages per second
+CHAT_SESSION_BURST = float(os.getenv("CHAT_SESSION_BURST", "5"))
+CHAT_IP_RATE = float(os.getenv("CHAT_IP_RATE", "2"))
+CHAT_IP_BURST = float(os.getenv("CHAT_IP_BURST", "20"))
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "16"))
+CHAT_SATURATED_RETRY_AFTER = float(os.getenv("CHAT_SATURATED_RETRY_AFTER", "1"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+# Reverse proxies in front of the app (e.g. 1 on Render); the client address is
+# taken that many entries from the right of X-Forwarded-For
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+
+SESSION_LIMITED = "session_rate"
+IP_LIMITED = "ip_rate"
+SATURATED = "saturated"
+
+
+def client_ip(request: Request) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if RATE_LIMIT_PROXY_HOPS and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+    def wait_time(self, rate: float, burst: float, now: float) -> float:
+        """Refill, then return seconds until one token is available (0 if it is now)"""
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+
+class KeyedLimiter:
+    """Token buckets keyed by session id or IP, in a bounded LRU"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ChatAdmission:
+    """Per-session and per-IP token buckets plus a global in-flight cap"""
+
+    def __init__(
+        self,
+        session_rate: float = CHAT_SESSION_RATE,
+        session_burst: float = CHAT_SESSION_BURST,
+        ip_rate: float = CHAT_IP_RATE,
+        ip_burst: float = CHAT_IP_BURST,
+        max_in_flight: int = CHAT_MAX_IN_FLIGHT,
+    ):
+        self._lock = threading.Lock()
+        self.sessions = KeyedLimiter(session_rate, session_burst)
+        self.ips = KeyedLimiter(ip_rate, ip_burst)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {SESSION_LIMITED: 0, IP_LIMITED: 0, SATURATED: 0}
+
+    def try_acquire(self, session_id: str, ip: str) -> Optional[Tuple[str, int]]:
+        """Admit a message, or return (reason, Retry-After seconds).
+
+        An admitted message holds an in-flight place until release().
+        Tokens are only taken when every check passes, so a message refused
+        by one limit does not also use up the other.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected[SATURATED] += 1
+                return SATURATED, math.ceil(CHAT_SATURATED_RETRY_AFTER)
+            session = self.sessions.bucket(session_id, now)
+            wait = session.wait_time(self.sessions.rate, self.sessions.burst, now)
+            if wait:
+                self.rejected[SESSION_LIMITED] += 1
+                return SESSION_LIMITED, math.ceil(wait)
+            address = self.ips.bucket(ip, now)
+            wait = address.wait_time(self.ips.rate, self.ips.burst, now)
+            if wait:
+                self.rejected[IP_LIMITED] += 1
+                return IP_LIMITED, math.ceil(wait)
+            session.tokens -= 1
+            address.tokens -= 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.admitted += 1
+            return None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limits": {
+                "session_rate": self.sessions.rate,
+                "session_burst": self.sessions.burst,
+                "ip_rate": self.ips.rate,
+                "ip_burst": self.ips.burst,
+                "max_in_flight": self.max_in_flight,
+            },
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "tracked_sessions": len(self.sessions),
+            "tracked_ips": len(self.ips),
+        }
+
+
+# Process-wide admission control for /api/chat
+chat_admission = ChatAdmission()
+metrics.register("chat_rate_limit", chat_admission.stats)
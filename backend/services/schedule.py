@@ -0,0 +1,158 @@
+"""
+Expansion of weekly schedule templates into doctor_slots.
+
+Each active template describes one weekday's working window split into
+fixed-length slots. Regenerating a date range is idempotent: missing slots
+are inserted (ignoring duplicates on (doctor_id, slot_date, start_time)),
+template-generated slots nobody has booked are updated to match their
+template, and ones that no longer match any template are removed. Slots
+with bookings and slots created or edited by hand (no template_id) are
+never touched. A background job keeps a rolling horizon of slots
+generated for every doctor with templates.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database import get_supabase_admin
+
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "28"))
+SCHEDULE_EXTEND_INTERVAL_SECONDS = float(os.getenv("SCHEDULE_EXTEND_SECONDS", "21600"))
+BATCH_SIZE = 500
+
+
+def _as_time(value: Any) -> time:
+    return value if isinstance(value, time) else time.fromisoformat(str(value))
+
+
+def _as_date(value: Any) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def validate_template(template: Dict[str, Any]) -> Optional[str]:
+    """Return an error message for an invalid template, or None"""
+    if not 0 <= int(template["weekday"]) <= 6:
+        return "weekday must be between 0 (Monday) and 6 (Sunday)"
+    if _as_time(template["end_time"]) <= _as_time(template["start_time"]):
+        return "end_time must be after start_time"
+    if int(template["slot_minutes"]) < 5:
+        return "slot_minutes must be at least 5"
+    if int(template["capacity"]) < 1:
+        return "capacity must be at least 1"
+    return None
+
+
+def expand_template(template: Dict[str, Any], start: date, end: date) -> List[Dict[str, Any]]:
+    """Slots a template produces for dates in [start, end)"""
+    weekday = int(template["weekday"])
+    day_start, day_end = _as_time(template["start_time"]), _as_time(template["end_time"])
+    length = timedelta(minutes=int(template["slot_minutes"]))
+
+    slots = []
+    day = start + timedelta(days=(weekday - start.weekday()) % 7)
+    while day < end:
+        slot_start = datetime.combine(day, day_start)
+        window_end = datetime.combine(day, day_end)
+        while slot_start + length <= window_end:
+            slots.append({
+                "doctor_id": template["doctor_id"],
+                "slot_date": day.isoformat(),
+                "start_time": slot_start.time().isoformat(),
+                "end_time": (slot_start + length).time().isoformat(),
+                "capacity": int(template["capacity"]),
+                "template_id": template["id"],
+            })
+            slot_start += length
+        day += timedelta(days=7)
+    return slots
+
+
+def _batches(items: List[Any], size: int = BATCH_SIZE) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _existing_slots(supabase, doctor_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+    rows, last_id = [], None
+    while True:
+        query = (
+            supabase.table("doctor_slots").select("id,slot_date,start_time,end_time,capacity,booked,template_id")
+            .eq("doctor_id", doctor_id).gte("slot_date", start.isoformat()).lt("slot_date", end.isoformat())
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(BATCH_SIZE).execute().data or []
+        rows.extend(page)
+        if len(page) < BATCH_SIZE:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def generate_slots(supabase, doctor_id: str, start: Optional[date] = None, days: int = SCHEDULE_HORIZON_DAYS) -> Dict[str, int]:
+    """Bring a doctor's template-generated slots for [start, start + days) in line with their templates"""
+    start = start or date.today()
+    end = start + timedelta(days=days)
+
+    result = (
+        supabase.table("doctor_schedule_templates").select("*")
+        .eq("doctor_id", doctor_id).eq("is_active", True).order("created_at").execute()
+    )
+    wanted: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for template in result.data or []:
+        for slot in expand_template(template, start, end):
+            # Overlapping templates: the most recently created one wins
+            wanted[(slot["slot_date"], slot["start_time"])] = slot
+
+    existing = {
+        (_as_date(row["slot_date"]).isoformat(), _as_time(row["start_time"]).isoformat()): row
+        for row in _existing_slots(supabase, doctor_id, start, end)
+    }
+    missing, changed = [], {}
+    for key, slot in wanted.items():
+        row = existing.get(key)
+        if row is None:
+            missing.append(slot)
+        elif row.get("template_id") and not row.get("booked"):
+            values = (slot["end_time"], slot["capacity"], slot["template_id"])
+            if values != (_as_time(row["end_time"]).isoformat(), row.get("capacity"), row["template_id"]):
+                # Slots needing the same new values are updated together
+                changed.setdefault(values, []).append(row["id"])
+
+    for batch in _batches(missing):
+        # A slot inserted concurrently (by hand or another run) is left as it is
+        supabase.table("doctor_slots").upsert(
+            batch, on_conflict="doctor_id,slot_date,start_time", ignore_duplicates=True
+        ).execute()
+    for (end_time, capacity, template_id), ids in changed.items():
+        for batch in _batches(ids):
+            # booked = 0 again at write time, so a booking made since the read is not overwritten
+            supabase.table("doctor_slots").update(
+                {"end_time": end_time, "capacity": capacity, "template_id": template_id}
+            ).in_("id", batch).eq("booked", 0).execute()
+
+    stale = [
+        row["id"] for key, row in existing.items()
+        if row.get("template_id") and not row.get("booked") and key not in wanted
+    ]
+    for batch in _batches(stale):
+        supabase.table("doctor_slots").delete().in_("id", batch).eq("booked", 0).execute()
+
+    return {
+        "generated": len(wanted),
+        "inserted": len(missing),
+        "updated": sum(len(ids) for ids in changed.values()),
+        "removed": len(stale),
+    }
+
+
+def extend_schedules():
+    """Roll every templated doctor's slots forward to the configured horizon"""
+    supabase = get_supabase_admin()
+    if not supabase:
+        return
+    result = supabase.table("doctor_schedule_templates").select("doctor_id").eq("is_active", True).execute()
+    for doctor_id in {row["doctor_id"] for row in result.data or []}:
+        try:
+            generate_slots(supabase, doctor_id)
+        except Exception as e:
+            print(f"[WARNING] Slot generation failed for doctor {doctor_id}: {e}")
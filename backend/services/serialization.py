@@ -0,0 +1,93 @@
+"""
+Fast JSON rendering for list endpoints.
+
+Rows read from Supabase already follow the table schema, so list endpoints
+skip per-row model validation: each row is projected onto the response
+model's fields ("trusted" construction) and encoded with orjson, falling
+back to the standard library when orjson is not installed. TypeAdapters for
+the validating path are built once per model and reused.
+"""
+import json
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_adapters: Dict[Any, TypeAdapter] = {}
+_projections: Dict[Any, Tuple[Tuple[str, Any], ...]] = {}
+
+
+def adapter(model) -> TypeAdapter:
+    """TypeAdapter for model, built on first use"""
+    if model not in _adapters:
+        _adapters[model] = TypeAdapter(model)
+    return _adapters[model]
+
+
+def _row_model(model):
+    """The BaseModel a response model is made of (unwraps List[X])"""
+    if isinstance(model, type) and issubclass(model, BaseModel):
+        return model
+    args = typing.get_args(model)
+    if typing.get_origin(model) in (list, List) and args:
+        return _row_model(args[0])
+    return None
+
+
+def _projection(model) -> Tuple[Tuple[str, Any], ...]:
+    """(field name, default) pairs of a model, computed once"""
+    if model not in _projections:
+        _projections[model] = tuple(
+            (name, None if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+        )
+    return _projections[model]
+
+
+def trusted_row(model, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a DB row onto a model's fields without validating it"""
+    return {name: row.get(name, default) for name, default in _projection(model)}
+
+
+def trusted_rows(model, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    fields = _projection(model)
+    return [{name: row.get(name, default) for name, default in fields} for row in rows]
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def render_json(content: Any, model=None, trusted: bool = True) -> bytes:
+    """Serialize content to JSON bytes, shaped by a response model when given.
+
+    DB-sourced content is trusted by default and only projected onto the
+    model; pass trusted=False to validate it through the model instead.
+    """
+    if model is None:
+        return dumps(content)
+    row_model = _row_model(model)
+    if trusted and row_model is not None:
+        if isinstance(content, list):
+            return dumps(trusted_rows(row_model, content))
+        return dumps(trusted_row(row_model, content))
+    model_adapter = adapter(model)
+    return model_adapter.dump_json(model_adapter.validate_python(content))
+
+
+def json_response(content: Any, model=None, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """JSON response for DB-sourced content, bypassing FastAPI's response_model validation"""
+    return Response(
+        content=render_json(content, model),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,74 @@
+"""
+Single-flight execution of identical concurrent queries.
+
+When several requests ask for the same data at the same moment (admin tabs
+and lobby screens refreshing together), only the first one runs the query;
+the others wait for its result instead of sending their own copy to
+Supabase. Nothing is kept once the query finishes, so this never serves
+stale data: it only collapses calls that overlap in time. The shared work
+runs as its own task, so a caller disconnecting does not cancel it for the
+others.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from services import metrics
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same (name, key) into one execution"""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str) -> Dict[str, int]:
+        counts = self._counts.get(name)
+        if counts is None:
+            counts = self._counts[name] = {"calls": 0, "executions": 0, "collapsed": 0, "errors": 0}
+        return counts
+
+    async def _execute(self, fn: Callable, args: tuple) -> Any:
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args)
+        # Supabase calls are blocking; keep them off the event loop
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+
+    async def do(self, name: str, key: Hashable, fn: Callable, *args) -> Any:
+        """Run fn(*args), or join the identical call already in flight.
+
+        `name` groups calls for metrics; `key` distinguishes parameters within
+        it. fn may be a coroutine function or a blocking one (run in a thread).
+        """
+        counts = self._count(name)
+        counts["calls"] += 1
+        flight = (name, key)
+        task = self._inflight.get(flight)
+        if task is None:
+            counts["executions"] += 1
+            task = asyncio.ensure_future(self._execute(fn, args))
+            self._inflight[flight] = task
+            task.add_done_callback(lambda done: self._finished(flight, done, counts))
+        else:
+            counts["collapsed"] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, flight: Tuple[str, Hashable], task: asyncio.Future, counts: Dict[str, int]):
+        if self._inflight.get(flight) is task:
+            del self._inflight[flight]
+        # Retrieve the exception even if every caller has gone away
+        if not task.cancelled() and task.exception() is not None:
+            counts["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, counts in list(self._counts.items()):
+            calls = counts["calls"]
+            stats[name] = {**counts, "collapse_rate": round(counts["collapsed"] / calls, 4) if calls else 0.0}
+        stats["in_flight"] = len(self._inflight)
+        return stats
+
+
+# Process-wide group shared by the data-access paths
+single_flight = SingleFlight()
+metrics.register("single_flight", single_flight.stats)
@@ -0,0 +1,305 @@
+"""
+Local write spool for Supabase writes that must not be lost.
+
+Chat transcripts, consultations and intake records are written in the
+background; when Supabase is slow or down those writes used to be dropped.
+Now a write that fails for a transient reason (network error, timeout,
+5xx) is appended to a SQLite file on local disk instead, and a background
+replayer drains the spool oldest-first once the database is reachable
+again. While anything is waiting in the spool, new writes are queued behind
+it rather than attempted directly, so an older spooled write can never
+overwrite a newer one.
+
+Each entry records the table, the payload and, for upserts, the conflict
+column. Consecutive entries for the same table are replayed as one batch;
+upserts for the same key within a batch are merged first, so replaying a
+backlog of transcript saves writes each session once. Writes the database
+rejects outright (constraint or schema errors) are not spooled, and a
+spooled write rejected SPOOL_MAX_ATTEMPTS times is set aside as dead for
+inspection instead of blocking the rest. Columns that come from an optional
+migration (OPTIONAL_COLUMNS) are dropped from spooled payloads if the
+database does not have them, as the live write path does. Columns in
+INSERT_ONLY_COLUMNS (the original write time) are set only when an upsert
+creates the row: a session first saved during an outage keeps the day it
+happened, and a replayed save never moves an existing row's created_at.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import get_supabase_admin
+from services import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+SPOOL_PATH = os.getenv("WRITE_SPOOL_PATH", os.path.join(os.path.dirname(__file__), "..", "spool", "writes.db"))
+SPOOL_REPLAY_INTERVAL_SECONDS = float(os.getenv("SPOOL_REPLAY_INTERVAL_SECONDS", "15"))
+SPOOL_BATCH_SIZE = int(os.getenv("SPOOL_BATCH_SIZE", "200"))
+SPOOL_MAX_ATTEMPTS = int(os.getenv("SPOOL_MAX_ATTEMPTS", "5"))
+
+# Columns added by optional migrations, written only when present (database/retriage.sql)
+OPTIONAL_COLUMNS = {"chat_sessions": ("needs_retriage",)}
+# Upsert columns written only when the row is new; the earliest spooled value wins a merge
+INSERT_ONLY_COLUMNS = ("created_at",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spooled_writes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    on_conflict TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    dead INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def is_transient(error: Exception) -> bool:
+    """False for errors the database will keep returning (bad data, missing column, permissions)"""
+    code = str(getattr(error, "code", None) or "")
+    if not code:
+        # Connection errors and timeouts from the HTTP client carry no code
+        return True
+    if code[:2] in ("22", "23", "42") or code.startswith(("PGRST1", "PGRST2")):
+        return False
+    if code.isdigit() and len(code) == 3 and code.startswith("4") and code not in ("408", "429"):
+        return False
+    return True
+
+
+def missing_optional_column(table: str, error: Exception) -> Optional[str]:
+    """The OPTIONAL_COLUMNS entry an undefined-column error (42703 / PGRST204) complains about, if any"""
+    message = str(error)
+    code = str(getattr(error, "code", None) or "")
+    if code not in ("42703", "PGRST204") and "42703" not in message and "PGRST204" not in message:
+        return None
+    return next((column for column in OPTIONAL_COLUMNS.get(table, ()) if column in message), None)
+
+
+class WriteSpool:
+    """Append-only SQLite spool of pending Supabase writes"""
+
+    def __init__(self, path: str = SPOOL_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Pending entries, so the hot path knows without touching disk whether to queue
+        self._pending = 0
+        self.appended = 0
+        self.replayed = 0
+        self.replay_failures = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def open(self):
+        """Open the spool file and pick up entries left by a previous run"""
+        try:
+            if self.refresh():
+                print(f"[INFO] Write spool {self.path}: {self._pending} pending writes from a previous run")
+        except Exception as e:
+            print(f"[ERROR] Write spool {self.path} unavailable, failed writes will be dropped: {e}")
+
+    def refresh(self) -> int:
+        """Recount pending entries (other worker processes may share the file)"""
+        with self._lock:
+            self._pending = self._connect().execute("SELECT COUNT(*) FROM spooled_writes WHERE dead = 0").fetchone()[0]
+            return self._pending
+
+    def append(self, kind: str, table: str, payload: Dict[str, Any], on_conflict: Optional[str] = None):
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO spooled_writes (kind, table_name, on_conflict, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, table, on_conflict, json.dumps(payload, default=str), time.time()),
+            )
+            self._pending += 1
+            self.appended += 1
+
+    def queue_if_backlogged(self, kind: str, table: str, payload: Dict[str, Any], on_conflict: Optional[str] = None) -> bool:
+        """Spool the write if older writes are still waiting, so it lands after them; True if spooled"""
+        if not self._pending:
+            return False
+        self.append(kind, table, payload, on_conflict)
+        return True
+
+    def save_failed(self, kind: str, table: str, payload: Dict[str, Any], error: Exception, on_conflict: Optional[str] = None) -> bool:
+        """Spool a write that failed for a transient reason; True if spooled"""
+        if not is_transient(error):
+            return False
+        self.append(kind, table, payload, on_conflict)
+        print(f"[WARNING] Supabase write for {kind} failed, spooled for replay: {error}")
+        return True
+
+    def _head(self, limit: int) -> List[Tuple[int, str, str, Optional[str], Dict[str, Any], int]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, kind, table_name, on_conflict, payload, attempts FROM spooled_writes"
+                " WHERE dead = 0 ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [(seq, kind, table, conflict, json.loads(payload), attempts) for seq, kind, table, conflict, payload, attempts in rows]
+
+    def _delete(self, seqs: List[int]):
+        with self._lock:
+            self._connect().executemany("DELETE FROM spooled_writes WHERE seq = ?", [(seq,) for seq in seqs])
+            self._pending = max(self._pending - len(seqs), 0)
+            self.replayed += len(seqs)
+
+    def _drop_column(self, entries: List[Tuple[int, str, str, Optional[str], Dict[str, Any], int]], column: str) -> bool:
+        """Remove a column from the spooled payloads; False if none of them had it"""
+        changed = [(json.dumps({k: v for k, v in entry[4].items() if k != column}, default=str), entry[0])
+                   for entry in entries if column in entry[4]]
+        if not changed:
+            return False
+        with self._lock:
+            self._connect().executemany("UPDATE spooled_writes SET payload = ? WHERE seq = ?", changed)
+        print(f"[WARNING] {entries[0][2]}.{column} missing, replaying {len(changed)} spooled writes without it")
+        return True
+
+    def _record_rejection(self, seq: int, attempts: int, error: Exception) -> bool:
+        """Count a rejected replay; returns True if the entry is now set aside"""
+        dead = attempts + 1 >= SPOOL_MAX_ATTEMPTS
+        with self._lock:
+            self._connect().execute(
+                "UPDATE spooled_writes SET attempts = attempts + 1, last_error = ?, dead = ? WHERE seq = ?",
+                (str(error)[:1000], int(dead), seq),
+            )
+            if dead:
+                self._pending = max(self._pending - 1, 0)
+                self.dead_lettered += 1
+        if dead:
+            print(f"[ERROR] Spooled write {seq} rejected {attempts + 1} times, set aside: {error}")
+        return dead
+
+    def _write(self, supabase, table: str, on_conflict: Optional[str], payloads: List[Dict[str, Any]]):
+        """Write one batch, merging upserts per key and grouping rows with the same columns"""
+        if on_conflict:
+            merged: Dict[Any, Dict[str, Any]] = {}
+            for payload in payloads:
+                key = payload.get(on_conflict)
+                earlier = merged.get(key, {})
+                merged[key] = {**earlier, **payload, **{c: earlier[c] for c in INSERT_ONLY_COLUMNS if c in earlier}}
+            payloads = list(merged.values())
+        by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for payload in payloads:
+            by_columns.setdefault(tuple(sorted(payload)), []).append(payload)
+        for rows in by_columns.values():
+            insert_only = [c for c in INSERT_ONLY_COLUMNS if c in rows[0]]
+            if on_conflict and insert_only:
+                # Create the missing rows with their original values, then update all of them
+                # without those columns. Both steps are idempotent, so a retry after a partial
+                # write is safe.
+                supabase.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+                rows = [{k: v for k, v in row.items() if k not in insert_only} for row in rows]
+            if on_conflict:
+                supabase.table(table).upsert(rows, on_conflict=on_conflict).execute()
+            else:
+                supabase.table(table).insert(rows).execute()
+
+    def replay(self, supabase, batch_size: int = SPOOL_BATCH_SIZE) -> int:
+        """Drain the spool oldest-first until it is empty or a write fails; returns writes replayed"""
+        total, limit = 0, batch_size
+        while True:
+            entries = self._head(limit)
+            if not entries:
+                return total
+            # Consecutive entries for the same table and conflict column form one batch. Inserts
+            # are not idempotent, so their batches also stop where the columns change: a batch
+            # must either fail or be written as a whole, never be retried after a partial write.
+            batch = [entries[0]]
+            for entry in entries[1:]:
+                if entry[2:4] != batch[0][2:4] or (not entry[3] and entry[4].keys() != batch[0][4].keys()):
+                    break
+                batch.append(entry)
+            try:
+                self._write(supabase, batch[0][2], batch[0][3], [entry[4] for entry in batch])
+            except Exception as e:
+                self.replay_failures += 1
+                self.last_error = str(e)[:500]
+                if is_transient(e):
+                    # Still unreachable; keep everything in order and retry next round
+                    return total
+                column = missing_optional_column(batch[0][2], e)
+                if column and self._drop_column(batch, column):
+                    continue
+                if len(batch) > 1:
+                    # Find the rejected write by replaying this batch one entry at a time
+                    limit = 1
+                    continue
+                if not self._record_rejection(batch[0][0], batch[0][5], e):
+                    # Retry it next round; everything behind it waits to keep the order
+                    return total
+                limit = batch_size
+                continue
+            self._delete([entry[0] for entry in batch])
+            total += len(batch)
+            limit = batch_size
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "path": self.path,
+            "depth": self._pending,
+            "oldest_age_seconds": None,
+            "dead": 0,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "replay_failures": self.replay_failures,
+            "dead_lettered": self.dead_lettered,
+            "last_error": self.last_error,
+        }
+        if self._conn is None:
+            return stats
+        with self._lock:
+            oldest, dead = self._conn.execute(
+                "SELECT MIN(CASE WHEN dead = 0 THEN created_at END), SUM(dead) FROM spooled_writes"
+            ).fetchone()
+        stats["oldest_age_seconds"] = round(time.time() - oldest, 1) if oldest else None
+        stats["dead"] = dead or 0
+        return stats
+
+
+# Process-wide spool for background Supabase writes
+write_spool = WriteSpool()
+metrics.register("write_spool", write_spool.stats)
+
+
+def replay_spool():
+    """Background job: replay spooled writes if there are any and Supabase is configured"""
+    if not write_spool.refresh():
+        return
+    supabase = get_supabase_admin()
+    if not supabase:
+        return
+    lock_file = None
+    if fcntl is not None:
+        # With several workers on one spool file, only one replays at a time
+        lock_file = open(write_spool.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+    try:
+        replayed = write_spool.replay(supabase)
+        if replayed:
+            print(f"[INFO] Replayed {replayed} spooled writes, {write_spool._pending} still pending")
+    finally:
+        if lock_file is not None:
+            lock_file.close()
@@ -0,0 +1,179 @@
+"""
+Incrementally maintained daily hospital statistics.
+
+Counters live in memory and are bumped as events happen (registrations,
+bookings, cancellations, completed visits), so reading today's statistics is
+a dict lookup. Dirty days are flushed to the hospital_statistics table
+periodically and every loaded day is reconciled against a full recount on a
+slower schedule to correct any drift (restarts, multiple workers, edits made
+directly in Supabase).
+"""
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+from database import get_supabase_admin
+from database.queries import daily_counters
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("STATISTICS_FLUSH_SECONDS", "30"))
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("STATISTICS_RECONCILE_SECONDS", "900"))
+RETENTION_DAYS = int(os.getenv("STATISTICS_RETENTION_DAYS", "31"))
+
+COUNTER_FIELDS = (
+    "total_patients_today",
+    "total_appointments_today",
+    "emergency_cases",
+    "completed_visits",
+    "available_doctors",
+)
+
+
+def _as_day(value: Any) -> date:
+    """Normalize a date, datetime or ISO string to a calendar day"""
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _appointment_counts(appointment: Optional[Dict[str, Any]]) -> Dict[Tuple[date, str], int]:
+    """What one appointment row contributes to the counters, as in database.queries.daily_counters"""
+    if not appointment or appointment.get("status") == "cancelled":
+        return {}
+    day = _as_day(appointment.get("appointment_date"))
+    counts = {(day, "total_appointments_today"): 1}
+    if appointment.get("priority") == "emergency":
+        counts[(day, "emergency_cases")] = 1
+    if appointment.get("status") == "completed":
+        counts[(day, "completed_visits")] = 1
+    return counts
+
+
+class StatisticsCounters:
+    """Per-day counters with O(1) reads, periodic flush and reconciliation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: Dict[date, Dict[str, int]] = {}
+        self._dirty: Set[date] = set()
+        # Deltas recorded while a recount for that day is in flight
+        self._pending: Dict[date, Dict[str, int]] = {}
+
+    # ---------- event hooks ----------
+
+    def increment(self, day: date, field: str, delta: int = 1):
+        with self._lock:
+            bucket = self._days.get(day)
+            if bucket is not None:
+                bucket[field] = max(0, bucket.get(field, 0) + delta)
+                self._dirty.add(day)
+            pending = self._pending.get(day)
+            if pending is not None:
+                pending[field] = pending.get(field, 0) + delta
+
+    def record_patient_registered(self, registered_at: Any = None):
+        self.increment(_as_day(registered_at), "total_patients_today")
+
+    def record_appointment_created(self, appointment: Dict[str, Any]):
+        self.record_appointment_changed(None, appointment)
+
+    def record_appointment_changed(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Move the counters by the difference between an appointment row before and after a write"""
+        deltas = _appointment_counts(after)
+        for key, count in _appointment_counts(before).items():
+            deltas[key] = deltas.get(key, 0) - count
+        for (day, field), delta in deltas.items():
+            if delta:
+                self.increment(day, field, delta)
+
+    def record_doctor_availability(self, delta: int):
+        self.increment(date.today(), "available_doctors", delta)
+
+    # ---------- reads ----------
+
+    def get(self, day: date) -> Optional[Dict[str, Any]]:
+        """Return the in-memory snapshot for a day, or None if it is not loaded"""
+        with self._lock:
+            bucket = self._days.get(day)
+            if bucket is None:
+                return None
+            return {"statistic_date": day.isoformat(), **bucket, "occupied_rooms": 0}
+
+    def get_or_load(self, supabase, day: date) -> Dict[str, Any]:
+        snapshot = self.get(day)
+        if snapshot is None:
+            self.reconcile_day(supabase, day)
+            snapshot = self.get(day)
+        return snapshot
+
+    # ---------- persistence ----------
+
+    def reconcile_day(self, supabase, day: date):
+        """Replace a day's counters with a full recount plus any in-flight deltas"""
+        with self._lock:
+            self._pending[day] = {}
+        try:
+            counters = daily_counters(supabase, day)
+        except Exception:
+            with self._lock:
+                self._pending.pop(day, None)
+            raise
+        with self._lock:
+            pending = self._pending.pop(day, {})
+            bucket = {field: int(counters.get(field, 0)) for field in COUNTER_FIELDS}
+            for field, delta in pending.items():
+                bucket[field] = max(0, bucket.get(field, 0) + delta)
+            self._days[day] = bucket
+            self._dirty.add(day)
+
+    def reconcile(self, supabase):
+        """Recount today and every retained day"""
+        with self._lock:
+            days = set(self._days) | {date.today()}
+        for day in sorted(days):
+            self.reconcile_day(supabase, day)
+        self._evict()
+
+    def flush(self, supabase):
+        """Upsert dirty days into hospital_statistics"""
+        with self._lock:
+            rows = [
+                {"statistic_date": day.isoformat(), **self._days[day], "occupied_rooms": 0}
+                for day in self._dirty if day in self._days
+            ]
+            self._dirty.clear()
+        if not rows:
+            return
+        try:
+            supabase.table("hospital_statistics").upsert(rows, on_conflict="statistic_date").execute()
+        except Exception:
+            # Keep the days dirty so the next flush retries them
+            with self._lock:
+                self._dirty.update(date.fromisoformat(row["statistic_date"]) for row in rows)
+            raise
+
+    def _evict(self):
+        cutoff = date.today() - timedelta(days=RETENTION_DAYS)
+        with self._lock:
+            for day in [d for d in self._days if d < cutoff and d not in self._dirty]:
+                del self._days[day]
+
+
+# Process-wide counters
+statistics_counters = StatisticsCounters()
+
+
+def flush_statistics():
+    supabase = get_supabase_admin()
+    if supabase:
+        statistics_counters.flush(supabase)
+
+
+def reconcile_statistics():
+    supabase = get_supabase_admin()
+    if supabase:
+        statistics_counters.reconcile(supabase)
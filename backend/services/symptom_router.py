@@ -0,0 +1,172 @@
+"""
+Symptom to department routing for patient intake.
+
+The symptom_department_mapping table is loaded into an Aho-Corasick
+automaton, so matching a patient's description against every configured
+symptom is a single pass over the text regardless of how many symptoms
+are configured, with no database access on the request path. Matches must
+fall on word boundaries ("cut" does not match "acute"). When several
+symptoms match, the one with the most severe priority wins, then the
+longest, then the earliest in the text.
+
+The automaton is loaded at startup and rebuilt periodically (or on
+demand); a rebuild swaps in a new matcher atomically, so lookups never see
+a half-built one.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database import get_supabase_admin
+from database.queries import fetch_all
+from services import metrics
+
+RELOAD_INTERVAL_SECONDS = float(os.getenv("SYMPTOM_MAPPING_RELOAD_SECONDS", "300"))
+
+PRIORITY_RANK = {"normal": 0, "urgent": 1, "emergency": 2}
+
+
+def most_severe(*priorities: Optional[str]) -> str:
+    """The most severe of the given priorities (unknown values count as normal)"""
+    return max((p if p in PRIORITY_RANK else "normal" for p in priorities), key=PRIORITY_RANK.get, default="normal")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+
+class SymptomMatcher:
+    """Aho-Corasick automaton over normalized symptom phrases"""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        # Trie: per state a dict of transitions, a failure link and the patterns ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.mappings: List[Dict[str, Any]] = []
+
+        for row in rows:
+            symptom = _normalize(row.get("symptom") or "")
+            if not symptom or not row.get("department_id"):
+                continue
+            priority = (row.get("priority") or "normal").lower()
+            self.mappings.append({
+                "symptom": symptom,
+                "department_id": row["department_id"],
+                "priority": priority if priority in PRIORITY_RANK else "normal",
+            })
+            self._add(symptom, len(self.mappings) - 1)
+        self._link()
+
+    def _add(self, pattern: str, index: int):
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = following
+        self._out[state].append(index)
+
+    def _link(self):
+        """Breadth-first failure links; each state also inherits its failure state's outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(char, 0)
+                self._fail[following] = link if link != following else 0
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """(start offset, mapping index) of every whole-word symptom in the text"""
+        text = _normalize(text)
+        found, state = [], 0
+        goto, fail, out, mappings = self._goto, self._fail, self._out, self.mappings
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                start = position - len(mappings[index]["symptom"]) + 1
+                end = position + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and (end == len(text) or not _is_word_char(text[end])):
+                    found.append((start, index))
+        return found
+
+    def resolve(self, text: str) -> Optional[Dict[str, Any]]:
+        """Best mapping for the text: most severe priority, then longest symptom, then earliest"""
+        best, best_key = None, None
+        for start, index in self.find(text):
+            mapping = self.mappings[index]
+            key = (-PRIORITY_RANK[mapping["priority"]], -len(mapping["symptom"]), start)
+            if best_key is None or key < best_key:
+                best, best_key = mapping, key
+        return best
+
+
+class SymptomRouter:
+    """Holds the current matcher and swaps it on reload"""
+
+    def __init__(self):
+        self._reload_lock = threading.Lock()
+        self.matcher = SymptomMatcher([])
+        self.loaded_at: Optional[float] = None
+        self.lookups = 0
+        self.matches = 0
+
+    def resolve(self, text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        self.lookups += 1
+        mapping = self.matcher.resolve(text)
+        if mapping:
+            self.matches += 1
+        return mapping
+
+    def load(self, supabase):
+        with self._reload_lock:
+            # Paged, so a mapping table larger than PostgREST's max-rows is loaded in full
+            rows = fetch_all(supabase, "symptom_department_mapping", "id,symptom,department_id,priority")
+            matcher = SymptomMatcher(rows)
+            self.matcher = matcher
+            self.loaded_at = time.time()
+        print(f"[INFO] Symptom routing loaded: {len(matcher.mappings)} symptoms, {matcher.states} states")
+
+    def stats(self) -> Dict[str, Any]:
+        matcher = self.matcher
+        return {
+            "symptoms": len(matcher.mappings),
+            "states": matcher.states,
+            "loaded_at": self.loaded_at,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+
+# Process-wide router
+symptom_router = SymptomRouter()
+metrics.register("symptom_routing", symptom_router.stats)
+
+
+def reload_symptom_mappings():
+    supabase = get_supabase_admin()
+    if supabase:
+        symptom_router.load(supabase)
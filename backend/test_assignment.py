@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Tests for least-loaded doctor assignment"""
+
+import sys
+sys.path.append('.')
+
+from datetime import date, datetime, timedelta
+
+import services.assignment as assignment
+from services.assignment import AssignmentEngine
+from services.availability import AvailabilityIndex
+
+DEPARTMENTS = [
+    {"id": "gen", "name": "General Medicine"},
+    {"id": "fam", "name": "Family Practice"},
+    {"id": "er", "name": "Emergency"},
+]
+
+
+def doctor(id, department_id, **overrides):
+    return {"id": id, "name": f"Dr {id}", "department_id": department_id, "is_on_leave": False, **overrides}
+
+
+def test_falls_back_to_the_ward_when_the_mapped_department_has_no_doctor():
+    engine = AssignmentEngine()
+    engine.build([doctor("a", "gen", is_on_leave=True), doctor("b", "fam")], DEPARTMENTS, [])
+
+    assignment = engine.assign("general", "gen")
+    assert assignment["doctor_id"] == "b" and assignment["department_id"] == "fam"
+    # No doctor anywhere in the ward
+    assert engine.assign("emergency", "er") is None
+    assert engine.stats()["unassigned"] == 1
+
+
+class NextFree:
+    """Stands in for the availability index: each doctor's next free slot"""
+
+    def __init__(self, slots):
+        self.slots = slots
+
+    def next_free(self, doctor_id, now):
+        return self.slots.get(doctor_id)
+
+
+def engine_with(monkeypatch, doctors, appointments=(), slots=None):
+    monkeypatch.setattr(assignment, "availability_index", NextFree(slots or {}))
+    engine = AssignmentEngine()
+    engine.build(doctors, DEPARTMENTS, appointments)
+    return engine
+
+
+def booked(doctor_id, count):
+    return [{"doctor_id": doctor_id, "status": "scheduled"}] * count
+
+
+def test_shortest_queue_wins_and_ties_go_to_the_earliest_free_slot(monkeypatch):
+    slots = {"a": datetime(2030, 1, 1, 11), "b": datetime(2030, 1, 1, 9)}
+    engine = engine_with(monkeypatch, [doctor("a", "gen"), doctor("b", "gen"), doctor("c", "gen")],
+                         booked("a", 1) + booked("b", 1) + booked("c", 2), slots)
+
+    picks = [engine.assign("general", "gen")["doctor_id"] for _ in range(4)]
+    # b and a tie on queue length, b is free sooner; a doctor without free slots comes last on a tie
+    assert picks == ["b", "a", "b", "a"]
+    assert engine.assign("general", "gen")["doctor_id"] == "c"
+    assert engine.assign("general", "gen")["next_free_slot"] == "2030-01-01T09:00:00"
+
+
+def test_stale_heap_entries_are_skipped(monkeypatch):
+    engine = engine_with(monkeypatch, [doctor("a", "gen"), doctor("b", "gen")], booked("b", 2))
+    assert engine.assign("general", "gen")["doctor_id"] == "a"
+    # Updates re-key a doctor; their older entries stay in the heap until they reach the top
+    today = date.today().isoformat()
+    for _ in range(3):
+        engine.record_appointment({"doctor_id": "a", "appointment_date": today})
+    assert engine.stats()["heap_entries"] == 6
+    # a's two oldest entries (queues 0 and 1) are stale and popped on the way to b
+    assert engine.assign("general", "gen")["doctor_id"] == "b"
+    assert engine.stats()["heap_entries"] == 5
+    engine.record_seen("a")
+    engine.record_finished({"doctor_id": "a", "appointment_date": today})
+    assert engine.assign("general", "gen")["doctor_id"] == "a"
+
+
+def test_queues_start_from_zero_on_a_new_day(monkeypatch):
+    engine = engine_with(monkeypatch, [doctor("a", "gen"), doctor("b", "gen")], booked("a", 3))
+    for _ in range(2):
+        engine.assign("general", "gen")
+    # As if the engine had been built yesterday
+    engine.day -= 1
+    assert engine.assign("general", "gen")["queue_position"] == 1
+    assert engine.day == date.today().toordinal()
+    # Yesterday's appointments and walk-ins no longer count
+    assert sorted(engine.record_seen(id) for id in ("a", "b")) == [0, 0]
+
+
+def test_doctors_on_leave_today_are_not_assigned(monkeypatch):
+    today = date.today()
+    engine = engine_with(monkeypatch, [
+        doctor("away", "gen", is_on_leave=True, leave_start_date=(today - timedelta(days=1)).isoformat(),
+               leave_end_date=(today + timedelta(days=1)).isoformat()),
+        doctor("later", "gen", is_on_leave=True, leave_start_date=(today + timedelta(days=7)).isoformat()),
+        doctor("busy", "gen"),
+    ], booked("busy", 5) + booked("later", 2))
+
+    assert engine.assign("general", "gen")["doctor_id"] == "later"
+    engine.update_doctor(doctor("later", "gen", is_on_leave=True))
+    assert engine.assign("general", "gen")["doctor_id"] == "busy"
+    engine.update_doctor(doctor("away", "gen"))
+    assert engine.assign("general", "gen")["doctor_id"] == "away"
+
+
+def test_doctors_are_rekeyed_when_availability_is_rebuilt(monkeypatch):
+    index = AvailabilityIndex()
+    engine = engine_with(monkeypatch, [doctor("a", "gen"), doctor("b", "gen")])
+    index.on_rebuilt(engine.refresh_next_free)
+    assert engine.stats()["doctors"] == 2
+
+    # The index now knows b is free first; the swap re-keys both doctors
+    assignment.availability_index.slots = {"a": datetime(2030, 1, 1, 11), "b": datetime(2030, 1, 1, 9)}
+    index.build([], [], [], date.today(), 1)
+    assert engine.assign("general", "gen")["doctor_id"] == "b"
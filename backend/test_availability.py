@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Tests for the in-memory availability index"""
+
+import sys
+sys.path.append('.')
+
+from datetime import date, datetime
+
+import services.availability as availability
+from services.availability import AvailabilityIndex
+
+DAY = date(2024, 1, 1)
+DOCTORS = [
+    {"id": "a", "department_id": "cardio"},
+    {"id": "b", "department_id": "cardio"},
+    {"id": "c", "department_id": "cardio", "is_on_leave": True, "leave_start_date": "2024-01-01", "leave_end_date": "2024-01-01"},
+]
+
+
+def slot(id, doctor_id, start, end, capacity=1, booked=0, day="2024-01-01"):
+    return {"id": id, "doctor_id": doctor_id, "slot_date": day, "start_time": start, "end_time": end,
+            "capacity": capacity, "booked": booked}
+
+
+SLOTS = [
+    slot("a9", "a", "09:00:00", "09:30:00"),
+    slot("b9", "b", "09:00:00", "09:30:00", booked=1),
+    slot("b10", "b", "10:00:00", "10:30:00", capacity=2),
+    slot("c8", "c", "08:00:00", "08:30:00"),
+    slot("a-next", "a", "08:00:00", "08:30:00", day="2024-01-02"),
+]
+
+
+def build(appointments=()):
+    index = AvailabilityIndex()
+    index.build(DOCTORS, SLOTS, appointments, DAY, 7)
+    return index
+
+
+def ids(results):
+    return [result["slot_id"] for result in results]
+
+
+def test_earliest_orders_by_time_and_skips_full_and_on_leave():
+    index = build()
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1, 0, 0), 10)) == ["a9", "b10", "a-next"]
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1, 9, 30), 1)) == ["b10"]
+    assert index.earliest("cardio", datetime(2024, 1, 1), 10)[1]["remaining"] == 2
+    assert index.earliest("unknown", datetime(2024, 1, 1)) == []
+
+
+def test_appointments_and_bookings_fill_slots():
+    index = build([{"doctor_id": "a", "appointment_date": "2024-01-01T09:10:00"}])
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1), 10)) == ["b10", "a-next"]
+
+    index.record_booking("b", "2024-01-01T10:00:00")
+    assert index.earliest("cardio", datetime(2024, 1, 1), 1)[0]["remaining"] == 1
+    index.record_booking("b", datetime(2024, 1, 1, 10, 15))
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1), 10)) == ["a-next"]
+
+    index.record_release("a", "2024-01-01T09:00:00")
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1), 10)) == ["a9", "a-next"]
+    assert index.next_free("b", datetime(2024, 1, 1)) is None
+
+
+def test_updates_during_a_rebuild_survive_the_swap(monkeypatch):
+    index = build()
+
+    def fetch_all(supabase, table, columns, where=None):
+        if table == "doctor_slots":
+            # A booking lands while the rebuild is still reading
+            index.record_booking("a", "2024-01-01T09:00:00")
+            return SLOTS
+        return []
+
+    class Doctors:
+        def table(self, name):
+            return self
+
+        def select(self, columns):
+            return self
+
+        def execute(self):
+            return type("Result", (), {"data": DOCTORS})()
+
+    monkeypatch.setattr(availability, "fetch_all", fetch_all)
+    index.load(Doctors(), DAY, 7)
+    assert ids(index.earliest("cardio", datetime(2024, 1, 1), 10)) == ["b10", "a-next"]
+    assert index._pending is None
+
+
+def test_replayed_bookings_already_in_the_scan_are_not_counted_twice(monkeypatch):
+    index = build()
+    booked = {"id": "apt1", "doctor_id": "b", "appointment_date": "2024-01-01T10:00:00"}
+    cancelled = {"id": "apt0", "doctor_id": "a", "appointment_date": "2024-01-01T09:00:00"}
+    index.record_booking("a", cancelled["appointment_date"], "apt0")
+
+    def fetch_all(supabase, table, columns, where=None):
+        if table == "appointments":
+            # Both changes land while the rebuild reads, and the rows read already reflect them
+            index.record_booking("b", booked["appointment_date"], "apt1")
+            index.record_release("a", cancelled["appointment_date"], "apt0")
+            # Booked and cancelled within the rebuild: neither is in the rows read
+            index.record_booking("a", "2024-01-02T08:00:00", "apt2")
+            index.record_release("a", "2024-01-02T08:00:00", "apt2")
+            return [booked]
+        return SLOTS if table == "doctor_slots" else []
+
+    class Doctors:
+        def table(self, name):
+            return self
+
+        def select(self, columns):
+            return self
+
+        def execute(self):
+            return type("Result", (), {"data": DOCTORS})()
+
+    monkeypatch.setattr(availability, "fetch_all", fetch_all)
+    index.load(Doctors(), DAY, 7)
+    results = index.earliest("cardio", datetime(2024, 1, 1), 10)
+    assert ids(results) == ["a9", "b10", "a-next"]
+    assert results[1]["remaining"] == 1
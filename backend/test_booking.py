@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Tests for slot reservations when booking and rescheduling appointments"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import routers.appointments as appointments
+import services.statistics as statistics
+from models.hospital import AppointmentCreate, AppointmentStatus, AppointmentUpdate
+from services.booking import local_wall_clock
+from services.statistics import StatisticsCounters
+
+
+def reserve_slot(db, params):
+    slots = db.tables["doctor_slots"]
+    at = datetime.fromisoformat(params["p_at"])
+    contains = lambda s: s["slot_date"] == at.date().isoformat() and s["start_time"] <= at.strftime("%H:%M:%S") < s["end_time"]
+    mine = [s for s in slots if s["doctor_id"] == params["p_doctor_id"]]
+    if params["p_slot_id"]:
+        slot = next((s for s in mine if s["id"] == params["p_slot_id"]), None)
+        if slot is not None and not contains(slot):
+            return {"status": "time_mismatch", "slot_id": slot["id"]}
+    else:
+        slot = next((s for s in mine if contains(s)), None)
+    if slot is None:
+        return {"status": "no_slot"}
+    if slot["booked"] >= slot["capacity"]:
+        return {"status": "full", "slot_id": slot["id"]}
+    slot["booked"] += 1
+    return {"status": "reserved", "slot": dict(slot)}
+
+
+def release_slot(db, params):
+    slot = next(s for s in db.tables["doctor_slots"] if s["id"] == params["p_slot_id"])
+    slot["booked"] = max(slot["booked"] - 1, 0)
+    return [dict(slot)]
+
+
+def slot(id, start, end, capacity):
+    return {"id": id, "doctor_id": "d1", "slot_date": "2030-01-07", "start_time": start, "end_time": end,
+            "capacity": capacity, "booked": 0, "is_available": True}
+
+
+def book(when):
+    return asyncio.run(appointments.create_appointment(AppointmentCreate(
+        patient_id="p1", doctor_id="d1", department_id="gen", appointment_date=datetime.fromisoformat(when)
+    )))
+
+
+@pytest.fixture
+def supabase(monkeypatch, fake_supabase):
+    # The slot RPCs update booked under the client's lock, like the row lock
+    db = fake_supabase(
+        tables={"doctor_slots": [slot("s9", "09:00:00", "09:30:00", 3), slot("s10", "10:00:00", "10:30:00", 1)], "appointments": []},
+        rpcs={"reserve_doctor_slot": reserve_slot, "release_doctor_slot": release_slot},
+    )
+    monkeypatch.setattr(appointments, "get_supabase_admin", lambda: db)
+    return db
+
+
+def test_concurrent_bookings_never_overbook(supabase):
+    def attempt(_):
+        try:
+            book("2030-01-07T09:00:00")
+            return 200
+        except HTTPException as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = list(pool.map(attempt, range(20)))
+    assert outcomes.count(200) == 3 and outcomes.count(409) == 17
+    assert supabase.tables["doctor_slots"][0]["booked"] == 3
+
+
+def test_reschedule_within_a_full_slot_keeps_its_place(supabase):
+    booked = [book("2030-01-07T09:00:00") for _ in range(3)]
+    moved = asyncio.run(appointments.update_appointment(
+        booked[0]["id"], AppointmentUpdate(appointment_date=datetime.fromisoformat("2030-01-07T09:15:00"))
+    ))
+    assert moved["slot_id"] == "s9"
+    assert supabase.tables["doctor_slots"][0]["booked"] == 3
+
+
+def test_reschedule_to_another_slot_moves_the_place(supabase):
+    first = book("2030-01-07T09:00:00")
+    moved = asyncio.run(appointments.update_appointment(
+        first["id"], AppointmentUpdate(appointment_date=datetime.fromisoformat("2030-01-07T10:00:00"))
+    ))
+    assert moved["slot_id"] == "s10"
+    assert [s["booked"] for s in supabase.tables["doctor_slots"]] == [0, 1]
+
+    # The target slot is now full, so a second move there is refused and nothing changes
+    second = book("2030-01-07T09:00:00")
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(appointments.update_appointment(
+            second["id"], AppointmentUpdate(appointment_date=datetime.fromisoformat("2030-01-07T10:10:00"))
+        ))
+    assert refused.value.status_code == 409
+    assert [s["booked"] for s in supabase.tables["doctor_slots"]] == [1, 1]
+
+
+class Queues:
+    def __init__(self):
+        self.calls = []
+
+    def record_appointment(self, appointment):
+        self.calls.append(("booked", appointment["appointment_date"][:10]))
+
+    def record_finished(self, appointment):
+        self.calls.append(("finished", appointment["appointment_date"][:10]))
+
+
+def test_counters_follow_the_actual_transition(supabase, monkeypatch):
+    monkeypatch.setattr(statistics, "daily_counters", lambda supabase, day: {})
+    counters, queues = StatisticsCounters(), Queues()
+    monkeypatch.setattr(appointments, "statistics_counters", counters)
+    monkeypatch.setattr(appointments, "assignment_engine", queues)
+    monday, tuesday = date(2030, 1, 7), date(2030, 1, 8)
+    for day in (monday, tuesday):
+        counters.get_or_load(None, day)
+
+    booked = book("2030-01-07T09:00:00")
+    for _ in range(2):
+        asyncio.run(appointments.update_appointment(booked["id"], AppointmentUpdate(status=AppointmentStatus.COMPLETED)))
+    assert counters.get(monday)["completed_visits"] == 1
+    assert queues.calls == [("booked", "2030-01-07"), ("finished", "2030-01-07")]
+
+    asyncio.run(appointments.cancel_appointment(booked["id"]))
+    asyncio.run(appointments.cancel_appointment(booked["id"]))
+    assert counters.get(monday)["completed_visits"] == 0
+    assert counters.get(monday)["total_appointments_today"] == 0
+    assert supabase.tables["doctor_slots"][0]["booked"] == 0
+
+    # A reschedule moves the appointment between days
+    second = book("2030-01-07T09:00:00")
+    asyncio.run(appointments.update_appointment(
+        second["id"], AppointmentUpdate(appointment_date=datetime.fromisoformat("2030-01-08T09:00:00"))
+    ))
+    assert counters.get(monday)["total_appointments_today"] == 0
+    assert counters.get(tuesday)["total_appointments_today"] == 1
+    assert queues.calls[-2:] == [("finished", "2030-01-07"), ("booked", "2030-01-08")]
+
+
+def test_explicit_slot_must_contain_the_appointment_time(supabase):
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(appointments.create_appointment(AppointmentCreate(
+            patient_id="p1", doctor_id="d1", department_id="gen", slot_id="s9",
+            appointment_date=datetime.fromisoformat("2030-01-07T15:00:00")
+        )))
+    assert refused.value.status_code == 400
+    assert supabase.tables["doctor_slots"][0]["booked"] == 0
+
+
+def test_aware_times_are_converted_to_server_local_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        assert local_wall_clock(datetime(2030, 1, 7, 3, 30, tzinfo=timezone.utc)) == datetime(2030, 1, 7, 9, 0)
+        assert local_wall_clock(datetime(2030, 1, 7, 9, 0)) == datetime(2030, 1, 7, 9, 0)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
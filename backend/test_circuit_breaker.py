@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Tests for the LLM circuit breaker state machine"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def make_breaker():
+    return CircuitBreaker("test", window_seconds=60, min_calls=4, failure_rate=0.5, open_seconds=0.05)
+
+
+def test_opens_on_failure_rate_and_refuses_calls():
+    breaker = make_breaker()
+    for succeeded in (True, False, True):
+        assert breaker.allow()
+        breaker.record_success() if succeeded else breaker.record_failure()
+    # Three calls are below min_calls, so one more failure (2 of 4) is what opens it
+    assert breaker.state == CLOSED
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.allow()
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
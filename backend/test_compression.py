@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for the gzip / brotli compression middleware"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import zlib
+
+import middleware.compression as compression
+from middleware.compression import CompressionMiddleware, negotiate
+
+BODY = b'{"rows":[' + b",".join(b'{"id":%d,"name":"patient"}' % i for i in range(200)) + b"]}"
+
+
+def app_sending(*chunks, status=200, headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *headers]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def call(app, accept_encoding="gzip"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, None, send))
+    return dict(sent[0]["headers"]), [m["body"] for m in sent[1:]]
+
+
+def test_negotiation_follows_q_values():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0, deflate") is None
+    assert negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+    if "br" in compression.ENCODERS:
+        assert negotiate("gzip, br") == "br"
+
+
+def test_whole_body_is_compressed_with_a_weak_etag():
+    headers, bodies = call(app_sending(BODY, headers=[(b"etag", b'"abc"')]))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"etag"] == b'W/"abc"'
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(bodies[0])
+    assert zlib.decompress(bodies[0], 31) == BODY
+
+
+def test_small_and_not_modified_bodies_pass_through():
+    headers, bodies = call(app_sending(b"{}", headers=[(b"etag", b'"abc"')]))
+    assert b"content-encoding" not in headers and headers[b"etag"] == b'"abc"'
+    assert bodies == [b"{}"]
+    headers, _ = call(app_sending(b"", status=304, headers=[(b"etag", b'"abc"')]))
+    assert b"content-encoding" not in headers
+
+
+def test_streamed_chunks_are_flushed_as_they_arrive():
+    chunks = [BODY[:500], BODY[500:1500], BODY[1500:]]
+    headers, bodies = call(app_sending(*chunks))
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert len(bodies) == 3
+    # Each chunk decodes on its own, without waiting for the end of the stream
+    decoder = zlib.decompressobj(31)
+    for chunk, body in zip(chunks, bodies):
+        assert decoder.decompress(body) == chunk
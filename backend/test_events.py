@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for the server-sent event broadcaster"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import json
+
+from services.events import EventBroadcaster
+
+
+def drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait()["id"])
+    return events
+
+
+def test_events_fan_out_to_every_subscriber():
+    async def scenario():
+        broadcaster = EventBroadcaster()
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        broadcaster.publish("emergency_intake", {"n": 1})
+        broadcaster.unsubscribe(second)
+        broadcaster.publish("emergency_intake", {"n": 2})
+        await asyncio.sleep(0)
+        return drain(first), drain(second)
+
+    # Delivery is scheduled on the subscriber's loop; the second still gets what was published before it left
+    assert asyncio.run(scenario()) == ([1, 2], [1])
+
+
+def test_slow_subscriber_loses_only_its_oldest_events():
+    async def scenario():
+        broadcaster = EventBroadcaster(buffer_size=2)
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+        received = []
+        for n in range(3):
+            broadcaster.publish("emergency_intake", {"n": n})
+            await asyncio.sleep(0)
+            received += drain(fast)
+        return broadcaster, drain(slow), received
+
+    broadcaster, slow, fast = asyncio.run(scenario())
+    assert slow == [2, 3] and fast == [1, 2, 3]
+    assert broadcaster.stats()["dropped"] == 1
+
+
+def test_reconnect_catches_up_without_duplicates():
+    async def scenario():
+        broadcaster = EventBroadcaster()
+        for n in range(3):
+            broadcaster.publish("emergency_intake", {"n": n})
+        stream = broadcaster.stream(last_event_id="1")
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        # Published after subscribing but before the history is read: both in history and in the queue
+        broadcaster.publish("emergency_intake", {"n": 3})
+        received = [await stream.__anext__() for _ in range(3)]
+        broadcaster.publish("emergency_intake", {"n": 4})
+        received.append(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return broadcaster, received
+
+    broadcaster, received = asyncio.run(scenario())
+    ids = [int(message.split("\n")[0][len("id: "):]) for message in received]
+    assert ids == [2, 3, 4, 5]
+    assert json.loads(received[0].split("data: ")[1]) == {"n": 1}
+    assert broadcaster.since("4") == [broadcaster._history[-1]] and broadcaster.since(None) == []
+    assert broadcaster.stats()["subscribers"] == 0
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for the incrementally maintained feedback aggregates"""
+
+import sys
+sys.path.append('.')
+
+import pytest
+
+from services.feedback_stats import FeedbackAggregates
+
+
+def test_summary_arithmetic():
+    aggregates = FeedbackAggregates()
+    for rating, doctor_id in ((5, "d1"), (4, "d1"), (4, None), (1, "d2"), (0, "d1"), (6, "d1")):
+        aggregates.record(rating, doctor_id)
+
+    summary = aggregates.summary()
+    assert summary["total_feedbacks"] == 4
+    assert summary["average_rating"] == 3.5
+    assert summary["rating_distribution"] == {"5_stars": 1, "4_stars": 2, "3_stars": 0, "2_stars": 0, "1_stars": 1}
+    assert aggregates.doctor_summary("d1")["average_rating"] == 4.5
+    assert aggregates.doctor_summary("unknown") == {
+        "total_feedbacks": 0, "average_rating": 0,
+        "rating_distribution": {f"{stars}_stars": 0 for stars in range(5, 0, -1)},
+    }
+
+
+def test_rebuild_keeps_ratings_recorded_while_it_runs():
+    aggregates = FeedbackAggregates()
+    aggregates.record(1, "d1")
+
+    def rows():
+        yield {"doctor_id": "d1", "rating": 3}
+        aggregates.record(5, "d2")  # submitted after this page was read
+        yield {"doctor_id": None, "rating": None}
+
+    aggregates.rebuild(rows())
+    assert aggregates.loaded
+    assert aggregates.summary()["total_feedbacks"] == 2
+    assert aggregates.doctor_summary("d2")["total_feedbacks"] == 1
+
+
+def test_rebuild_does_not_count_a_scanned_rating_twice():
+    aggregates = FeedbackAggregates()
+
+    def rows():
+        aggregates.record(5, "d1", "f2")  # submitted before its page was read
+        yield {"id": "f1", "doctor_id": "d1", "rating": 3}
+        yield {"id": "f2", "doctor_id": "d1", "rating": 5}
+        aggregates.record(4, "d1", "f3")  # submitted after the last page
+
+    aggregates.rebuild(rows())
+    assert aggregates.doctor_summary("d1")["total_feedbacks"] == 3
+    assert aggregates.summary()["average_rating"] == 4
+
+
+def test_failed_rebuild_keeps_current_aggregates():
+    aggregates = FeedbackAggregates()
+    aggregates.record(4, "d1")
+
+    def rows():
+        yield {"doctor_id": "d1", "rating": 2}
+        raise RuntimeError("connection reset")
+
+    with pytest.raises(RuntimeError):
+        aggregates.rebuild(rows())
+    assert not aggregates.loaded
+    assert aggregates.summary()["average_rating"] == 4
+    aggregates.record(2, "d1")
+    assert aggregates.summary()["total_feedbacks"] == 2
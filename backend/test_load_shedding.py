@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Tests for load-aware LLM shedding"""
+
+import sys
+sys.path.append('.')
+
+import pytest
+
+import services.load_shedding as load_shedding
+from services.load_shedding import DEGRADED, NORMAL, LoadShedder
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(load_shedding.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_shedder():
+    return LoadShedder(latency_threshold=5, in_flight_threshold=2, loop_lag_threshold=0.25,
+                       recover_fraction=0.5, recover_seconds=30, probe_interval=10)
+
+
+def degrade(shedder):
+    """Push latency over the threshold; the first call after switching is let through as a probe"""
+    shedder.llm_latency = 6
+    assert shedder.allow_llm() and shedder.mode == DEGRADED
+
+
+def test_degrades_on_each_signal(clock):
+    shedder = make_shedder()
+    assert shedder.allow_llm() and shedder.mode == NORMAL
+
+    degrade(shedder)
+    assert not shedder.allow_llm()
+    assert shedder.reasons == ["llm_latency"]
+
+    shedder = make_shedder()
+    with shedder.llm_call(), shedder.llm_call():
+        # Calls in flight also hold back the probe
+        assert not shedder.allow_llm()
+        assert shedder.reasons == ["llm_in_flight"]
+
+    shedder = make_shedder()
+    for _ in range(10):
+        shedder.record_loop_lag(1.0)
+    assert shedder.mode == DEGRADED and shedder.reasons == ["loop_lag"]
+
+
+def test_recovers_only_after_staying_calm(clock):
+    shedder = make_shedder()
+    degrade(shedder)
+    clock[0] += 5  # stay within the probe interval so every call is shed
+
+    # Below the threshold but above the recovery fraction: still degraded
+    shedder.llm_latency = 3
+    assert not shedder.allow_llm()
+    shedder.llm_latency = 2
+    shedder.allow_llm()
+    clock[0] += 4
+    shedder.llm_latency = 2.6
+    shedder.allow_llm()  # a spike resets the calm period
+    shedder.llm_latency = 2
+    shedder.allow_llm()
+    clock[0] += 29
+    shedder._evaluate(clock[0])
+    assert shedder.mode == DEGRADED
+    clock[0] += 1
+    assert shedder.allow_llm() and shedder.mode == NORMAL
+    assert shedder.transitions == 2
+
+
+def test_probes_while_degraded(clock):
+    shedder = make_shedder()
+    degrade(shedder)
+    assert not shedder.allow_llm()
+    clock[0] += 10
+    assert shedder.allow_llm()
+    with shedder.llm_call():
+        # No second probe while one is in flight
+        clock[0] += 10
+        assert not shedder.allow_llm()
+    # Once it returns the next call probes, and the one after waits for the interval
+    assert shedder.allow_llm()
+    assert not shedder.allow_llm()
+    assert shedder.probes == 3 and shedder.shed == 3
+
+
+def test_probe_refused_by_the_gate_is_not_counted(clock):
+    shedder = make_shedder()
+    degrade(shedder)
+    clock[0] += 10
+    asked = []
+    assert not shedder.allow_llm(lambda: asked.append(1) or False)
+    assert shedder.probes == 1 and asked == [1]
+    # The probe slot is still free for the next call the gate lets through
+    assert shedder.allow_llm(lambda: True) and shedder.probes == 2
+    # The gate is not asked for calls the shedder refuses anyway
+    assert not shedder.allow_llm(lambda: asked.append(2) or True)
+    assert asked == [1]
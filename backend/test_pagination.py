@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Tests for keyset pagination, walked against an in-memory PostgREST stand-in"""
+
+import sys
+sys.path.append('.')
+
+import re
+
+import httpx
+import pytest
+
+from database.pagination import InvalidCursor, keyset_page
+
+ROWS = [
+    {"id": "a", "created": "2026-01-03"},
+    {"id": "b", "created": None},
+    {"id": "c", "created": "2026-01-01"},
+    {"id": "d", "created": "2026-01-03"},
+    {"id": "e", "created": None},
+    {"id": "f", "created": "2026-01-02"},
+]
+
+
+def _split(tree):
+    """Split a logic tree's top-level comma-separated terms"""
+    terms, depth, start = [], 0, 0
+    for i, char in enumerate(tree):
+        depth += char == "("
+        depth -= char == ")"
+        if char == "," and depth == 0:
+            terms.append(tree[start:i])
+            start = i + 1
+    terms.append(tree[start:])
+    return terms
+
+
+def _matches(term, row):
+    if term.startswith("and("):
+        return all(_matches(part, row) for part in _split(term[4:-1]))
+    column, rest = term.split(".", 1)
+    value = row[column]
+    if rest == "is.null":
+        return value is None
+    if rest == "not.is.null":
+        return value is not None
+    op, operand = re.match(r'(\w+)\."(.*)"$', rest).groups()
+    if value is None:
+        return False
+    return {"lt": value < operand, "gt": value > operand, "eq": value == operand}[op]
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = httpx.QueryParams()
+
+    def order(self, column, desc=False):
+        # "created.desc,id" with desc=True means created DESC, id DESC; NULLs first when descending
+        self.desc = desc
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        rows = self.rows
+        tree = self.params.get("or")
+        if tree:
+            rows = [row for row in rows if any(_matches(term, row) for term in _split(tree[1:-1]))]
+        present = sorted((r for r in rows if r["created"] is not None), key=lambda r: (r["created"], r["id"]), reverse=self.desc)
+        nulls = sorted((r for r in rows if r["created"] is None), key=lambda r: r["id"], reverse=self.desc)
+        ordered = nulls + present if self.desc else present + nulls
+
+        class Result:
+            data = ordered[:self.count]
+        return Result()
+
+
+def walk(desc):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(FakeQuery(ROWS), "created", cursor, limit=2, desc=desc)
+        ids.extend(row["id"] for row in rows)
+        if not cursor:
+            return ids
+
+
+def test_pages_through_null_sort_values():
+    assert walk(desc=True) == ["e", "b", "d", "a", "f", "c"]
+    assert walk(desc=False) == ["c", "f", "a", "d", "b", "e"]
+
+
+def test_rejects_foreign_cursor():
+    with pytest.raises(InvalidCursor):
+        keyset_page(FakeQuery(ROWS), "created", "not-a-cursor")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Tests for the patient lookup cache and the lookups that fill it"""
+
+import sys
+sys.path.append('.')
+
+import services.patient_cache as patient_cache_module
+from services.patient_cache import PatientCache, normalize_phone
+
+
+def patient(id, email=None, phone=None, patient_id=None):
+    return {"id": id, "email": email, "phone": phone, "patient_id": patient_id}
+
+
+def test_keys_are_normalized():
+    assert normalize_phone("098765 43210") == normalize_phone("+91 98765 43210") == "+919876543210"
+    assert normalize_phone("0044 20 7946 0000") == "+442079460000"
+    cache = PatientCache()
+    cache.put("email", "Jane@Example.com ", [patient("1", "jane@example.com")], cache.generation())
+    assert cache.get("email", "jane@example.com")[0]["id"] == "1"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PatientCache(max_entries=2)
+    for n in "ab":
+        cache.put("patient_id", n, [patient(n, patient_id=n)], cache.generation())
+    cache.get("patient_id", "a")
+    cache.put("patient_id", "c", [patient("c", patient_id="c")], cache.generation())
+    assert cache.get("patient_id", "b") is None
+    assert cache.get("patient_id", "a") and cache.get("patient_id", "c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(patient_cache_module.time, "monotonic", lambda: now[0])
+    cache = PatientCache(ttl=10)
+    cache.put("patient_id", "p1", [patient("1", patient_id="p1")], cache.generation())
+    now[0] += 9
+    assert cache.get("patient_id", "p1")
+    now[0] += 2
+    assert cache.get("patient_id", "p1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidation_drops_every_key_of_the_patient():
+    cache = PatientCache()
+    row = patient("1", "jane@example.com", "+919876543210", "p1")
+    for kind in ("email", "phone", "patient_id"):
+        cache.put(kind, row[kind], [row], cache.generation())
+    cache.invalidate({**row, "email": "new@example.com"})
+    assert all(cache.get(kind, row[kind]) is None for kind in ("email", "phone", "patient_id"))
+
+    # A new patient sharing a phone number changes that lookup's result
+    cache.put("phone", "098765 43210", [row], cache.generation())
+    cache.invalidate(patient("2", phone="+91 98765 43210"))
+    assert cache.get("phone", "+919876543210") is None
+
+
+def test_stale_read_is_not_stored_after_invalidation():
+    cache = PatientCache()
+    generation = cache.generation()
+    cache.invalidate(patient("1", "jane@example.com"))
+    cache.put("email", "jane@example.com", [patient("1", "jane@example.com")], generation)
+    assert cache.get("email", "jane@example.com") is None
+
+
+class Lookups:
+    """Records how find_patients queries Supabase; the lookup RPC is missing unless rpc_rows is set"""
+
+    def __init__(self, rpc_rows=None):
+        self.rpc_rows = rpc_rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append(("rpc", params))
+        return self
+
+    def table(self, name):
+        return self
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.calls.append(("eq", column, value))
+        return self
+
+    def ilike(self, column, value):
+        self.calls.append(("ilike", column, value))
+        return self
+
+    def execute(self):
+        if self.calls[-1][0] == "rpc" and self.rpc_rows is None:
+            raise Exception("PGRST202: Could not find the function")
+
+        class Result:
+            data = [patient("1")]
+        return Result()
+
+
+def test_lookups_query_with_the_cache_key_normalization():
+    from routers.patients import find_patients
+
+    supabase = Lookups(rpc_rows=[])
+    find_patients(supabase, "email", " JANE@x.com")
+    find_patients(supabase, "phone", "098765 43210")
+    assert [call[1]["p_email"] or call[1]["p_phone"] for call in supabase.calls] == ["jane@x.com", "+919876543210"]
+
+    # Without the migration email still matches case-insensitively; phone is matched as typed and not cached
+    supabase = Lookups()
+    assert find_patients(supabase, "email", "JANE_1@x.com")[1]
+    assert supabase.calls[-1] == ("ilike", "email", "jane\\_1@x.com")
+    assert not find_patients(supabase, "phone", " 98765 43210 ")[1]
+    assert supabase.calls[-1] == ("eq", "phone", "98765 43210")
+
+
+def test_registration_stores_emails_lower_cased():
+    from models.hospital import PatientCreate
+    from routers.patients import is_duplicate_email, patient_row
+
+    row = patient_row(PatientCreate(first_name="J", last_name="D", email=" Jane@X.com", phone="1", age=30))
+    assert row["email"] == "jane@x.com"
+    error = Exception('duplicate key value violates unique constraint "idx_patients_email_lower_unique" (23505)')
+    assert is_duplicate_email(error)
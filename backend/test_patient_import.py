@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Tests for the streamed bulk patient import"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import json
+
+import routers.patient_import as patient_import
+from routers.patient_import import ImportJob, run_import
+
+
+class Upload:
+    """A request whose body arrives in the given byte chunks"""
+
+    def __init__(self, *chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def age_check(op, table, rows):
+    """Rows with age 999 violate a check constraint"""
+    if any(row["age"] == 999 for row in rows):
+        return Exception("23514: violates check constraint patients_age_check")
+
+
+def patients_client(fake_supabase, existing=()):
+    return fake_supabase(
+        tables={"patients": [{"email": email} for email in existing]},
+        defaults={"patients": {"registration_date": "2024-01-01T09:00:00"}},
+        fail=age_check,
+    )
+
+
+def records(parser, *chunks):
+    async def collect():
+        return [item async for item in parser(Upload(*chunks))]
+    return asyncio.run(collect())
+
+
+def run(supabase, fmt, *chunks, chunk_size=500):
+    job = ImportJob("job", fmt, chunk_size)
+    asyncio.run(run_import(supabase, Upload(*chunks), job))
+    return job
+
+
+def csv_row(email, age=30):
+    return f"Jane,Doe,{email},98765,{age}\n".encode()
+
+
+HEADER = b"first_name,last_name,email,phone,age\n"
+
+
+def test_csv_is_parsed_across_chunk_boundaries():
+    body = '﻿name,note\r\n"Doe, Jane","line one\nline two"\r\nJosé,\r\n\r\nx,y,z\n'.encode()
+    # Split inside the multi-byte character and inside the quoted field
+    split = body.index("é".encode()) + 1
+    parsed = records(patient_import._iter_csv, body[:20], body[20:split], body[split:])
+    assert parsed[0] == (2, {"name": "Doe, Jane", "note": "line one\nline two"})
+    assert parsed[1] == (4, {"name": "José", "note": None})
+    assert parsed[2][0] == 6 and "Expected 2 columns" in str(parsed[2][1])
+
+    unterminated = records(patient_import._iter_csv, b'name\n"open\nstill open')
+    assert unterminated[0][0] == 2 and isinstance(unterminated[0][1], ValueError)
+
+
+def test_jsonl_reports_bad_lines_by_number():
+    parsed = records(patient_import._iter_jsonl, b'{"a": 1}\n\nnot json\n{"b"', b': 2}')
+    assert parsed[0] == (1, {"a": 1})
+    assert parsed[1][0] == 3 and isinstance(parsed[1][1], ValueError)
+    assert parsed[2] == (4, {"b": 2})
+
+
+def test_chunks_are_inserted_and_errors_attributed_to_lines(fake_supabase):
+    supabase = patients_client(fake_supabase, existing={"old@x.com"})
+    body = HEADER + csv_row("a@x.com") + csv_row("old@x.com") + csv_row("b@x.com", age=999) \
+        + csv_row("A@x.com") + csv_row("c@x.com", age="n/a") + csv_row("d@x.com")
+    job = run(supabase, "csv", body, chunk_size=2)
+
+    assert (job.rows_read, job.inserted, job.skipped_existing, job.duplicates_in_batch, job.invalid, job.failed) == (6, 2, 1, 1, 1, 1)
+    errors = {error["line"]: error["error"] for error in job.errors}
+    assert errors[3] == "Patient with this email already exists"
+    assert "check constraint" in errors[4]
+    assert errors[5] == "Duplicate email in batch (first seen on line 2)"
+    assert errors[6].startswith("age:")
+    # The failing chunk was retried row by row; the others went in whole
+    assert [len(rows) for _, _, rows in supabase.calls] == [2, 2, 1, 1]
+
+
+def test_untracked_duplicates_fall_back_to_the_unique_index(monkeypatch, fake_supabase):
+    monkeypatch.setattr(patient_import, "IMPORT_MAX_TRACKED_EMAILS", 1)
+    lines = [json.dumps({"first_name": "J", "last_name": "D", "email": email, "phone": "1", "age": 30})
+             for email in ("a@x.com", "b@x.com", "a@x.com")]
+    job = run(patients_client(fake_supabase), "jsonl", "\n".join(lines).encode())
+    assert (job.inserted, job.duplicates_in_batch, job.skipped_existing) == (2, 0, 1)
+    assert job.errors == [{"line": 3, "email": "a@x.com", "error": "Patient with this email already exists"}]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests for /api/chat admission control and per-session turn ordering"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+
+import services.rate_limit as rate_limit
+from services.rate_limit import IP_LIMITED, SATURATED, SESSION_LIMITED, ChatAdmission, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(burst=2, now=0.0)
+    assert bucket.wait_time(rate=1, burst=2, now=0.0) == 0
+    bucket.tokens = 0
+    assert bucket.wait_time(rate=0.5, burst=2, now=1.0) == 1.0  # half a token back, one more second to go
+    assert bucket.wait_time(rate=0.5, burst=2, now=2.0) == 0
+    # A long idle spell does not bank more than the burst
+    bucket.wait_time(rate=0.5, burst=2, now=100.0)
+    assert bucket.tokens == 2
+
+
+def test_session_burst_then_retry_after(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    admission = ChatAdmission(session_rate=0.5, session_burst=2, ip_rate=100, ip_burst=100, max_in_flight=10)
+    for _ in range(2):
+        assert admission.try_acquire("s1", "1.2.3.4") is None
+        admission.release()
+    assert admission.try_acquire("s1", "1.2.3.4") == (SESSION_LIMITED, 2)
+    # Other sessions from the same address are unaffected
+    assert admission.try_acquire("s2", "1.2.3.4") is None
+    admission.release()
+    clock.now += 2
+    assert admission.try_acquire("s1", "1.2.3.4") is None
+
+
+def test_ip_limit_does_not_spend_session_tokens(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    admission = ChatAdmission(session_rate=1, session_burst=5, ip_rate=1, ip_burst=1, max_in_flight=10)
+    assert admission.try_acquire("s1", "1.2.3.4") is None
+    admission.release()
+    assert admission.try_acquire("s2", "1.2.3.4") == (IP_LIMITED, 1)
+    assert admission.sessions.bucket("s2", clock.now).tokens == 5
+    assert admission.stats()["rejected"][IP_LIMITED] == 1
+
+
+def test_in_flight_cap_until_release():
+    admission = ChatAdmission(session_rate=100, session_burst=100, ip_rate=100, ip_burst=100, max_in_flight=2)
+    assert admission.try_acquire("a", "ip") is None
+    assert admission.try_acquire("b", "ip") is None
+    assert admission.try_acquire("c", "ip")[0] == SATURATED
+    admission.release()
+    assert admission.try_acquire("c", "ip") is None
+    assert admission.stats()["peak_in_flight"] == 2
+
+
+def test_session_turns_run_one_at_a_time():
+    from routers.chat import _session_locks, session_turn
+
+    async def main():
+        log = []
+
+        async def turn(session_id, name):
+            async with session_turn(session_id):
+                log.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                log.append(f"{name} end")
+
+        await asyncio.gather(turn("s1", "a"), turn("s1", "b"), turn("s2", "c"))
+        return log
+
+    log = asyncio.run(main())
+    assert log.index("a end") < log.index("b start")
+    # Another session is not held up by s1
+    assert log.index("c start") < log.index("a end")
+    assert not _session_locks
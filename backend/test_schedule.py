@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Tests for schedule template expansion and idempotent slot regeneration"""
+
+import sys
+sys.path.append('.')
+
+from datetime import date
+
+from services.schedule import expand_template, generate_slots
+
+
+def slots_client(fake_supabase, db):
+    return fake_supabase(tables=db, defaults={"doctor_slots": {"booked": 0}})
+
+
+def template(**overrides):
+    base = {"id": "t1", "doctor_id": "d1", "weekday": 0, "start_time": "09:00:00",
+            "end_time": "10:00:00", "slot_minutes": 20, "capacity": 1, "is_active": True}
+    return {**base, **overrides}
+
+
+def test_expand_template_covers_matching_weekdays_only():
+    # 2024-01-01 is a Monday
+    slots = expand_template(template(), date(2024, 1, 1), date(2024, 1, 15))
+    assert [s["slot_date"] for s in slots] == ["2024-01-01"] * 3 + ["2024-01-08"] * 3
+    assert [s["start_time"] for s in slots[:3]] == ["09:00:00", "09:20:00", "09:40:00"]
+
+
+def test_regeneration_is_idempotent_and_keeps_booked_slots(fake_supabase):
+    client = slots_client(fake_supabase, {"doctor_schedule_templates": [template()]})
+    db = client.tables
+
+    generate_slots(client, "d1", date(2024, 1, 1), 7)
+    generate_slots(client, "d1", date(2024, 1, 1), 7)
+    assert len(db["doctor_slots"]) == 3
+
+    # Book the last slot, then shorten the window so that slot no longer fits
+    db["doctor_slots"][2]["booked"] = 1
+    db["doctor_schedule_templates"][0]["end_time"] = "09:30:00"
+    summary = generate_slots(client, "d1", date(2024, 1, 1), 7)
+
+    assert summary == {"generated": 1, "inserted": 0, "updated": 0, "removed": 1}
+    assert sorted(s["start_time"] for s in db["doctor_slots"]) == ["09:00:00", "09:40:00"]
+
+
+def test_template_change_leaves_booked_and_hand_edited_slots_alone(fake_supabase):
+    client = slots_client(fake_supabase, {"doctor_schedule_templates": [template(capacity=3)]})
+    db = client.tables
+    generate_slots(client, "d1", date(2024, 1, 1), 7)
+
+    slots = {s["start_time"]: s for s in db["doctor_slots"]}
+    slots["09:00:00"]["booked"] = 2
+    slots["09:20:00"].update(template_id=None, capacity=5)
+    db["doctor_schedule_templates"][0]["capacity"] = 1
+    summary = generate_slots(client, "d1", date(2024, 1, 1), 7)
+
+    assert summary["updated"] == 1
+    assert {start: s["capacity"] for start, s in slots.items()} == {"09:00:00": 3, "09:20:00": 5, "09:40:00": 1}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Tests for single-flight collapsing of identical concurrent queries"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import threading
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def query(key):
+            runs.append(key)
+            started.set()
+            release.wait(5)
+            return {"key": key}
+
+        calls = [asyncio.ensure_future(group.do("patients", key, query, key)) for key in ("a", "a", "a", "b")]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        release.set()
+        results = await asyncio.gather(*calls)
+        # The flight is gone once it finishes, so a later call runs again
+        await group.do("patients", "a", query, "a")
+        return group, results, runs
+
+    group, results, runs = asyncio.run(scenario())
+    assert [result["key"] for result in results] == ["a", "a", "a", "b"]
+    assert sorted(runs) == ["a", "a", "b"]
+    stats = group.stats()
+    assert stats["patients"]["calls"] == 5 and stats["patients"]["executions"] == 3
+    assert stats["patients"]["collapsed"] == 2 and stats["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        group = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("database unavailable")
+
+        return group, await asyncio.gather(*(group.do("stats", None, failing) for _ in range(3)), return_exceptions=True)
+
+    group, results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.stats()["stats"]["errors"] == 1 and group.stats()["stats"]["executions"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        group = SingleFlight()
+        finished = []
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            finished.append(True)
+            return "rows"
+
+        first = asyncio.ensure_future(group.do("stats", None, slow))
+        second = asyncio.ensure_future(group.do("stats", None, slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, finished
+
+    assert asyncio.run(scenario()) == ("rows", [True])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Tests for the local Supabase write spool"""
+
+import sys
+sys.path.append('.')
+
+import services.spool as spool
+from services.spool import WriteSpool
+
+
+class FakeError(Exception):
+    def __init__(self, code=None, message="error"):
+        super().__init__(f"{message} {code}")
+        self.code = code
+
+
+def spool_errors(missing=()):
+    """A constraint error for 'bad' rows (and for 'solo' rows written alongside others) and an
+    undefined-column error for columns in missing"""
+    def fail(op, table, rows):
+        if any(row.get("bad") or (row.get("solo") and len(rows) > 1) for row in rows):
+            return FakeError("23502")
+        for column in missing:
+            if any(column in row for row in rows):
+                return FakeError("PGRST204", f"Could not find the '{column}' column of '{table}'")
+    return fail
+
+
+def down(op, table, rows):
+    """Supabase unreachable: a connection error carries no code"""
+    return FakeError()
+
+
+def session(client, session_id):
+    row = next(row for row in client.tables["chat_sessions"] if row["session_id"] == session_id)
+    return {k: v for k, v in row.items() if k != "id"}
+
+
+def test_replays_in_order_once_reachable(tmp_path, fake_supabase):
+    write_spool = WriteSpool(str(tmp_path / "writes.db"))
+    supabase = fake_supabase(fail=down)
+    write_spool.append("chat", "chat_sessions", {"session_id": "s1", "status": "active"}, on_conflict="session_id")
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s1", "status": "completed", "patient_name": "A"}, on_conflict="session_id")
+    write_spool.append("patient", "patients", {"session_id": "s1", "patient_name": "A"})
+    # Newer writes queue behind the backlog instead of overtaking it
+    assert write_spool.queue_if_backlogged("chat", "chat_sessions", {"session_id": "s1", "status": "active"}, on_conflict="session_id")
+
+    assert write_spool.replay(supabase) == 0
+    assert write_spool.stats()["depth"] == 4
+
+    supabase.fail = spool_errors()
+    assert write_spool.replay(supabase) == 4
+    assert supabase.writes == [
+        ("upsert", "chat_sessions", [{"session_id": "s1", "status": "completed", "patient_name": "A"}]),
+        ("insert", "patients", [{"session_id": "s1", "patient_name": "A"}]),
+        ("upsert", "chat_sessions", [{"session_id": "s1", "status": "active"}]),
+    ]
+    assert write_spool.stats()["depth"] == 0
+
+
+def test_rejected_write_is_set_aside(tmp_path, monkeypatch, fake_supabase):
+    monkeypatch.setattr(spool, "SPOOL_MAX_ATTEMPTS", 2)
+    write_spool = WriteSpool(str(tmp_path / "writes.db"))
+    supabase = fake_supabase(fail=spool_errors())
+    write_spool.append("patient", "patients", {"session_id": "s1", "bad": True})
+    write_spool.append("patient", "patients", {"session_id": "s2", "bad": False})
+
+    # The rejected write holds back the one behind it until it is set aside
+    assert write_spool.replay(supabase) == 0
+    assert write_spool.replay(supabase) == 1
+    stats = write_spool.stats()
+    assert stats["depth"] == 0 and stats["dead"] == 1
+    assert not write_spool.save_failed("patient", "patients", {}, FakeError("23505"))
+
+
+def test_batches_resume_after_replaying_one_at_a_time(tmp_path, fake_supabase):
+    write_spool = WriteSpool(str(tmp_path / "writes.db"))
+    supabase = fake_supabase(fail=spool_errors())
+    for n in range(6):
+        write_spool.append("patient", "patients", {"session_id": f"s{n}", "solo": n == 1})
+
+    assert write_spool.replay(supabase) == 6
+    # After each rejected batch only the next entry is written alone, then whole batches resume
+    assert [len(rows) for _, _, rows in supabase.writes] == [1, 1, 4]
+
+
+def test_missing_optional_column_is_dropped_on_replay(tmp_path, fake_supabase):
+    write_spool = WriteSpool(str(tmp_path / "writes.db"))
+    supabase = fake_supabase(fail=spool_errors(missing=("needs_retriage",)))
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s1", "needs_retriage": True}, on_conflict="session_id")
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s2"}, on_conflict="session_id")
+
+    assert write_spool.replay(supabase) == 2
+    assert supabase.writes == [("upsert", "chat_sessions", [{"session_id": "s1"}, {"session_id": "s2"}])]
+    assert write_spool.stats()["dead"] == 0 and write_spool.replay_failures == 1
+
+    # Other tables and other missing columns are still rejected
+    supabase = fake_supabase(fail=spool_errors(missing=("symptoms",)))
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s3", "symptoms": "cough"}, on_conflict="session_id")
+    assert write_spool.replay(supabase) == 0
+
+
+def test_replayed_upserts_keep_the_original_write_time(tmp_path, fake_supabase):
+    write_spool = WriteSpool(str(tmp_path / "writes.db"))
+    supabase = fake_supabase(tables={"chat_sessions": [{"session_id": "s1", "status": "active", "created_at": "2030-01-06T23:50:00"}]})
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s1", "status": "completed", "created_at": "2030-01-07T00:10:00"}, on_conflict="session_id")
+    write_spool.append("chat", "chat_sessions", {"session_id": "s2", "status": "active", "created_at": "2030-01-07T08:00:00"}, on_conflict="session_id")
+    write_spool.append("consultation", "chat_sessions", {"session_id": "s2", "status": "completed", "created_at": "2030-01-07T08:05:00"}, on_conflict="session_id")
+
+    assert write_spool.replay(supabase) == 3
+    # The existing row keeps its created_at; the new one gets the time of its first save, not the replay time
+    assert session(supabase, "s1") == {"session_id": "s1", "status": "completed", "created_at": "2030-01-06T23:50:00"}
+    assert session(supabase, "s2") == {"session_id": "s2", "status": "completed", "created_at": "2030-01-07T08:00:00"}
+    assert supabase.writes[-1] == ("upsert", "chat_sessions", [{"session_id": "s1", "status": "completed"}, {"session_id": "s2", "status": "completed"}])
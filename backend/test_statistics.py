@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests for the incrementally maintained hospital statistics"""
+
+import sys
+sys.path.append('.')
+
+from datetime import date
+
+import services.statistics as statistics
+from services.statistics import StatisticsCounters
+
+
+def recount(counters):
+    return lambda supabase, day: dict(counters)
+
+
+def test_events_update_loaded_day(monkeypatch):
+    monkeypatch.setattr(statistics, "daily_counters", recount({"total_patients_today": 2}))
+    counters = StatisticsCounters()
+    today = date.today()
+
+    assert counters.get(today) is None
+    assert counters.get_or_load(None, today)["total_patients_today"] == 2
+
+    counters.record_patient_registered()
+    counters.record_appointment_created({"appointment_date": f"{today.isoformat()}T09:30:00", "priority": "emergency"})
+    booked = {"appointment_date": today.isoformat(), "priority": "normal", "status": "scheduled"}
+    counters.record_appointment_changed(booked, {**booked, "status": "cancelled"})
+    snapshot = counters.get(today)
+
+    assert snapshot["total_patients_today"] == 3
+    assert snapshot["emergency_cases"] == 1
+    assert snapshot["total_appointments_today"] == 0
+
+
+def test_reconcile_replaces_drifted_counters(monkeypatch):
+    monkeypatch.setattr(statistics, "daily_counters", recount({"completed_visits": 5}))
+    counters = StatisticsCounters()
+    today = date.today()
+    counters.get_or_load(None, today)
+    counters.record_appointment_changed(
+        {"appointment_date": today.isoformat(), "status": "scheduled"},
+        {"appointment_date": today.isoformat(), "status": "completed"},
+    )
+    assert counters.get(today)["completed_visits"] == 6
+
+    counters.reconcile(None)
+    assert counters.get(today)["completed_visits"] == 5
+
+
+def test_flush_upserts_dirty_days_once(monkeypatch):
+    monkeypatch.setattr(statistics, "daily_counters", recount({}))
+    upserts = []
+
+    class Table:
+        def upsert(self, rows, on_conflict):
+            upserts.append((rows, on_conflict))
+            return self
+
+        def execute(self):
+            return None
+
+    class Client:
+        def table(self, name):
+            return Table()
+
+    counters = StatisticsCounters()
+    counters.get_or_load(None, date.today())
+    counters.flush(Client())
+    counters.flush(Client())
+
+    assert len(upserts) == 1
+    assert upserts[0][1] == "statistic_date"
+
+
+def test_doctor_leave_changes_move_available_doctors(monkeypatch, fake_supabase):
+    import asyncio
+    import routers.doctors as doctors
+    from models.hospital import DoctorUpdate
+
+    monkeypatch.setattr(statistics, "daily_counters", recount({"available_doctors": 3}))
+    counters = StatisticsCounters()
+    counters.get_or_load(None, date.today())
+    monkeypatch.setattr(doctors, "statistics_counters", counters)
+    row = {"id": "d1", "name": "Dr A", "email": "a@example.com", "department_id": "gen", "is_on_leave": False}
+
+    supabase = fake_supabase(tables={"doctors": [row]})
+    monkeypatch.setattr(doctors, "get_supabase_admin", lambda: supabase)
+
+    for on_leave, expected in ((True, 2), (True, 2), (False, 3)):
+        asyncio.run(doctors.update_doctor("d1", DoctorUpdate(is_on_leave=on_leave)))
+        assert counters.get(date.today())["available_doctors"] == expected
+    asyncio.run(doctors.update_doctor("d1", DoctorUpdate(name="Dr B")))
+    assert counters.get(date.today())["available_doctors"] == 3
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Tests for the symptom -> department matcher"""
+
+import sys
+sys.path.append('.')
+
+from services.symptom_router import SymptomMatcher
+
+MAPPINGS = [
+    {"symptom": "Chest Pain", "department_id": "cardiology", "priority": "emergency"},
+    {"symptom": "pain", "department_id": "general", "priority": "normal"},
+    {"symptom": "headache", "department_id": "neurology", "priority": "normal"},
+    {"symptom": "severe headache", "department_id": "neurology", "priority": "urgent"},
+    {"symptom": "cut", "department_id": "emergency", "priority": "urgent"},
+]
+
+
+def test_most_severe_then_longest_match_wins():
+    matcher = SymptomMatcher(MAPPINGS)
+    assert matcher.resolve("I have a headache and  CHEST  pain")["department_id"] == "cardiology"
+    assert matcher.resolve("a severe headache since morning")["priority"] == "urgent"
+    assert matcher.resolve("nothing relevant") is None
+
+
+def test_matches_whole_words_only():
+    matcher = SymptomMatcher(MAPPINGS)
+    # "cut" inside "acute" must not route to emergency
+    assert matcher.resolve("acute pain")["department_id"] == "general"
+    assert matcher.resolve("I cut my finger")["department_id"] == "emergency"
+
+
+def test_most_severe_priority():
+    from services.symptom_router import most_severe
+
+    assert most_severe("emergency", "normal") == "emergency"
+    assert most_severe("normal", "urgent") == "urgent"
+    assert most_severe("normal", None) == "normal"
+    assert most_severe("bogus") == "normal"
+
+
+def test_load_pages_past_the_row_limit(monkeypatch):
+    import database.queries as queries
+    from services.symptom_router import SymptomRouter
+
+    monkeypatch.setattr(queries, "PAGE_SIZE", 2)
+    rows = [{"id": i, **mapping} for i, mapping in enumerate(MAPPINGS)]
+
+    class Table:
+        def select(self, columns):
+            self.rows = rows
+            return self
+
+        def gt(self, column, value):
+            self.rows = [row for row in self.rows if row[column] > value]
+            return self
+
+        def order(self, column):
+            return self
+
+        def limit(self, count):
+            self.rows = self.rows[:count]
+            return self
+
+        def execute(self):
+            return type("Result", (), {"data": self.rows})()
+
+    router = SymptomRouter()
+    router.load(type("Client", (), {"table": lambda self, name: Table()})())
+    assert router.stats()["symptoms"] == len(MAPPINGS)
@@ -3,6 +3,11 @@ from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from models.patient import PatientData, Ward
+from services.assignment import assignment_engine
+from services.circuit_breaker import llm_breaker
+from services.events import publish_emergency_intake
+from services.load_shedding import load_shedder
+from services.symptom_router import most_severe, symptom_router
 import re
 import os
 
@@ -50,8 +55,13 @@ def classify_symptom_with_keywords(symptom: str) -> str:
     else:
         return "General"
 
-def classify_symptom_with_llm(symptom: str) -> str:
-    """Use LLM to classify symptoms into General, Emergency, or Mental_health (with timeout)"""
+def classify_symptom_with_llm(symptom: str, patient_data: Optional[dict] = None) -> str:
+    """Use LLM to classify symptoms into General, Emergency, or Mental_health (with timeout).
+
+    When the LLM is shed under load, failing, or its circuit is open, the
+    keyword result is used instead and patient_data (if given) is flagged
+    with needs_retriage so staff can check the classification later.
+    """
 
     # If LLM is not available, fall back to keyword-based classification
     if llm is None:
@@ -72,9 +82,19 @@ def classify_symptom_with_llm(symptom: str) -> str:
         "Respond only with one word: General, Emergency, or Mental_health"
     )
 
+    # Slow LLM or saturated server: don't add another call. Circuit open: Gemini
+    # is failing, so skip the call entirely instead of waiting for it to fail.
+    # The breaker is asked last, so it only hands out a permit for a call that is made.
+    if not load_shedder.allow_llm(llm_breaker.allow):
+        if patient_data is not None:
+            patient_data["needs_retriage"] = True
+        return quick_result
+
     try:
         # Call LLM with minimal overhead
-        response = llm.invoke([HumanMessage(content=prompt)])
+        with load_shedder.llm_call():
+            response = llm.invoke([HumanMessage(content=prompt)])
+        llm_breaker.record_success()
         category = response.content.strip()
 
         # Normalize the response
@@ -90,6 +110,9 @@ def classify_symptom_with_llm(symptom: str) -> str:
 
     except Exception as e:
         # If LLM fails, fall back to keyword-based (much faster)
+        llm_breaker.record_failure()
+        if patient_data is not None:
+            patient_data["needs_retriage"] = True
         return classify_symptom_with_keywords(symptom)
 
 class ConversationState(TypedDict):
@@ -222,7 +245,7 @@ def handle_ward_logic(state: ConversationState, ward_type: str) -> ConversationS
     else:
         # All information collected - classify and complete
         symptoms = patient_data["patient_query"]
-        ward = classify_symptom_with_llm(symptoms)
+        ward = classify_symptom_with_llm(symptoms, patient_data)
 
         # Map classification to ward enum
         if ward == "Emergency":
@@ -238,9 +261,30 @@ def handle_ward_logic(state: ConversationState, ward_type: str) -> ConversationS
         # Update patient data with final ward
         patient_data["ward"] = final_ward
 
+        # Department and priority from the configured symptom mappings (in memory, no DB call)
+        route = symptom_router.resolve(symptoms)
+        ward_priority = "emergency" if final_ward == Ward.EMERGENCY else "normal"
+        if route:
+            patient_data["department_id"] = route["department_id"]
+        # A generic match ("pain") must not downgrade a patient the classifier sent to Emergency
+        patient_data["priority"] = most_severe(ward_priority, route and route["priority"])
+
+        # Queue the patient with the least-loaded available doctor for that ward
+        assignment = assignment_engine.assign(final_ward, patient_data.get("department_id"))
+        doctor_note = ""
+        if assignment:
+            patient_data["assigned_doctor_id"] = assignment["doctor_id"]
+            patient_data["department_id"] = assignment["department_id"]
+            if assignment["doctor_name"]:
+                doctor_note = f" You have been placed in {assignment['doctor_name']}'s queue."
+
+        if final_ward == Ward.EMERGENCY:
+            # Push to admin dashboards straight away rather than waiting for their next refresh
+            publish_emergency_intake(patient_data, state.get("session_id"))
+
         # Trigger webhook and complete
         trigger_webhook(patient_data)
-        success_message = AIMessage(content=f"Thank you for providing your information, {patient_data.get('patient_name')}. Based on your symptoms, you'll be shifted to the {ward_display}. A healthcare professional will assist you shortly.")
+        success_message = AIMessage(content=f"Thank you for providing your information, {patient_data.get('patient_name')}. Based on your symptoms, you'll be shifted to the {ward_display}.{doctor_note} A healthcare professional will assist you shortly.")
 
         return {
             **state,
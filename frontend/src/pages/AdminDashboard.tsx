@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { getApiUrl } from '../utils/api'
+import { getApiUrl, withCursor, NEXT_CURSOR_HEADER } from '../utils/api'
 
 interface AdminDashboardProps {
   onNavigate?: (page: string) => void
@@ -12,6 +12,9 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
   const [allPatients, setAllPatients] = useState<any[]>([])
   const [pendingAppointments, setPendingAppointments] = useState<any[]>([])
   const [availableDoctorsList, setAvailableDoctorsList] = useState<any[]>([])
+  const [patientsTodayCursor, setPatientsTodayCursor] = useState<string | null>(null)
+  const [allPatientsCursor, setAllPatientsCursor] = useState<string | null>(null)
+  const [pendingAppointmentsCursor, setPendingAppointmentsCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
   const [successMessage, setSuccessMessage] = useState('')
   const [activeTab, setActiveTab] = useState('overview')
@@ -20,6 +23,37 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
     loadDashboardData()
   }, [])
 
+  // New emergencies are pushed by the server instead of waiting for a refresh
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return
+    const source = new EventSource(getApiUrl('/api/admin/emergency-cases/stream'))
+
+    const addCase = (caseItem: any) => {
+      setEmergencyCases(prev => [caseItem, ...prev.filter(c => c.id !== caseItem.id)])
+    }
+    const onAppointment = (event: MessageEvent) => {
+      addCase(JSON.parse(event.data))
+      // The overview's emergency count is of emergency appointments
+      setStats((prev: any) => prev?.statistics
+        ? { ...prev, statistics: { ...prev.statistics, emergency_cases: (prev.statistics.emergency_cases || 0) + 1 } }
+        : prev)
+    }
+    const onIntake = (event: MessageEvent) => {
+      const intake = JSON.parse(event.data)
+      addCase({
+        id: `intake-${event.lastEventId}`,
+        appointment_number: intake.patient_name ? `Intake: ${intake.patient_name}` : 'Intake',
+        priority: intake.priority || 'emergency',
+        reason_for_visit: intake.symptoms,
+        appointment_date: new Date().toISOString(),
+      })
+    }
+
+    source.addEventListener('emergency_appointment', onAppointment)
+    source.addEventListener('emergency_intake', onIntake)
+    return () => source.close()
+  }, [])
+
   const loadDashboardData = async () => {
     setLoading(true)
     try {
@@ -45,16 +79,20 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
     }
   }
 
-  const loadPatientToday = async () => {
-    setLoading(true)
+  const loadPatientToday = async (loadMore = false) => {
+    setLoading(!loadMore)
     try {
-      const response = await fetch(getApiUrl('/api/admin/patients/today'))
+      const cursor = loadMore ? patientsTodayCursor : null
+      const response = await fetch(getApiUrl(withCursor('/api/admin/patients/today', cursor)))
       if (response.ok) {
         const data = await response.json()
-        setPatientsToday(data.patients || [])
+        setPatientsToday(prev => loadMore ? [...prev, ...(data.patients || [])] : (data.patients || []))
+        setPatientsTodayCursor(data.next_cursor || null)
         setActiveTab('todays-patients')
-        setSuccessMessage(`✅ Loaded ${data.total} patients from today`)
-        setTimeout(() => setSuccessMessage(''), 4000)
+        if (!loadMore) {
+          setSuccessMessage(`✅ Loaded ${data.total} patients from today`)
+          setTimeout(() => setSuccessMessage(''), 4000)
+        }
       } else {
         alert('Failed to load patients from today')
       }
@@ -66,16 +104,20 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
     }
   }
 
-  const loadAllPatients = async () => {
-    setLoading(true)
+  const loadAllPatients = async (loadMore = false) => {
+    setLoading(!loadMore)
     try {
-      const response = await fetch(getApiUrl('/api/admin/patients/all'))
+      const cursor = loadMore ? allPatientsCursor : null
+      const response = await fetch(getApiUrl(withCursor('/api/admin/patients/all', cursor)))
       if (response.ok) {
         const data = await response.json()
-        setAllPatients(data.patients || [])
+        setAllPatients(prev => loadMore ? [...prev, ...(data.patients || [])] : (data.patients || []))
+        setAllPatientsCursor(data.next_cursor || null)
         setActiveTab('all-patients')
-        setSuccessMessage(`✅ Loaded ${data.total} total patients`)
-        setTimeout(() => setSuccessMessage(''), 4000)
+        if (!loadMore) {
+          setSuccessMessage(`✅ Loaded ${data.total} total patients`)
+          setTimeout(() => setSuccessMessage(''), 4000)
+        }
       } else {
         alert('Failed to load all patients')
       }
@@ -87,16 +129,20 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
     }
   }
 
-  const loadPendingAppointments = async () => {
-    setLoading(true)
+  const loadPendingAppointments = async (loadMore = false) => {
+    setLoading(!loadMore)
     try {
-      const response = await fetch(getApiUrl('/api/appointments?status=scheduled'))
+      const cursor = loadMore ? pendingAppointmentsCursor : null
+      const response = await fetch(getApiUrl(withCursor('/api/appointments?status=scheduled', cursor)))
       if (response.ok) {
         const data = await response.json()
-        setPendingAppointments(data)
+        setPendingAppointments(prev => loadMore ? [...prev, ...data] : data)
+        setPendingAppointmentsCursor(response.headers.get(NEXT_CURSOR_HEADER))
         setActiveTab('pending-appointments')
-        setSuccessMessage(`✅ Loaded ${data.length} pending appointments`)
-        setTimeout(() => setSuccessMessage(''), 4000)
+        if (!loadMore) {
+          setSuccessMessage(`✅ Loaded ${data.length} pending appointments`)
+          setTimeout(() => setSuccessMessage(''), 4000)
+        }
       } else {
         alert('Failed to load pending appointments')
       }
@@ -111,13 +157,12 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
   const loadAvailableDoctors = async () => {
     setLoading(true)
     try {
-      const response = await fetch(getApiUrl('/api/doctors'))
+      const response = await fetch(getApiUrl('/api/admin/doctors/available'))
       if (response.ok) {
         const data = await response.json()
-        const availableDocs = data.filter((doc: any) => !doc.is_on_leave)
-        setAvailableDoctorsList(availableDocs)
+        setAvailableDoctorsList(data.doctors || [])
         setActiveTab('available-doctors')
-        setSuccessMessage(`✅ Loaded ${availableDocs.length} available doctors`)
+        setSuccessMessage(`✅ Loaded ${data.total} available doctors`)
         setTimeout(() => setSuccessMessage(''), 4000)
       } else {
         alert('Failed to load available doctors')
@@ -425,6 +470,11 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
                       </div>
                     ))}
                   </div>
+                  {patientsTodayCursor && (
+                    <button className="load-more-button" onClick={() => loadPatientToday(true)}>
+                      Load more
+                    </button>
+                  )}
                 </div>
               ) : (
                 <div className="empty-state">
@@ -461,6 +511,11 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
                       </div>
                     ))}
                   </div>
+                  {allPatientsCursor && (
+                    <button className="load-more-button" onClick={() => loadAllPatients(true)}>
+                      Load more
+                    </button>
+                  )}
                 </div>
               ) : (
                 <div className="empty-state">
@@ -494,6 +549,11 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
                       </div>
                     ))}
                   </div>
+                  {pendingAppointmentsCursor && (
+                    <button className="load-more-button" onClick={() => loadPendingAppointments(true)}>
+                      Load more
+                    </button>
+                  )}
                 </div>
               ) : (
                 <div className="empty-state">
@@ -950,6 +1010,18 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onNavigate }) => {
           font-size: 1.5rem;
         }
 
+        .load-more-button {
+          display: block;
+          margin: 24px auto 0;
+          padding: 10px 28px;
+          border: none;
+          border-radius: 8px;
+          background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+          color: white;
+          font-weight: 600;
+          cursor: pointer;
+        }
+
         .empty-state {
           text-align: center;
           padding: 60px 40px;
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { getApiUrl } from '../utils/api'
+import { getApiUrl, fetchAllPages } from '../utils/api'
 
 interface AppointmentBookingProps {
   onNavigate?: (page: string) => void
@@ -26,12 +26,10 @@ const AppointmentBooking: React.FC<AppointmentBookingProps> = ({ selectedPatient
   const [lookupPatientEmail, setLookupPatientEmail] = useState('')
 
   useEffect(() => {
-    // Load doctors on component mount
+    // Load doctors (and the available subset) on component mount
     loadDoctors()
     // Load all scheduled appointments
     loadAllScheduledAppointments()
-    // Load available doctors
-    loadAvailableDoctors()
     
     // If patient was passed, load their appointments
     if (selectedPatient?.id) {
@@ -42,11 +40,9 @@ const AppointmentBooking: React.FC<AppointmentBookingProps> = ({ selectedPatient
 
   const loadDoctors = async () => {
     try {
-      const response = await fetch(getApiUrl('/api/doctors'))
-      if (response.ok) {
-        const data = await response.json()
-        setDoctors(data)
-      }
+      const data = await fetchAllPages('/api/doctors')
+      setDoctors(data)
+      setAvailableDoctors(data.filter((doc: any) => !doc.is_on_leave))
     } catch (error) {
       console.error('Error loading doctors:', error)
     }
@@ -54,29 +50,14 @@ const AppointmentBooking: React.FC<AppointmentBookingProps> = ({ selectedPatient
 
   const loadAllScheduledAppointments = async () => {
     try {
-      const response = await fetch(getApiUrl('/api/appointments?status=scheduled'))
-      if (response.ok) {
-        const data = await response.json()
-        setAllScheduledAppointments(data)
-      }
+      // The list is paginated; follow X-Next-Cursor so no scheduled appointment is missed
+      const data = await fetchAllPages('/api/appointments?status=scheduled&limit=200')
+      setAllScheduledAppointments(data)
     } catch (error) {
       console.error('Error loading scheduled appointments:', error)
     }
   }
 
-  const loadAvailableDoctors = async () => {
-    try {
-      const response = await fetch(getApiUrl('/api/doctors'))
-      if (response.ok) {
-        const data = await response.json()
-        const notOnLeave = data.filter((doc: any) => !doc.is_on_leave)
-        setAvailableDoctors(notOnLeave)
-      }
-    } catch (error) {
-      console.error('Error loading available doctors:', error)
-    }
-  }
-
   const loadPatientAppointmentsForId = async (patientId: string) => {
     try {
       const appointmentsResponse = await fetch(getApiUrl(`/api/appointments/patient/${patientId}`))
@@ -16,3 +16,34 @@ export function getApiUrl(endpoint: string): string {
   
   return finalUrl
 }
+
+/**
+ * Header carrying the cursor for the next page on list endpoints
+ */
+export const NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+/**
+ * Append a pagination cursor to an endpoint that may already have a query string
+ */
+export function withCursor(endpoint: string, cursor?: string | null): string {
+  if (!cursor) return endpoint
+  const separator = endpoint.includes('?') ? '&' : '?'
+  return `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}`
+}
+
+/**
+ * Fetch every page of a cursor-paginated list endpoint (doctors, scheduled appointments)
+ */
+export async function fetchAllPages<T = any>(endpoint: string): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | null = null
+  do {
+    const response = await fetch(getApiUrl(withCursor(endpoint, cursor)))
+    if (!response.ok) {
+      throw new Error(`Request failed with status ${response.status}`)
+    }
+    items.push(...(await response.json()))
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+  } while (cursor)
+  return items
+}